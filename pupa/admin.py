@@ -4,7 +4,14 @@ from . import models
 
 class ScrapeReportInline(admin.TabularInline):
     model = models.ScrapeReport
-    readonly_fields = ("scraper", "args", "start_time", "end_time", "get_object_list")
+    readonly_fields = (
+        "scraper",
+        "args",
+        "start_time",
+        "end_time",
+        "timings",
+        "get_object_list",
+    )
 
     def has_add_permission(self, request):
         return False
@@ -15,6 +15,7 @@ COMMAND_MODULES = (
     "pupa.cli.commands.update",
     "pupa.cli.commands.party",
     "pupa.cli.commands.clean",
+    "pupa.cli.commands.cache",
 )
 
 
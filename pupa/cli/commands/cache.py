@@ -0,0 +1,65 @@
+import os
+import datetime
+from .base import BaseCommand
+from pupa import settings
+from pupa.exceptions import CommandError
+from pupa.utils.cache import SQLiteCache, SQLITE_CACHE_FILENAME
+
+
+def format_time(timestamp):
+    if timestamp is None:
+        return "-"
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Command(BaseCommand):
+    name = "cache"
+    help = "inspect or prune the sqlite HTTP cache"
+
+    def add_args(self):
+        self.add_argument("action", type=str, help="stats|prune")
+        self.add_argument("--cachedir", help="cache directory")
+        self.add_argument(
+            "--max-bytes",
+            type=int,
+            help="prune down to this many bytes (default: CACHE_MAX_BYTES)",
+        )
+        self.add_argument(
+            "--max-age",
+            type=int,
+            help="prune responses older than this many seconds (default: CACHE_MAX_AGE)",
+        )
+
+    def handle(self, args, other):
+        cache_dir = args.cachedir or settings.CACHE_DIR
+        if not cache_dir or not os.path.exists(
+            os.path.join(cache_dir, SQLITE_CACHE_FILENAME)
+        ):
+            raise CommandError("no sqlite cache in {}".format(cache_dir))
+
+        cache = SQLiteCache(cache_dir)
+        try:
+            if args.action == "stats":
+                stats = cache.stats()
+                print("cache:     {}".format(cache.path))
+                print("responses: {}".format(stats["responses"]))
+                print("bytes:     {}".format(stats["bytes"]))
+                print("oldest:    {}".format(format_time(stats["oldest"])))
+                print("newest:    {}".format(format_time(stats["newest"])))
+            elif args.action == "prune":
+                max_bytes = settings.CACHE_MAX_BYTES
+                if args.max_bytes is not None:
+                    max_bytes = args.max_bytes
+                max_age = settings.CACHE_MAX_AGE
+                if args.max_age is not None:
+                    max_age = args.max_age
+                if not max_bytes and not max_age:
+                    raise CommandError("prune requires --max-bytes or --max-age")
+
+                removed, freed = cache.prune(max_bytes=max_bytes, max_age=max_age)
+                cache.vacuum()
+                print("removed {} responses ({} bytes)".format(removed, freed))
+            else:
+                raise CommandError('cache action must be "stats" or "prune"')
+        finally:
+            cache.close()
@@ -1,10 +1,15 @@
 import os
 import glob
 import logging
+import argparse
 import importlib
 import traceback
 import contextlib
+import multiprocessing
+import multiprocessing.connection
 from collections import OrderedDict
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import django
 from django.db import transaction
@@ -12,7 +17,10 @@ from django.db import transaction
 from pupa import utils
 from pupa import settings
 from pupa.scrape import Jurisdiction, JurisdictionScraper
-from pupa.exceptions import CommandError
+from pupa.scrape.base import parse_validation_policy
+from pupa.scrape.deferred import validate_datadir
+from pupa.utils.pipeline import ImportPipeline
+from pupa.exceptions import CommandError, ScrapeError, ScrapeValueError
 
 from .base import BaseCommand
 
@@ -41,6 +49,79 @@ def override_settings(settings, overrides):
             setattr(settings, key, value)
 
 
+def run_scraper(juris, scraper_name, datadir, strict, fastmode, scrape_args, overrides):
+    """run a single scraper, used as the entry point for --scrape-workers"""
+    with override_settings(settings, overrides):
+        ScraperCls = juris.scrapers[scraper_name]
+        scraper = ScraperCls(
+            juris, datadir, strict_validation=strict, fastmode=fastmode
+        )
+        return scraper.do_scrape(**scrape_args)
+
+
+class RemoteTraceback(Exception):
+    """the traceback of an exception raised in a scraper process"""
+
+    def __init__(self, tb):
+        self.tb = tb
+
+    def __str__(self):
+        return '\n"""\n{}"""'.format(self.tb)
+
+
+def scraper_process(conn, *args):
+    """
+    entry point of a --scrape-workers process, sends whether run_scraper
+    succeeded, its result or exception, and the exception's traceback
+    """
+    try:
+        outcome = (True, run_scraper(*args), None)
+    except BaseException as exc:
+        outcome = (False, exc, traceback.format_exc())
+    try:
+        conn.send(outcome)
+    except Exception:
+        # the exception couldn't be pickled
+        conn.send((False, ScrapeError(repr(outcome[1])), outcome[2]))
+    conn.close()
+
+
+def validation_policy(value):
+    """argparse type for --validation"""
+    try:
+        parse_validation_policy(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def format_timings(timings):
+    """lines describing where a scraper's time went"""
+    lines = []
+    # "scrape" includes HTTP requests made from scrape(), report them apart
+    scrape = timings.get("scrape", 0) - timings.get("http", 0)
+    lines.append("scrape code: {:.3f}s".format(max(scrape, 0)))
+    lines.append("http wait: {:.3f}s".format(timings.get("http", 0)))
+    hosts = ", ".join(
+        "{}: {:.3f}s".format(host, seconds)
+        for host, seconds in sorted(timings.get("hosts", {}).items())
+    )
+    lines.append(
+        "network: {:.3f}s{}".format(
+            timings.get("network", 0), " ({})".format(hosts) if hosts else ""
+        )
+    )
+    lines.append("throttle: {:.3f}s".format(timings.get("throttle", 0)))
+    lines.append(
+        "cache: {} hits {} misses".format(
+            timings.get("cache_hits", 0), timings.get("cache_misses", 0)
+        )
+    )
+    for phase in ("validate", "serialize", "write"):
+        lines.append("{}: {:.3f}s".format(phase, timings.get(phase, 0)))
+    return lines
+
+
 def print_report(report):
     plan = report["plan"]
     print("{} ({})".format(plan["module"], ", ".join(plan["actions"])))
@@ -53,6 +134,30 @@ def print_report(report):
             print("  objects:")
             for objtype, num in sorted(details["objects"].items()):
                 print("    {}: {}".format(objtype, num))
+            validation = details.get("validation")
+            if validation and validation["objects"]:
+                # unchanged objects were validated by a previous run
+                checked = validation["validated"] + validation.get("unchanged", 0)
+                print(
+                    "  validated: {} of {} ({:.0%}, {})".format(
+                        checked,
+                        validation["objects"],
+                        checked / validation["objects"],
+                        validation["policy"],
+                    )
+                )
+                if validation.get("unchanged"):
+                    print("  unchanged: {}".format(validation["unchanged"]))
+            if details.get("timings"):
+                print("  timings:")
+                for line in format_timings(details["timings"]):
+                    print("    " + line)
+    if "validation" in report:
+        print(
+            "deferred validation: {} objects, {} errors".format(
+                report["validation"]["objects"], report["validation"]["errors"]
+            )
+        )
     if "import" in report:
         print("import:")
         for type, changes in sorted(report["import"].items()):
@@ -103,6 +208,7 @@ def save_report(report, jurisdiction):
             args=args,
             start_time=details["start"],
             end_time=details["end"],
+            timings=details.get("timings", {}),
         )
         for object_type, num in details["objects"].items():
             sr.scraped_objects.create(object_type=object_type, count=num)
@@ -122,6 +228,7 @@ def save_report(report, jurisdiction):
 class Command(BaseCommand):
     name = "update"
     help = "update pupa data"
+    overrides = {}
 
     def add_args(self):
         # what to scrape
@@ -145,13 +252,82 @@ class Command(BaseCommand):
         self.add_argument(
             "--fastmode", action="store_true", help="use cache and turn off throttling"
         )
+        self.add_argument(
+            "--scrape-workers",
+            type=int,
+            default=1,
+            help="number of processes to run scrapers in",
+        )
+        self.add_argument(
+            "--validation",
+            type=validation_policy,
+            help=(
+                "validate every object on save (full, the default), a stable "
+                "sample of them (sample=N%%) or the datadir before import (deferred)"
+            ),
+            dest="SCRAPE_VALIDATION",
+        )
+        self.add_argument(
+            "--validator",
+            choices=("compiled", "jsonschema"),
+            help="validation engine used on save",
+            dest="SCRAPE_VALIDATOR",
+        )
+        self.add_argument(
+            "--skip-validated",
+            action="store_const",
+            const=True,
+            help="don't revalidate objects unchanged since a previous run",
+            dest="SCRAPE_SKIP_VALIDATED",
+        )
 
         # settings overrides
         self.add_argument("--datadir", help="data directory", dest="SCRAPED_DATA_DIR")
+        self.add_argument(
+            "--datadir-format",
+            choices=("files", "segments"),
+            help="write one file per object or per-type JSONL segments",
+            dest="SCRAPED_DATA_FORMAT",
+        )
+        self.add_argument(
+            "--no-datadir",
+            action="store_const",
+            const=False,
+            help="don't write scraped objects to the datadir, requires --pipeline",
+            dest="SCRAPE_WRITE_DATADIR",
+        )
+        self.add_argument(
+            "--pipeline",
+            action="store_const",
+            const=True,
+            help="import objects while scraping instead of once scraping is done",
+            dest="IMPORT_PIPELINE",
+        )
+        self.add_argument(
+            "--copy",
+            action="store_const",
+            const=True,
+            help="insert related rows with PostgreSQL's COPY",
+            dest="IMPORT_COPY",
+        )
         self.add_argument("--cachedir", help="cache directory", dest="CACHE_DIR")
+        self.add_argument(
+            "--revalidate",
+            action="store_const",
+            const=True,
+            help="revalidate cached pages with conditional requests",
+            dest="CACHE_REVALIDATE",
+        )
         self.add_argument(
             "-r", "--rpm", help="scraper rpm", type=int, dest="SCRAPELIB_RPM"
         )
+        self.add_argument(
+            "--adaptive-rpm",
+            action="store_const",
+            const=True,
+            help="tune the rate per host, starting from --rpm",
+            dest="SCRAPE_ADAPTIVE_RPM",
+        )
         self.add_argument(
             "--timeout", help="scraper timeout", type=int, dest="SCRAPELIB_TIMEOUT"
         )
@@ -190,14 +366,18 @@ class Command(BaseCommand):
             + "division_id or classification."
         )
 
-    def do_scrape(self, juris, args, scrapers):
+    def prepare_datadir(self, args):
         # make output and cache dirs
         utils.makedirs(settings.CACHE_DIR)
         datadir = os.path.join(settings.SCRAPED_DATA_DIR, args.module)
         utils.makedirs(datadir)
-        # clear json from data dir
-        for f in glob.glob(datadir + "/*.json"):
+        # clear json & segments from data dir
+        for f in glob.glob(datadir + "/*.json") + glob.glob(datadir + "/*.jsonl"):
             os.remove(f)
+        return datadir
+
+    def do_scrape(self, juris, args, scrapers):
+        datadir = self.prepare_datadir(args)
 
         report = {}
 
@@ -207,16 +387,98 @@ class Command(BaseCommand):
         )
         report["jurisdiction"] = jscraper.do_scrape()
 
-        for scraper_name, scrape_args in scrapers.items():
-            ScraperCls = juris.scrapers[scraper_name]
-            scraper = ScraperCls(
-                juris, datadir, strict_validation=args.strict, fastmode=args.fastmode
-            )
-            report[scraper_name] = scraper.do_scrape(**scrape_args)
+        if getattr(args, "scrape_workers", 1) > 1 and len(scrapers) > 1:
+            # scrapers write disjoint files, so each can run in its own process
+            report.update(self.run_scraper_processes(juris, args, scrapers, datadir))
+        else:
+            for scraper_name, scrape_args in scrapers.items():
+                report[scraper_name] = run_scraper(
+                    juris,
+                    scraper_name,
+                    datadir,
+                    args.strict,
+                    args.fastmode,
+                    scrape_args,
+                    {},
+                )
 
         return report
 
-    def do_import(self, juris, args):
+    def run_scraper_processes(self, juris, args, scrapers, datadir):
+        """
+        run each scraper in its own process, args.scrape_workers at a time
+
+        If a scraper fails the running ones are terminated and its exception
+        is raised right away, instead of once they are done.
+        """
+        pending = list(scrapers.items())
+        # connection the result comes through -> (scraper name, process)
+        running = {}
+        results = {}
+        try:
+            while pending or running:
+                while pending and len(running) < args.scrape_workers:
+                    scraper_name, scrape_args = pending.pop(0)
+                    receiver, sender = multiprocessing.Pipe(duplex=False)
+                    process = multiprocessing.Process(
+                        target=scraper_process,
+                        args=(
+                            sender,
+                            juris,
+                            scraper_name,
+                            datadir,
+                            args.strict,
+                            args.fastmode,
+                            scrape_args,
+                            self.overrides,
+                        ),
+                    )
+                    process.start()
+                    sender.close()
+                    running[receiver] = (scraper_name, process)
+
+                for receiver in multiprocessing.connection.wait(list(running)):
+                    scraper_name, process = running.pop(receiver)
+                    try:
+                        ok, result, tb = receiver.recv()
+                    except EOFError:
+                        process.join()
+                        raise ScrapeError(
+                            "scraper {} exited with code {}".format(
+                                scraper_name, process.exitcode
+                            )
+                        )
+                    process.join()
+                    if not ok:
+                        raise result from RemoteTraceback(tb)
+                    results[scraper_name] = result
+        except BaseException:
+            # don't wait for the other scrapers, which may run for hours
+            for _, process in running.values():
+                process.terminate()
+            for _, process in running.values():
+                process.join()
+            raise
+
+        return OrderedDict((scraper_name, results[scraper_name]) for scraper_name in scrapers)
+
+    def do_validate(self, args):
+        """validate the whole datadir, the post-pass for deferred validation"""
+        datadir = os.path.join(settings.SCRAPED_DATA_DIR, args.module)
+        count, errors = validate_datadir(datadir)
+        logger = logging.getLogger("pupa")
+        for error in errors:
+            logger.warning(error)
+        if errors and args.strict:
+            raise ScrapeValueError(
+                "deferred validation found {} invalid objects, first: {}".format(
+                    len(errors), errors[0]
+                )
+            )
+        return {"objects": count, "errors": len(errors)}
+
+    def get_importers(self, juris):
+        """importers of the enabled types by name, in the order they must run"""
         # import inside here because to avoid loading Django code unnecessarily
         from pupa.importers import (
             JurisdictionImporter,
@@ -228,10 +490,6 @@ class Command(BaseCommand):
             VoteEventImporter,
             EventImporter,
         )
-        from pupa.reports import generate_session_report
-        from pupa.models import SessionDataQualityReport
-
-        datadir = os.path.join(settings.SCRAPED_DATA_DIR, args.module)
 
         juris_importer = JurisdictionImporter(juris.jurisdiction_id)
         org_importer = OrganizationImporter(juris.jurisdiction_id)
@@ -254,34 +512,133 @@ class Command(BaseCommand):
             vote_event_importer,
         )
 
+        importers = OrderedDict([("jurisdictions", juris_importer)])
+        if settings.ENABLE_PEOPLE_AND_ORGS:
+            importers["organizations"] = org_importer
+            importers["people"] = person_importer
+            importers["posts"] = post_importer
+            importers["memberships"] = membership_importer
+        if settings.ENABLE_BILLS:
+            importers["bills"] = bill_importer
+        if settings.ENABLE_EVENTS:
+            importers["events"] = event_importer
+        if settings.ENABLE_VOTES:
+            importers["vote events"] = vote_event_importer
+        return importers
+
+    def do_import(self, juris, args):
+        datadir = os.path.join(settings.SCRAPED_DATA_DIR, args.module)
+        importers = self.get_importers(juris)
+
         report = {}
 
         with transaction.atomic():
-            print("import jurisdictions...")
-            report.update(juris_importer.import_directory(datadir))
-            if settings.ENABLE_PEOPLE_AND_ORGS:
-                print("import organizations...")
-                report.update(org_importer.import_directory(datadir))
-                print("import people...")
-                report.update(person_importer.import_directory(datadir))
-                print("import posts...")
-                report.update(post_importer.import_directory(datadir))
-                print("import memberships...")
-                report.update(membership_importer.import_directory(datadir))
-            if settings.ENABLE_BILLS:
-                print("import bills...")
-                report.update(bill_importer.import_directory(datadir))
-            if settings.ENABLE_EVENTS:
-                print("import events...")
-                report.update(event_importer.import_directory(datadir))
-            if settings.ENABLE_VOTES:
-                print("import vote events...")
-                report.update(vote_event_importer.import_directory(datadir))
+            for name, importer in importers.items():
+                print("import {}...".format(name))
+                report.update(importer.import_directory(datadir))
+
+        self.update_session_reports(importers)
+        return report
+
+    def do_pipeline(self, juris, args, scrapers):
+        """
+        scrape and import at once, each type is imported as soon as no scraper
+        still running can produce more of it
+        """
+        datadir = self.prepare_datadir(args)
+        importers = self.get_importers(juris)
+        pipeline = ImportPipeline(
+            [importer._type for importer in importers.values()],
+            settings.IMPORT_PIPELINE_QUEUE_SIZE,
+        )
+
+        instances = OrderedDict(
+            [
+                (
+                    "jurisdiction",
+                    JurisdictionScraper(
+                        juris,
+                        datadir,
+                        strict_validation=args.strict,
+                        fastmode=args.fastmode,
+                    ),
+                )
+            ]
+        )
+        for scraper_name in scrapers:
+            instances[scraper_name] = juris.scrapers[scraper_name](
+                juris, datadir, strict_validation=args.strict, fastmode=args.fastmode
+            )
+        for scraper_name, scraper in instances.items():
+            scraper.output_sink = pipeline.sink(scraper_name)
+            pipeline.expect(scraper_name, scraper.produces)
+
+        scrape_report = OrderedDict((scraper_name, None) for scraper_name in instances)
+
+        def scrape(scraper_name):
+            scrape_args = scrapers.get(scraper_name, {})
+            scrape_report[scraper_name] = instances[scraper_name].do_scrape(
+                **scrape_args
+            )
+            pipeline.finished(scraper_name)
+
+        def scrape_all():
+            try:
+                scrape("jurisdiction")
+            except BaseException as exc:
+                pipeline.abort(exc)
+                return
+
+            # threads rather than processes, the objects go to this process
+            pool = ThreadPoolExecutor(
+                max_workers=max(getattr(args, "scrape_workers", 1), 1)
+            )
+            futures = [pool.submit(scrape, name) for name in scrapers]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException as exc:
+                # the importers stop at once, scrapers still running stop at
+                # their next save and those yet to start never do
+                pipeline.abort(exc)
+                for future in futures:
+                    future.cancel()
+            finally:
+                # don't wait for the running scrapers after an error
+                pool.shutdown(wait=False)
+
+        scrape_thread = threading.Thread(target=scrape_all)
+        scrape_thread.start()
+
+        import_report = {}
+        try:
+            with transaction.atomic():
+                for name, importer in importers.items():
+                    objects = pipeline.objects(importer._type)
+                    print("import {}...".format(name))
+                    import_report.update(importer.import_data(objects))
+                # a scraper may still fail after the last import, which has
+                # to be rolled back then
+                scrape_thread.join()
+                if pipeline.error is not None:
+                    raise pipeline.error
+        except BaseException as exc:
+            pipeline.abort(exc)
+            raise
+        finally:
+            scrape_thread.join()
+
+        self.update_session_reports(importers)
+        return scrape_report, import_report
+
+    def update_session_reports(self, importers):
+        from pupa.reports import generate_session_report
+        from pupa.models import SessionDataQualityReport
 
         # compile info on all sessions that were updated in this run
         seen_sessions = set()
-        seen_sessions.update(bill_importer.get_seen_sessions())
-        seen_sessions.update(vote_event_importer.get_seen_sessions())
+        for importer in importers.values():
+            seen_sessions.update(importer.get_seen_sessions())
         for session in seen_sessions:
             new_report = generate_session_report(session)
             with transaction.atomic():
@@ -290,8 +647,6 @@ class Command(BaseCommand):
                 ).delete()
                 new_report.save()
 
-        return report
-
     def check_session_list(self, juris):
         # if get_session_list is not defined, let it slide
         if not hasattr(juris, "get_session_list"):
@@ -330,6 +685,7 @@ class Command(BaseCommand):
         overrides.update(
             {key: value for key, value in vars(args).items() if value is not None}
         )
+        self.overrides = overrides
         with override_settings(settings, overrides):
             return self.do_handle(args, other, juris)
 
@@ -386,10 +742,26 @@ class Command(BaseCommand):
         if "scrape" in args.actions:
             self.check_session_list(juris)
 
+        policy = parse_validation_policy(settings.SCRAPE_VALIDATION)[0]
+
+        pipelined = settings.IMPORT_PIPELINE and {"scrape", "import"} <= set(
+            args.actions
+        )
+        if pipelined and policy == "deferred":
+            raise CommandError("deferred validation can't be used when pipelining")
+        if not settings.SCRAPE_WRITE_DATADIR and not pipelined:
+            raise CommandError("the datadir may only be skipped when pipelining")
+
         try:
-            if "scrape" in args.actions:
+            if pipelined:
+                report["scrape"], report["import"] = self.do_pipeline(
+                    juris, args, scrapers
+                )
+            elif "scrape" in args.actions:
                 report["scrape"] = self.do_scrape(juris, args, scrapers)
-            if "import" in args.actions:
+                if policy == "deferred":
+                    report["validation"] = self.do_validate(args)
+            if "import" in args.actions and not pipelined:
                 report["import"] = self.do_import(juris, args)
             report["success"] = True
         except Exception as exc:
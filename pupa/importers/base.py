@@ -3,6 +3,8 @@ import copy
 import glob
 import json
 import logging
+import itertools
+from collections import Counter, defaultdict
 
 from django.db.models import Q
 from django.db.models.signals import post_save
@@ -11,9 +13,11 @@ from django.contrib.contenttypes.models import ContentType
 from opencivicdata.legislative.models import LegislativeSession
 from pupa import settings
 from pupa.exceptions import DuplicateItemError
-from pupa.utils import get_pseudo_id, utcnow
+from pupa.utils import get_pseudo_id, _get_frozen_pseudo_id, utcnow
+from pupa.utils.segments import read_segments
 from pupa.exceptions import UnresolvedIdError, DataImportError
 from pupa.models import Identifier
+from .pgcopy import copy_insert
 
 
 def omnihash(obj):
@@ -28,9 +32,147 @@ def omnihash(obj):
         return hash(obj)
 
 
+class _Unmatchable(Exception):
+    """items that can't be compared by their keys, see items_differ"""
+
+
+def _freeze(value):
+    """a hashable value equal to another's freeze exactly when the values are equal"""
+    if isinstance(value, dict):
+        return (dict, frozenset((k, _freeze(v)) for k, v in value.items()))
+    elif isinstance(value, list):
+        return (list, tuple(_freeze(v) for v in value))
+    elif isinstance(value, tuple):
+        return (tuple, tuple(_freeze(v) for v in value))
+    elif isinstance(value, (set, frozenset)):
+        return (set, frozenset(_freeze(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        raise _Unmatchable(value)
+    return value
+
+
+def _multiset(keys):
+    """hashable multiset of keys, equal to another's exactly when the counts are"""
+    if len(keys) < 2:
+        # a cheaper form for the common one item lists, never equal to the
+        # other form since multisets of different sizes differ anyway
+        return tuple(keys)
+    return frozenset(Counter(keys).items())
+
+
+def _collect_fields(jsonitems, subfield_dict, path, fields):
+    """record the keys of the json items at each path, which must all be the same"""
+    for item in jsonitems:
+        keys = frozenset(item)
+        if fields.setdefault(path, keys) != keys:
+            raise _Unmatchable(path)
+        for k, (_, _, subsubfields) in subfield_dict.items():
+            if k not in item:
+                raise _Unmatchable(path + (k,))
+            _collect_fields(item[k], subsubfields, path + (k,), fields)
+
+
+def _plain_fields(subfield_dict, path, fields, exclude=()):
+    """the fields of the items at path that are part of their keys"""
+    return sorted(fields.get(path, frozenset()) - set(subfield_dict) - set(exclude))
+
+
+def _db_item_key(dbitem, subfield_dict, path, fields, ordered, exclude=()):
+    """key of a db item, its fields and subitems but not its own order"""
+    plain = _plain_fields(subfield_dict, path, fields, exclude)
+    return (
+        tuple(_freeze(getattr(dbitem, k)) for k in plain),
+        tuple(
+            _db_items_key(
+                getattr(dbitem, k).all(),
+                subfield_dict[k][2],
+                path + (k,),
+                fields,
+                ordered,
+            )
+            for k in sorted(subfield_dict)
+        ),
+    )
+
+
+def _json_item_key(item, subfield_dict, path, fields, ordered, exclude=()):
+    """key of a json item, equal to a db item's exactly when they match"""
+    plain = _plain_fields(subfield_dict, path, fields, exclude)
+    return (
+        tuple(_freeze(item.get(k, None)) for k in plain),
+        tuple(
+            _json_items_key(item[k], subfield_dict[k][2], path + (k,), fields, ordered)
+            for k in sorted(subfield_dict)
+        ),
+    )
+
+
+def _db_items_key(dbitems, subfield_dict, path, fields, ordered):
+    """multiset of the keys of dbitems, with their order if they have one"""
+    keys = []
+    for dbitem in dbitems:
+        key = _db_item_key(dbitem, subfield_dict, path, fields, ordered)
+        order = getattr(dbitem, "order", None)
+        if ordered.setdefault(path, order is not None) != (order is not None):
+            # some items are ordered and others aren't
+            raise _Unmatchable(path)
+        keys.append(key if order is None else (key, int(order)))
+    return _multiset(keys)
+
+
+def _json_items_key(jsonitems, subfield_dict, path, fields, ordered):
+    """multiset of the keys of jsonitems, matching _db_items_key"""
+    keys = [
+        _json_item_key(item, subfield_dict, path, fields, ordered)
+        for item in jsonitems
+    ]
+    if ordered.get(path):
+        # an item's position is that of the first item equal to it, which can
+        # only differ from its index if an earlier item has the same key
+        counts = Counter(keys)
+        positions = {}
+        for i, (key, item) in enumerate(zip(keys, jsonitems)):
+            if counts[key] > 1:
+                keys[i] = (key, positions.setdefault(_freeze(item), i))
+            else:
+                keys[i] = (key, i)
+    return _multiset(keys)
+
+
+def _pseudo_value(value):
+    """a pseudo id spec value or database value, as they compare in a query"""
+    return value if value is None else str(value)
+
+
 def items_differ(jsonitems, dbitems, subfield_dict):
     """check whether or not jsonitems and dbitems differ"""
 
+    # short circuit common cases
+    if len(jsonitems) == len(dbitems) == 0:
+        # both are empty
+        return False
+    elif len(jsonitems) != len(dbitems):
+        # if lengths differ, they're definitely different
+        return True
+
+    # reduce both sides to multisets of hashable keys built from the fields the
+    # json items have, which only works if all json items at a level have the
+    # same fields and the db items at a level are either all ordered or not
+    try:
+        fields = {}
+        _collect_fields(jsonitems, subfield_dict, (), fields)
+        ordered = {}
+        dbkey = _db_items_key(dbitems, subfield_dict, (), fields, ordered)
+        return _json_items_key(jsonitems, subfield_dict, (), fields, ordered) != dbkey
+    except _Unmatchable:
+        return _items_differ_pairwise(jsonitems, dbitems, subfield_dict)
+
+
+def _items_differ_pairwise(jsonitems, dbitems, subfield_dict):
+    """items_differ by matching each db item against the remaining json items"""
+
     # short circuit common cases
     if len(jsonitems) == len(dbitems) == 0:
         # both are empty
@@ -59,7 +201,9 @@ def items_differ(jsonitems, dbitems, subfield_dict):
                 for k in subfield_dict:
                     jsonsubitems = jsonitem[k]
                     dbsubitems = list(getattr(dbitem, k).all())
-                    if items_differ(jsonsubitems, dbsubitems, subfield_dict[k][2]):
+                    if _items_differ_pairwise(
+                        jsonsubitems, dbsubitems, subfield_dict[k][2]
+                    ):
                         break
                 else:
                     # if the dbitem sets 'order', then the order matters
@@ -95,6 +239,9 @@ class BaseImporter(object):
         limit_spec(spec)                [optional, required if pseudo_ids are used]
         prepare_for_db(data)            [optional]
         postimport()                    [optional]
+        match_key(data)                 [optional, required if batch_lookups]
+        get_objects(keys)               [optional, required if batch_lookups]
+        stale_keys(key)                 [optional]
     """
 
     _type = None
@@ -103,13 +250,27 @@ class BaseImporter(object):
     preserve_order = set()
     merge_related = {}
     cached_transformers = {}
+    # look up existing objects a batch of items at a time with get_objects,
+    # items must not depend on each other in prepare_for_db
+    batch_lookups = False
+    # related fields get_object and limit_spec look objects up by, pending
+    # related objects are created before such a lookup if any are of these
+    lookup_related = ()
 
     def __init__(self, jurisdiction_id):
         self.jurisdiction_id = jurisdiction_id
         self.json_to_db_id = {}
         self.duplicates = {}
         self.pseudo_id_cache = {}
+        # pseudo id -> ids of its several or no matches, from resolve_pseudo_ids
+        self.pseudo_id_matches = {}
         self.session_cache = {}
+        # match_key -> existing object (or None) looked up with the current batch
+        self.matched_objects = {}
+        # (object, related) of inserted objects whose related objects are pending
+        self.pending_related = []
+        # whether any of those have lookup_related objects
+        self.lookup_related_pending = False
         self.logger = logging.getLogger("pupa")
         self.info = self.logger.info
         self.debug = self.logger.debug
@@ -132,9 +293,53 @@ class BaseImporter(object):
     def prepare_for_db(self, data):
         return data
 
+    def match_key(self, data):
+        """hashable key identifying the object get_object would return, or None"""
+        return None
+
+    def get_objects(self, keys):
+        """
+        map the keys to existing objects (or None if there is none), in a few queries
+
+        keys that can't be decided (e.g. several matches) are left out, such
+        items go through get_object
+        """
+        return {}
+
+    def stale_keys(self, key):
+        """
+        keys whose looked up objects are out of date once an object with the
+        given match key is created, they go through get_object instead
+        """
+        return (key,)
+
     def postimport(self):
         pass
 
+    def pseudo_id_references(self, data):
+        """
+        (importer, json_id) of the ids prepare_for_db will resolve for an item,
+        to resolve their pseudo ids together beforehand
+        """
+        return ()
+
+    def pseudo_id_lookup(self, spec):
+        """
+        how limit_spec(spec) can be looked up along with other specs
+
+        returns (filters, fields) where the objects limit_spec(spec) matches
+        are those matching the filters dict, and for each key of spec, having
+        its value in one of the fields listed for it in the fields dict, or
+        None if spec has to be looked up on its own
+        """
+        limited = self.limit_spec(dict(spec))
+        if isinstance(limited, Q) or any(
+            key not in limited or limited[key] != value for key, value in spec.items()
+        ):
+            return None
+        filters = {key: value for key, value in limited.items() if key not in spec}
+        return filters, {key: (key,) for key in spec}
+
     def resolve_json_id(self, json_id, allow_no_match=False):
         """
         Given an id found in scraped JSON, return a DB id for the object.
@@ -156,14 +361,17 @@ class BaseImporter(object):
             # keep caches of all the pseudo-ids to avoid doing 1000s of lookups
             # during import
             if json_id not in self.pseudo_id_cache:
-                spec = get_pseudo_id(json_id)
-                spec = self.limit_spec(spec)
-
-                if isinstance(spec, Q):
-                    objects = self.model_class.objects.filter(spec)
-                else:
-                    objects = self.model_class.objects.filter(**spec)
-                ids = {each.id for each in objects}
+                ids = self.pseudo_id_matches.pop(json_id, None)
+                if ids is None:
+                    self.flush_lookup_related()
+                    spec = get_pseudo_id(json_id)
+                    spec = self.limit_spec(spec)
+
+                    if isinstance(spec, Q):
+                        objects = self.model_class.objects.filter(spec)
+                    else:
+                        objects = self.model_class.objects.filter(**spec)
+                    ids = {each.id for each in objects}
                 if len(ids) == 1:
                     self.pseudo_id_cache[json_id] = ids.pop()
                     errmsg = None
@@ -195,6 +403,90 @@ class BaseImporter(object):
         except KeyError:
             raise UnresolvedIdError("cannot resolve id: {}".format(json_id))
 
+    def resolve_pseudo_ids(self, json_ids):
+        """
+        resolve pseudo ids into the cache with a query per chunk of ids of the
+        same shape, resolve_json_id then handles those with several or no
+        matches as if it had looked them up itself
+        """
+        self.flush_lookup_related()
+        groups = defaultdict(list)
+        for json_id in json_ids:
+            if json_id in self.pseudo_id_cache or json_id in self.pseudo_id_matches:
+                continue
+            spec = _get_frozen_pseudo_id(json_id)
+            # filter(field=None) isn't the same as field__in=[None]
+            if any(value is None for value in spec.values()):
+                continue
+            lookup = self.pseudo_id_lookup(spec)
+            if lookup is None:
+                continue
+            filters, fields = lookup
+            try:
+                shape = (
+                    frozenset(filters.items()),
+                    tuple(sorted((key, tuple(paths)) for key, paths in fields.items())),
+                )
+                hash((shape, tuple(spec.values())))
+            except TypeError:
+                continue
+            groups[shape].append((json_id, spec))
+
+        for (filters, fields), members in groups.items():
+            paths = sorted({path for _, key_paths in fields for path in key_paths})
+            members = iter(members)
+            while True:
+                chunk = list(itertools.islice(members, settings.IMPORT_BATCH_SIZE))
+                if not chunk:
+                    break
+                condition = Q(**dict(filters))
+                for key, key_paths in fields:
+                    values = {spec[key] for _, spec in chunk}
+                    any_path = Q()
+                    for path in key_paths:
+                        any_path |= Q(**{path + "__in": values})
+                    condition &= any_path
+
+                # ids by the value of each key an object (row) matches
+                matches = defaultdict(set)
+                rows = self.model_class.objects.filter(condition).values_list(
+                    "id", *paths
+                )
+                for row in rows:
+                    row_values = dict(zip(paths, row[1:]))
+                    for key_values in itertools.product(
+                        *(
+                            {_pseudo_value(row_values[path]) for path in key_paths}
+                            for _, key_paths in fields
+                        )
+                    ):
+                        matches[key_values].add(row[0])
+
+                for json_id, spec in chunk:
+                    ids = matches.get(
+                        tuple(_pseudo_value(spec[key]) for key, _ in fields), set()
+                    )
+                    if len(ids) == 1:
+                        self.pseudo_id_cache[json_id] = next(iter(ids))
+                    else:
+                        self.pseudo_id_matches[json_id] = set(ids)
+
+    def _resolve_batches(self, items):
+        """resolve the pseudo ids items refer to a batch of items at a time"""
+        items = iter(items)
+        batch = True
+        while batch:
+            batch = list(itertools.islice(items, settings.IMPORT_BATCH_SIZE))
+            json_ids = defaultdict(set)
+            for _, data in batch:
+                for importer, json_id in self.pseudo_id_references(data):
+                    # objects of our own type may still be imported in between
+                    if json_id and json_id.startswith("~") and importer is not self:
+                        json_ids[importer].add(json_id)
+            for importer, importer_ids in json_ids.items():
+                importer.resolve_pseudo_ids(importer_ids)
+            yield from batch
+
     def import_directory(self, datadir):
         """import a JSON directory into the database"""
 
@@ -203,6 +495,8 @@ class BaseImporter(object):
             for fname in glob.glob(os.path.join(datadir, self._type + "_*.json")):
                 with open(fname) as f:
                     yield json.load(f)
+            # and anything written in the segment format
+            yield from read_segments(datadir, self._type)
 
         return self.import_data(json_stream())
 
@@ -242,11 +536,20 @@ class BaseImporter(object):
             },
         }
 
-        for json_id, data in self._prepare_imports(data_items):
-            obj_id, what = self.import_item(data)
+        items = self._resolve_batches(self._prepare_imports(data_items))
+        if self.batch_lookups:
+            items = self._match_batches(items)
+        else:
+            items = ((json_id, self.prepare_item(data)) for json_id, data in items)
+
+        for json_id, data in items:
+            obj_id, what = self.import_prepared_item(data)
             self.json_to_db_id[json_id] = obj_id
             record["records"][what].append(obj_id)
             record[what] += 1
+            if len(self.pending_related) >= settings.IMPORT_BATCH_SIZE:
+                self.flush_related()
+        self.flush_related()
 
         # all objects are loaded, a perfect time to do
         # inter-object resolution and other tasks
@@ -256,21 +559,78 @@ class BaseImporter(object):
 
         return {self._type: record}
 
-    def import_item(self, data):
-        """function used by import_data"""
-        what = "noop"
+    def _match_batches(self, items):
+        """prepare items a batch at a time, looking up their objects together"""
+        items = iter(items)
+        batch = True
+        while batch:
+            batch = [
+                (json_id, self.prepare_item(data))
+                for json_id, data in itertools.islice(items, settings.IMPORT_BATCH_SIZE)
+            ]
+            keys = set(self.match_key(data) for _, data in batch)
+            keys.discard(None)
+            self.matched_objects = self.get_objects(keys) if keys else {}
+            yield from batch
+
+    def find_object(self, data):
+        """the existing object for data, or None"""
+        key = self.match_key(data) if self.matched_objects else None
+        if key is not None and key in self.matched_objects:
+            # only usable once, an earlier item of the batch may have created
+            # or claimed a matching object since the batch was looked up
+            return self.matched_objects.pop(key)
+        self.flush_lookup_related()
+        try:
+            return self.get_object(data)
+        except self.model_class.DoesNotExist:
+            return None
 
+    def prepare_item(self, data):
         # remove the JSON _id (may still be there if called directly)
         data.pop("_id", None)
 
         # add fields/etc.
         data = self.apply_transformers(data)
-        data = self.prepare_for_db(data)
+        return self.prepare_for_db(data)
 
-        try:
-            obj = self.get_object(data)
-        except self.model_class.DoesNotExist:
-            obj = None
+    def import_item(self, data):
+        """function used by import_data"""
+        result = self.import_prepared_item(self.prepare_item(data))
+        self.flush_related()
+        return result
+
+    def flush_related(self):
+        """
+        create the related objects of every object inserted since the last flush
+
+        post_save is sent for each of those objects here, once their related
+        objects exist. Objects are flushed every IMPORT_BATCH_SIZE inserts, and
+        before lookups that depend on them (see lookup_related), so a handler
+        may run after later objects of the import were inserted.
+        """
+        pending, self.pending_related = self.pending_related, []
+        self.lookup_related_pending = False
+        if not pending:
+            return
+        self._create_related_levels(
+            [(obj, related, None) for obj, related in pending], self.related_models
+        )
+
+        # Fire post-save signal after related objects are created to allow
+        # for handlers make use of related objects
+        for obj, _ in pending:
+            post_save.send(sender=self.model_class, instance=obj, created=True)
+
+    def flush_lookup_related(self):
+        """flush_related if a lookup may depend on the pending related objects"""
+        if self.lookup_related_pending:
+            self.flush_related()
+
+    def import_prepared_item(self, data):
+        what = "noop"
+
+        obj = self.find_object(data)
 
         # remove pupa_id which does not belong in the OCD data models
         pupa_id = data.pop("pupa_id", None)
@@ -309,11 +669,14 @@ class BaseImporter(object):
                 raise DataImportError(
                     "{} while importing {} as {}".format(e, data, self.model_class)
                 )
-            self._create_related(obj, related, self.related_models)
-
-            # Fire post-save signal after related objects are created to allow
-            # for handlers make use of related objects
-            post_save.send(sender=self.model_class, instance=obj, created=True)
+            # related objects are created with those of other new objects, see
+            # flush_related
+            self.pending_related.append((obj, related))
+            if any(related[field] for field in self.lookup_related):
+                self.lookup_related_pending = True
+            if self.matched_objects:
+                for key in self.stale_keys(self.match_key(data)):
+                    self.matched_objects.pop(key, None)
 
         if pupa_id:
             Identifier.objects.get_or_create(
@@ -384,6 +747,16 @@ class BaseImporter(object):
 
                 # import anything that made it to new_items in the usual fashion
                 self._create_related(obj, {field: new_items}, subfield_dict)
+            elif (
+                do_delete
+                and do_update
+                and settings.IMPORT_RELATED_DELTA
+                and self._apply_related_delta(
+                    obj, field, items, dbitems, subfield_dict
+                )
+            ):
+                # only the rows that changed were written
+                updated = True
             else:
                 # default logic is to just wipe and recreate subobjects
                 if do_delete:
@@ -395,47 +768,149 @@ class BaseImporter(object):
 
         return updated
 
-    def _create_related(self, obj, related, subfield_dict):
+    def _apply_related_delta(self, obj, field, items, dbitems, subfield_dict):
+        """
+        bring the rows of a related field in line with items by deleting the rows
+        that have no matching item, creating the items with no matching row and
+        renumbering the rows of preserve_order fields that moved
+
+        returns False, having written nothing, if rows and items can't be matched
+        """
+        Subtype, reverse_id_field, subsubdict = subfield_dict[field]
+        preserve_order = field in self.preserve_order
+        # the order of a preserve_order field's items is their position, which
+        # is renumbered below, so that a moved item keeps its row
+        exclude = ("order",) if preserve_order else ()
+        try:
+            fields = {}
+            _collect_fields(items, subsubdict, (), fields)
+            ordered = {}
+            # db keys first, they tell which subitems are ordered
+            dbkeys = [
+                _db_item_key(dbitem, subsubdict, (), fields, ordered, exclude)
+                for dbitem in dbitems
+            ]
+            keys = [
+                _json_item_key(item, subsubdict, (), fields, ordered, exclude)
+                for item in items
+            ]
+        except _Unmatchable:
+            return False
+
+        unmatched = defaultdict(list)
+        for dbitem, key in zip(dbitems, dbkeys):
+            unmatched[key].append(dbitem)
+
+        new_items = []
+        new_orders = []
+        moved = []
+        for order, (item, key) in enumerate(zip(items, keys)):
+            candidates = unmatched.get(key)
+            if not candidates:
+                new_items.append(item)
+                new_orders.append(order)
+                continue
+            # prefer a row that is already in place
+            dbitem = candidates[-1]
+            if preserve_order:
+                for candidate in candidates:
+                    if candidate.order is not None and int(candidate.order) == order:
+                        dbitem = candidate
+                        break
+            candidates.remove(dbitem)
+            if preserve_order and (
+                dbitem.order is None or int(dbitem.order) != order
+            ):
+                dbitem.order = order
+                moved.append(dbitem)
+
+        removed = [dbitem.id for dbitems in unmatched.values() for dbitem in dbitems]
+        if removed:
+            Subtype.objects.filter(id__in=removed).delete()
+        if moved:
+            Subtype.objects.bulk_update(moved, ["order"])
+        if new_items:
+            self._create_related(
+                obj, {field: new_items}, subfield_dict, orders={field: new_orders}
+            )
+        return True
+
+    def _create_related(self, obj, related, subfield_dict, orders=None):
         """
         create DB objects related to a base object
             obj:            a base object to create related
             related:        dict mapping field names to lists of related objects
             subfield_list:  where to get the next layer of subfields
+            orders:         positions of the items of preserve_order fields, by
+                            field, when not all of a field's items are created
         """
-        for field, items in related.items():
+        self._create_related_levels([(obj, related, orders)], subfield_dict)
+
+    def _create_related_levels(self, parents, subfield_dict):
+        """
+        create the related objects of many base objects a level at a time, with
+        one bulk insert per field and level however many objects there are
+            parents:        list of (obj, related, orders) as in _create_related
+            subfield_dict:  where to get the next layer of subfields
+        """
+        for field, (Subtype, reverse_id_field, subsubdict) in subfield_dict.items():
             subobjects = []
             all_subrelated = []
-            Subtype, reverse_id_field, subsubdict = subfield_dict[field]
-            for order, item in enumerate(items):
-                # pull off 'subrelated' (things that are related to this obj)
-                subrelated = {}
-                for subfield in subsubdict:
-                    subrelated[subfield] = item.pop(subfield)
-
-                if field in self.preserve_order:
-                    item["order"] = order
-
-                item[reverse_id_field] = obj.id
-
-                try:
-                    subobjects.append(Subtype(**item))
-                    all_subrelated.append(subrelated)
-                except Exception as e:
-                    raise DataImportError(
-                        "{} while importing {} as {}".format(e, item, Subtype)
-                    )
+            for obj, related, orders in parents:
+                if field not in related:
+                    continue
+                items = related[field]
+                positions = (orders or {}).get(field, range(len(items)))
+                for order, item in zip(positions, items):
+                    # pull off 'subrelated' (things that are related to this obj)
+                    subrelated = {}
+                    for subfield in subsubdict:
+                        subrelated[subfield] = item.pop(subfield)
+
+                    if field in self.preserve_order:
+                        item["order"] = order
+
+                    item[reverse_id_field] = obj.id
+
+                    try:
+                        subobjects.append(Subtype(**item))
+                        all_subrelated.append(subrelated)
+                    except Exception as e:
+                        raise DataImportError(
+                            "{} while importing {} as {}".format(e, item, Subtype)
+                        )
+
+            if not subobjects:
+                continue
 
             # add all subobjects at once (really great for actions & votes)
             try:
-                Subtype.objects.bulk_create(subobjects)
+                self._bulk_insert(Subtype, subobjects)
             except Exception as e:
                 raise DataImportError(
                     "{} while importing {} as {}".format(e, subobjects, Subtype)
                 )
 
-            # after import the subobjects, import their subsubobjects
-            for subobj, subrel in zip(subobjects, all_subrelated):
-                self._create_related(subobj, subrel, subsubdict)
+            # after import the subobjects, import their subsubobjects, a level
+            # at a time too
+            if subsubdict:
+                self._create_related_levels(
+                    [
+                        (subobj, subrel, None)
+                        for subobj, subrel in zip(subobjects, all_subrelated)
+                    ],
+                    subsubdict,
+                )
+
+    def _bulk_insert(self, Subtype, subobjects):
+        """insert new related objects, through COPY when enabled and possible"""
+        if (
+            settings.IMPORT_COPY
+            and len(subobjects) >= settings.IMPORT_COPY_MIN_ROWS
+            and copy_insert(Subtype, subobjects)
+        ):
+            return
+        Subtype.objects.bulk_create(subobjects)
 
     def lookup_obj_id(self, pupa_id, model):
         content_type = ContentType.objects.get_for_model(model)
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from opencivicdata.legislative.models import (
     Bill,
     RelatedBill,
@@ -16,6 +18,9 @@ from opencivicdata.legislative.models import (
 from .base import BaseImporter
 from ..exceptions import PupaInternalError
 
+# match_key of a bill scraped without a from_organization, which matches any
+UNSPECIFIED = object()
+
 
 class BillImporter(BaseImporter):
     _type = "bill"
@@ -44,6 +49,8 @@ class BillImporter(BaseImporter):
         ),
     }
     preserve_order = {"actions"}
+    batch_lookups = True
+    prefetch = ("actions__related_entities", "versions__links", "documents__links")
 
     def __init__(self, jurisdiction_id, org_importer, person_importer):
         super(BillImporter, self).__init__(jurisdiction_id)
@@ -58,16 +65,59 @@ class BillImporter(BaseImporter):
         if "from_organization_id" in bill:
             spec["from_organization_id"] = bill["from_organization_id"]
 
-        return self.model_class.objects.prefetch_related(
-            "actions__related_entities",
-            "versions__links",
-            "documents__links",
-        ).get(**spec)
+        return self.model_class.objects.prefetch_related(*self.prefetch).get(**spec)
+
+    def match_key(self, bill):
+        return (
+            bill["legislative_session_id"],
+            bill["identifier"],
+            bill.get("from_organization_id", UNSPECIFIED),
+        )
+
+    def stale_keys(self, key):
+        # a new bill is also one of the bills matching its identifier in any org
+        return (key, key[:2] + (UNSPECIFIED,))
+
+    def get_objects(self, keys):
+        candidates = defaultdict(list)
+        for bill in self.model_class.objects.filter(
+            legislative_session_id__in={key[0] for key in keys},
+            identifier__in={key[1] for key in keys},
+        ).prefetch_related(*self.prefetch):
+            candidates[bill.legislative_session_id, bill.identifier].append(bill)
+
+        objects = {}
+        for key in keys:
+            session_id, identifier, org_id = key
+            matches = [
+                bill
+                for bill in candidates[session_id, identifier]
+                if org_id is UNSPECIFIED or bill.from_organization_id == org_id
+            ]
+            # several matches are left to get_object, which raises
+            if len(matches) <= 1:
+                objects[key] = matches[0] if matches else None
+        return objects
 
     def limit_spec(self, spec):
         spec["legislative_session__jurisdiction_id"] = self.jurisdiction_id
         return spec
 
+    def pseudo_id_references(self, data):
+        yield self.org_importer, data.get("from_organization")
+        for action in data.get("actions", ()):
+            yield self.org_importer, action.get("organization_id")
+            for entity in action.get("related_entities", ()):
+                if "organization_id" in entity:
+                    yield self.org_importer, entity["organization_id"]
+                elif "person_id" in entity:
+                    yield self.person_importer, entity["person_id"]
+        for sponsor in data.get("sponsorships", ()):
+            if "person_id" in sponsor:
+                yield self.person_importer, sponsor["person_id"]
+            if "organization_id" in sponsor:
+                yield self.org_importer, sponsor["organization_id"]
+
     def prepare_for_db(self, data):
         data["legislative_session_id"] = self.get_session_id(
             data.pop("legislative_session")
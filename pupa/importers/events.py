@@ -93,6 +93,26 @@ class EventImporter(BaseImporter):
         # TODO: geocode here?
         return obj
 
+    def pseudo_id_references(self, data):
+        for participant in data.get("participants", ()):
+            if "person_id" in participant:
+                yield self.person_importer, participant["person_id"]
+            elif "organization_id" in participant:
+                yield self.org_importer, participant["organization_id"]
+
+        for item in data.get("agenda", ()):
+            for entity in item.get("related_entities", ()):
+                if "person_id" in entity:
+                    yield self.person_importer, entity["person_id"]
+                elif "organization_id" in entity:
+                    yield self.org_importer, entity["organization_id"]
+                elif "bill_id" in entity and entity["bill_id"].startswith("~"):
+                    bill = get_pseudo_id(entity["bill_id"])
+                    self.bill_importer.apply_transformers(bill)
+                    yield self.bill_importer, _make_pseudo_id(**bill)
+                elif "vote_event_id" in entity:
+                    yield self.vote_event_importer, entity["vote_event_id"]
+
     def prepare_for_db(self, data):
         data["jurisdiction_id"] = self.jurisdiction_id
         if data["location"]:
@@ -4,7 +4,7 @@ from opencivicdata.core.models import (
     MembershipLink,
 )
 from .base import BaseImporter
-from ..utils import get_pseudo_id
+from ..utils import _get_frozen_pseudo_id
 from ..exceptions import NoMembershipsError
 
 
@@ -46,10 +46,15 @@ class MembershipImporter(BaseImporter):
 
         return self.model_class.objects.get(**spec)
 
+    def pseudo_id_references(self, data):
+        yield self.org_importer, data.get("organization_id")
+        yield self.person_importer, data.get("person_id")
+        yield self.post_importer, data.get("post_id")
+
     def prepare_for_db(self, data):
         # check if the organization is not tied to a jurisdiction
         if data["organization_id"].startswith("~"):
-            pseudo_id = get_pseudo_id(data["organization_id"])
+            pseudo_id = _get_frozen_pseudo_id(data["organization_id"])
             is_party = pseudo_id.get("classification") == "party"
         else:
             # we have to assume it is not a party if we want to avoid
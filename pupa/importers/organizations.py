@@ -8,7 +8,7 @@ from opencivicdata.core.models import (
     OrganizationSource,
 )
 from .base import BaseImporter
-from ..utils import get_pseudo_id
+from ..utils import _get_frozen_pseudo_id
 from ..utils.topsort import Network
 from ..exceptions import UnresolvedIdError, PupaInternalError, SameOrgNameError
 
@@ -23,6 +23,8 @@ class OrganizationImporter(BaseImporter):
         "links": (OrganizationLink, "organization_id", {}),
         "sources": (OrganizationSource, "organization_id", {}),
     }
+    # get_object and limit_spec match other names too
+    lookup_related = ("other_names",)
 
     def get_object(self, org):
         spec = {"classification": org["classification"], "parent_id": org["parent_id"]}
@@ -62,6 +64,16 @@ class OrganizationImporter(BaseImporter):
             return Q(**spec) & (Q(name=name) | Q(other_names__name=name))
         return spec
 
+    def pseudo_id_lookup(self, spec):
+        # as limit_spec, which ignores a falsy name
+        if not spec.get("name"):
+            return super(OrganizationImporter, self).pseudo_id_lookup(spec)
+        filters = dict(spec)
+        del filters["name"]
+        if filters.get("classification") != "party":
+            filters["jurisdiction_id"] = self.jurisdiction_id
+        return filters, {"name": ("name", "other_names__name")}
+
     def _prepare_imports(self, dicts):
         """an override for prepare imports that sorts the imports
         by parent_id dependencies"""
@@ -80,7 +92,7 @@ class OrganizationImporter(BaseImporter):
                 pseudo_ids.add(parent_id)
 
         # turn pseudo_ids into a tuple of dictionaries
-        pseudo_ids = [(ppid, get_pseudo_id(ppid)) for ppid in pseudo_ids]
+        pseudo_ids = [(ppid, _get_frozen_pseudo_id(ppid)) for ppid in pseudo_ids]
 
         # loop over all data again, finding the pseudo ids true json id
         for json_id, data in prepared.items():
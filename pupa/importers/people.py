@@ -56,6 +56,15 @@ class PersonImporter(BaseImporter):
         spec["memberships__organization__jurisdiction_id"] = self.jurisdiction_id
         return spec
 
+    def pseudo_id_lookup(self, spec):
+        # as limit_spec
+        if list(spec.keys()) == ["name"]:
+            return (
+                {"memberships__organization__jurisdiction_id": self.jurisdiction_id},
+                {"name": ("name", "other_names__name", "family_name")},
+            )
+        return super(PersonImporter, self).pseudo_id_lookup(spec)
+
     def get_object(self, person):
         all_names = [person["name"]] + [o["name"] for o in person["other_names"]]
 
@@ -0,0 +1,159 @@
+"""
+    Bulk inserts through PostgreSQL's COPY
+
+    Rows are serialized to COPY's text format and streamed to the server on the
+    importer's connection, so they are part of the import's transaction. COPY
+    can't return anything, so every row must have its primary key before it is
+    sent: UUID keys are already set on the instances, integer keys are taken
+    from the table's sequence beforehand.
+"""
+import json
+
+from django.db import connections, router
+
+# field types that can be written as text, anything else falls back to bulk_create
+TEXT_TYPES = {
+    "AutoField",
+    "BigAutoField",
+    "BigIntegerField",
+    "BooleanField",
+    "CharField",
+    "DateField",
+    "DateTimeField",
+    "FloatField",
+    "ForeignKey",
+    "IntegerField",
+    "OneToOneField",
+    "PositiveIntegerField",
+    "PositiveSmallIntegerField",
+    "SlugField",
+    "SmallIntegerField",
+    "TextField",
+    "URLField",
+    "UUIDField",
+}
+AUTO_TYPES = {"AutoField", "BigAutoField"}
+
+# bytes handed to the server per read
+CHUNK_SIZE = 64 * 1024
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+def escape(text):
+    """escape text for a COPY text format column"""
+    return text.translate(_ESCAPES)
+
+
+def array_literal(values):
+    """a PostgreSQL array literal, before COPY escaping"""
+    elements = []
+    for value in values:
+        if value is None:
+            elements.append("NULL")
+        else:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            elements.append('"{}"'.format(value))
+    return "{" + ",".join(elements) + "}"
+
+
+def _kind(field):
+    internal_type = field.get_internal_type()
+    if internal_type == "JSONField":
+        return "json"
+    if internal_type == "ArrayField":
+        if field.base_field.get_internal_type() in TEXT_TYPES - {"BooleanField"}:
+            return "array"
+        return None
+    if internal_type in TEXT_TYPES:
+        return "text"
+    return None
+
+
+def column_value(field, kind, value):
+    if value is None:
+        return "\\N"
+    if kind == "json":
+        return escape(json.dumps(value, cls=field.encoder))
+    if kind == "array":
+        return escape(array_literal(value))
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return escape(str(value))
+
+
+class _RowStream(object):
+    """file-like object that copy_expert reads the encoded rows from"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = b""
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        while len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buffer += row.encode("utf8")
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def copy_insert(Model, objects):
+    """
+    insert unsaved instances of Model with COPY
+
+    Returns False without writing anything if COPY can't be used for Model on
+    its database, in which case the caller should use bulk_create.
+    """
+    db = router.db_for_write(Model)
+    connection = connections[db]
+    if connection.vendor != "postgresql":
+        return False
+
+    fields = list(Model._meta.concrete_fields)
+    kinds = [_kind(field) for field in fields]
+    if None in kinds:
+        return False
+
+    with connection.cursor() as cursor:
+        # psycopg2's, the cursor wrapper passes it through
+        if not hasattr(cursor, "copy_expert"):
+            return False
+
+        pk = Model._meta.pk
+        missing = [obj for obj in objects if getattr(obj, pk.attname) is None]
+        if missing:
+            if pk.get_internal_type() not in AUTO_TYPES:
+                return False
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+                "FROM generate_series(1, %s)",
+                [Model._meta.db_table, pk.column, len(missing)],
+            )
+            for obj, (pk_value,) in zip(missing, cursor.fetchall()):
+                setattr(obj, pk.attname, pk_value)
+
+        def rows():
+            for obj in objects:
+                yield "\t".join(
+                    column_value(field, kind, field.pre_save(obj, True))
+                    for field, kind in zip(fields, kinds)
+                ) + "\n"
+
+        qn = connection.ops.quote_name
+        cursor.copy_expert(
+            "COPY {} ({}) FROM STDIN".format(
+                qn(Model._meta.db_table),
+                ", ".join(qn(field.column) for field in fields),
+            ),
+            _RowStream(rows()),
+            CHUNK_SIZE,
+        )
+
+    for obj in objects:
+        obj._state.adding = False
+        obj._state.db = db
+    return True
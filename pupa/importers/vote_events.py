@@ -73,6 +73,16 @@ class VoteEventImporter(BaseImporter):
         spec["legislative_session__jurisdiction_id"] = self.jurisdiction_id
         return spec
 
+    def pseudo_id_references(self, data):
+        yield self.org_importer, data.get("organization")
+        bill = data.get("bill")
+        if bill and bill.startswith("~"):
+            bill = get_pseudo_id(bill)
+            self.bill_importer.apply_transformers(bill)
+            yield self.bill_importer, _make_pseudo_id(**bill)
+        for vote in data.get("votes", ()):
+            yield self.person_importer, vote.get("voter_id")
+
     def prepare_for_db(self, data):
         data["legislative_session_id"] = self.get_session_id(
             data.pop("legislative_session")
@@ -0,0 +1,19 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pupa", "0007_sessiondataqualityreport"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapereport",
+            name="timings",
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                blank=True, default=dict
+            ),
+        ),
+    ]
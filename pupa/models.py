@@ -35,6 +35,8 @@ class ScrapeReport(models.Model):
     args = models.CharField(max_length=300)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    # seconds per phase & cache counts, see Scraper.do_scrape
+    timings = JSONField(default=dict, blank=True)
 
 
 class ScrapeObjects(models.Model):
@@ -1,9 +1,19 @@
 import os
+import re
 import json
+import hashlib
+import pkgutil
+import importlib
+import time
 import uuid
 import logging
 import datetime
-from collections import defaultdict, OrderedDict
+import functools
+import threading
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.structures import CaseInsensitiveDict
 
 import jsonschema
 from jsonschema import Draft3Validator, FormatChecker
@@ -11,17 +21,148 @@ import scrapelib
 
 from pupa import utils
 from pupa import settings
+from pupa.scrape.compiled import compile_schema, UnsupportedSchema
+from pupa.utils.cache import SQLiteCache
+from pupa.utils.digests import DigestStore
+from pupa.utils.ratelimit import AdaptiveRateLimiter
+from pupa.utils.timing import PhaseTimer
+from pupa.utils.segments import SegmentWriter
+from pupa.utils.background import BackgroundWorker
 from pupa.exceptions import ScrapeError, ScrapeValueError
 
 
+@FormatChecker.cls_checks("uri")
+def check_uri(val):
+    return (
+        isinstance(val, str)
+        and val.startswith(("http://", "https://", "ftp://"))
+        and " " not in val
+    )
+
+
 @FormatChecker.cls_checks("uri-blank")
 def uri_blank(value):
-    return value == "" or FormatChecker().conforms(value, "uri")
+    return value == "" or check_uri(value)
 
 
-@FormatChecker.cls_checks("uri")
-def check_uri(val):
-    return val and val.startswith(("http://", "https://", "ftp://")) and " " not in val
+# Draft3 with datetime/date types that accept python objects
+TYPE_CHECKER = Draft3Validator.TYPE_CHECKER.redefine_many(
+    {
+        "datetime": lambda c, d: isinstance(d, (datetime.date, datetime.datetime)),
+        "date": lambda c, d: (
+            isinstance(d, datetime.date) and not isinstance(d, datetime.datetime)
+        ),
+    }
+)
+PupaValidator = jsonschema.validators.extend(Draft3Validator, type_checker=TYPE_CHECKER)
+
+# id(schema) -> (schema, validator), the schema is kept alive so ids aren't reused
+_validators = {}
+
+
+def get_validator(schema):
+    """
+    Return the validator for a schema, building it on first use.
+
+    Validators are keyed on schema identity and shared across all objects
+    and scrapers in the process.
+    """
+    try:
+        return _validators[id(schema)][1]
+    except KeyError:
+        validator = PupaValidator(schema, format_checker=FormatChecker())
+        _validators[id(schema)] = (schema, validator)
+        return validator
+
+
+# id(schema) -> (schema, checker), checker is None if the schema can't be compiled
+_checkers = {}
+
+
+def get_checker(schema):
+    """
+    Return a compiled checker for a schema, or None if it can't be compiled.
+
+    Checkers are keyed on schema identity like validators are.
+    """
+    try:
+        return _checkers[id(schema)][1]
+    except KeyError:
+        try:
+            checker = compile_schema(schema, get_validator(schema).format_checker)
+        except UnsupportedSchema:
+            checker = None
+        _checkers[id(schema)] = (schema, checker)
+        return checker
+
+
+def validation_errors(schema, data, engine=None):
+    """list of validation error messages for data, empty if it is valid"""
+    # the compiled checker only answers valid/invalid, on failure fall
+    # through to jsonschema so error messages are the same either way
+    if (engine or settings.SCRAPE_VALIDATOR) == "compiled":
+        checker = get_checker(schema)
+        if checker is not None and checker(data):
+            return []
+    return [str(error) for error in get_validator(schema).iter_errors(data)]
+
+
+def parse_validation_policy(policy):
+    """
+    Parse a validation policy: full, sample=N% or deferred.
+
+    Returns (mode, fraction of objects validated on save).
+    """
+    if policy == "full":
+        return "full", 1.0
+    if policy == "deferred":
+        return "deferred", 0.0
+    match = re.match(r"^sample=(\d+(?:\.\d+)?)%$", policy or "")
+    if match and float(match.group(1)) <= 100:
+        return "sample", float(match.group(1)) / 100
+    raise ValueError(
+        "invalid validation policy {!r}, expected full, sample=N% or deferred".format(
+            policy
+        )
+    )
+
+
+def object_digest(data, _type=None):
+    """
+    digest of an object's content, ignoring its (random) _id
+
+    _type is part of the digest when given, so objects of different types
+    with the same content don't share one
+    """
+    content = {k: v for k, v in data.items() if k != "_id"}
+    if _type is not None:
+        content = [_type, content]
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, cls=utils.JSONEncoderPlus).encode("utf8")
+    ).hexdigest()
+
+
+@functools.lru_cache()
+def schema_version():
+    """digest of the schemas in pupa.scrape.schemas, changes whenever they do"""
+    from pupa.scrape import schemas
+
+    content = []
+    for module_info in sorted(pkgutil.iter_modules(schemas.__path__)):
+        module = importlib.import_module(schemas.__name__ + "." + module_info.name)
+        content.append(
+            (
+                module_info.name,
+                sorted(
+                    (name, value)
+                    for name, value in vars(module).items()
+                    if isinstance(value, dict)
+                ),
+            )
+        )
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, default=repr).encode("utf8")
+    ).hexdigest()
 
 
 def cleanup_list(obj, default):
@@ -37,6 +178,11 @@ def cleanup_list(obj, default):
 class Scraper(scrapelib.Scraper):
     """Base class for all scrapers"""
 
+    # types of objects the scraper may save, None for any; lets a pipelined
+    # update import a type while scrapers that can't produce it still run,
+    # saving any other type is an error when pipelining
+    produces = None
+
     def __init__(
         self, jurisdiction, datadir, *, strict_validation=True, fastmode=False
     ):
@@ -55,18 +201,86 @@ class Scraper(scrapelib.Scraper):
 
         # caching
         if settings.CACHE_DIR:
-            self.cache_storage = scrapelib.FileCache(settings.CACHE_DIR)
+            if settings.CACHE_BACKEND == "sqlite":
+                self.cache_storage = SQLiteCache(
+                    settings.CACHE_DIR,
+                    max_bytes=settings.CACHE_MAX_BYTES,
+                    max_age=settings.CACHE_MAX_AGE,
+                )
+            else:
+                self.cache_storage = scrapelib.FileCache(settings.CACHE_DIR)
 
         if fastmode:
             self.requests_per_minute = 0
             self.cache_write_only = False
 
+        # adaptive rate limiting replaces scrapelib's global throttle, see send()
+        self.rate_limiter = None
+        if settings.SCRAPE_ADAPTIVE_RPM and self.requests_per_minute:
+            self.rate_limiter = AdaptiveRateLimiter(
+                self.requests_per_minute,
+                settings.SCRAPE_MIN_RPM,
+                settings.SCRAPE_MAX_RPM,
+            )
+            self.requests_per_minute = 0
+
+        # revalidation reads the cache itself, see request()
+        self.revalidate = settings.CACHE_REVALIDATE and self.cache_storage is not None
+        if self.revalidate:
+            self.cache_write_only = True
+        self.not_modified = 0
+
+        # requests may be made from several threads, they share one throttle
+        self._throttle_lock = threading.Lock()
+
+        # concurrent fetching, see prefetch & fetch_many
+        self._fetch_pool = None
+        self._host_semaphores = defaultdict(
+            lambda: threading.BoundedSemaphore(settings.SCRAPE_HOST_CONCURRENCY)
+        )
+        self._host_semaphores_lock = threading.Lock()
+        # url -> future for prefetched urls that haven't been requested yet
+        self._prefetched = {}
+        # guards _prefetched & _fetch_pool, get() may be called from many threads
+        self._prefetch_lock = threading.Lock()
+
         # validation
         self.strict_validation = strict_validation
+        self.validation_policy = settings.SCRAPE_VALIDATION
+        self.validation, self.validation_sample = parse_validation_policy(
+            self.validation_policy
+        )
+        self.validation_counts = {"objects": 0, "validated": 0, "unchanged": 0}
+        # digests of objects known to be valid, to skip validating them again
+        self.validated_digests = None
+        if settings.SCRAPE_SKIP_VALIDATED and settings.CACHE_DIR:
+            self.validated_digests = DigestStore(settings.CACHE_DIR, schema_version())
+
+        # serialization
+        self.json_backend = settings.JSON_BACKEND
+        if self.json_backend == "orjson" and utils.generic.orjson is None:
+            self.json_backend = "json"
+
+        # output format, 'files' (one file per object) or 'segments'
+        self.data_format = settings.SCRAPED_DATA_FORMAT
+        self.segment_writer = None
+        self.write_datadir = settings.SCRAPE_WRITE_DATADIR
+        # called with (type, data) for every saved object, see ImportPipeline
+        self.output_sink = None
+
+        # write-behind, files (and optionally validation) handled on a thread
+        self.write_behind = settings.SCRAPE_WRITE_BEHIND
+        self.write_behind_validate = settings.SCRAPE_WRITE_BEHIND_VALIDATE
+        self._writer = None
 
         # 'type' -> {set of names}
         self.output_names = defaultdict(set)
 
+        # where the time goes, see do_scrape; http time is only counted on the
+        # thread running scrape() since other threads' requests overlap it
+        self.timer = PhaseTimer()
+        self._scrape_thread = None
+
         # logging convenience methods
         self.logger = logging.getLogger("pupa")
         self.info = self.logger.info
@@ -86,45 +300,307 @@ class Scraper(scrapelib.Scraper):
         filename = "{0}_{1}.json".format(obj._type, obj._id).replace("/", "-")
 
         self.info("save %s %s as %s", obj._type, obj, filename)
-        self.debug(
-            json.dumps(
-                OrderedDict(sorted(obj.as_dict().items())),
-                cls=utils.JSONEncoderPlus,
-                indent=4,
-                separators=(",", ": "),
+
+        # build the dict once, it is used for the debug dump, the file & validation
+        with self.timer.time("serialize"):
+            data = obj.as_dict()
+        if utils.logs_at(self.logger, logging.DEBUG):
+            self.debug(
+                json.dumps(
+                    OrderedDict(sorted(data.items())),
+                    cls=utils.JSONEncoderPlus,
+                    indent=4,
+                    separators=(",", ": "),
+                )
             )
-        )
 
         self.output_names[obj._type].add(filename)
 
-        with open(os.path.join(self.datadir, filename), "w") as f:
-            json.dump(obj.as_dict(), f, cls=utils.JSONEncoderPlus)
+        digest = None
+        with self.timer.time("validate"):
+            if self.validation == "sample" or self.validated_digests is not None:
+                digest = object_digest(data, obj._type)
+            validate = self.should_validate(data, digest)
+            self.validation_counts["objects"] += 1
+            if (
+                validate
+                and self.validated_digests is not None
+                and digest in self.validated_digests
+            ):
+                # identical content already passed under the current schemas
+                validate = False
+                self.validation_counts["unchanged"] += 1
+            elif validate:
+                self.validation_counts["validated"] += 1
+
+        if not self.write_datadir:
+            if validate:
+                self.validate_object(obj, data, digest)
+        elif self.write_behind:
+            if self._writer is None:
+                self._writer = BackgroundWorker(settings.SCRAPE_WRITE_QUEUE_SIZE)
+            self._writer.submit(
+                functools.partial(self.write_data, obj._type, filename, data)
+            )
+            if validate and self.write_behind_validate:
+                self._writer.submit(
+                    functools.partial(self.validate_object, obj, data, digest)
+                )
+            elif validate:
+                self.validate_object(obj, data, digest)
+        else:
+            self.write_data(obj._type, filename, data)
+            if validate:
+                self.validate_object(obj, data, digest)
+
+        if self.output_sink is not None:
+            self.output_sink(obj._type, data)
+
+        # after saving and validating, save subordinate objects
+        for obj in obj._related:
+            self.save_object(obj)
 
+    def should_validate(self, data, digest=None):
+        """whether the validation policy calls for validating this object on save"""
+        if self.validation == "full":
+            return True
+        elif self.validation == "sample":
+            # sample by content so the same objects are picked run after run
+            digest = digest or object_digest(data)
+            return int(digest[:8], 16) < self.validation_sample * 16 ** 8
+        return False
+
+    def validate_object(self, obj, data, digest=None):
         # validate after writing, allows for inspection on failure
         try:
-            obj.validate()
+            with self.timer.time("validate"):
+                obj.validate(data=data)
         except ValueError as ve:
             if self.strict_validation:
                 raise ve
             else:
                 self.warning(ve)
+        else:
+            if digest is not None and self.validated_digests is not None:
+                self.validated_digests.add(digest)
 
-        # after saving and validating, save subordinate objects
-        for obj in obj._related:
-            self.save_object(obj)
+    def close_output(self, raise_errors=True):
+        """finish all pending writes, raising any error from the writer thread"""
+        writer, self._writer = self._writer, None
+        try:
+            if writer is not None:
+                writer.close(raise_error=raise_errors)
+        finally:
+            if self.segment_writer is not None:
+                self.segment_writer.close()
+                self.segment_writer = None
+            if self.validated_digests is not None:
+                self.validated_digests.close()
+
+    def _throttle(self):
+        with self._throttle_lock, self.timer.time("throttle"):
+            super(Scraper, self)._throttle()
+
+    def request(self, method, url, **kwargs):
+        start = time.time()
+        try:
+            resp = self._request(method, url, **kwargs)
+        finally:
+            if threading.get_ident() == self._scrape_thread:
+                self.timer.add("http", time.time() - start)
+
+        if getattr(resp, "fromcache", False):
+            self.timer.count("cache_hits")
+        elif (
+            self.cache_storage is not None
+            and (self.revalidate or not self.cache_write_only)
+            and method.lower() == "get"
+        ):
+            self.timer.count("cache_misses")
+        return resp
+
+    def _request(self, method, url, **kwargs):
+        """
+        In revalidate mode cached GETs are made conditional, a 304 Not Modified
+        returns the cached response and gives back its slot in the rate limit.
+        """
+        if not self.revalidate or method.lower() != "get":
+            return super(Scraper, self).request(method, url, **kwargs)
+
+        key = self.key_for_request("get", url, kwargs.get("params"), kwargs.get("data"))
+        cached = self.cache_storage.get(key) if key else None
+        if cached is None:
+            return super(Scraper, self).request(method, url, **kwargs)
+
+        headers = CaseInsensitiveDict(kwargs.pop("headers", None) or {})
+        if "ETag" in cached.headers:
+            headers.setdefault("If-None-Match", cached.headers["ETag"])
+        if "Last-Modified" in cached.headers:
+            headers.setdefault("If-Modified-Since", cached.headers["Last-Modified"])
+
+        resp = super(Scraper, self).request(method, url, headers=headers, **kwargs)
+        if resp.status_code != 304:
+            return resp
+
+        with self._throttle_lock:
+            self._last_request -= self._request_frequency
+            self.not_modified += 1
+        cached.fromcache = True
+        return cached
+
+    def send(self, request, **kwargs):
+        # every attempt (including retries & redirects) goes through here
+        host = urlparse(request.url).netloc
+        if self.rate_limiter is not None:
+            with self.timer.time("throttle"):
+                self.rate_limiter.wait(host)
+
+        start = time.time()
+        resp = None
+        try:
+            resp = super(Scraper, self).send(request, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            self.timer.add("network", elapsed, host=host)
+            if self.rate_limiter is not None:
+                if resp is None:
+                    self.rate_limiter.record(host, None, elapsed)
+                else:
+                    self.rate_limiter.record(
+                        host, resp.status_code, elapsed, resp.headers.get("Retry-After")
+                    )
+        return resp
+
+    def _fetch(self, url):
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores[urlparse(url).netloc]
+        with semaphore:
+            return super(Scraper, self).get(url)
+
+    def _start_fetch(self, url):
+        # _prefetch_lock must be held
+        if self._fetch_pool is None:
+            self._fetch_pool = ThreadPoolExecutor(
+                max_workers=settings.SCRAPE_FETCH_WORKERS
+            )
+        return self._fetch_pool.submit(self._fetch, url)
+
+    def _submit_fetch(self, url):
+        with self._prefetch_lock:
+            future = self._prefetched.pop(url, None)
+            if future is None:
+                future = self._start_fetch(url)
+        return future
+
+    def prefetch(self, urls):
+        """
+        Start fetching urls in the background.
+
+        A later get(url) (without other arguments) waits for & returns the
+        prefetched response instead of making a new request.
+        """
+        for url in urls:
+            with self._prefetch_lock:
+                if url not in self._prefetched:
+                    self._prefetched[url] = self._start_fetch(url)
+
+    def fetch_many(self, urls):
+        """
+        Fetch urls concurrently, yielding (url, response) as each completes.
+
+        Requests go through the normal throttling, retry and caching, with
+        at most SCRAPE_HOST_CONCURRENCY in flight per host. Errors are raised
+        as they would be from get().
+        """
+        futures = {}
+        for url in urls:
+            futures[self._submit_fetch(url)] = url
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def get(self, url, **kwargs):
+        future = None
+        if not kwargs:
+            with self._prefetch_lock:
+                future = self._prefetched.pop(url, None)
+        if future is not None:
+            if threading.get_ident() != self._scrape_thread:
+                return future.result()
+            with self.timer.time("http"):
+                return future.result()
+        return super(Scraper, self).get(url, **kwargs)
+
+    def write_data(self, _type, filename, data):
+        """write a serialized object to the datadir in the configured format"""
+        if self.data_format == "segments":
+            if self.segment_writer is None:
+                self.segment_writer = SegmentWriter(
+                    self.datadir, settings.SEGMENT_MAX_BYTES
+                )
+            with self.timer.time("serialize"):
+                if self.json_backend == "orjson":
+                    line = utils.orjson_dumps(data)
+                else:
+                    line = json.dumps(data, cls=utils.JSONEncoderPlus)
+            with self.timer.time("write"):
+                self.segment_writer.write(_type, line)
+            return
+
+        if self.json_backend == "orjson":
+            with self.timer.time("serialize"):
+                content = utils.orjson_dumps(data)
+            with self.timer.time("write"):
+                with open(os.path.join(self.datadir, filename), "wb") as f:
+                    f.write(content)
+        else:
+            # json.dump streams into the file, so this counts as writing
+            with self.timer.time("write"):
+                with open(os.path.join(self.datadir, filename), "w") as f:
+                    json.dump(data, f, cls=utils.JSONEncoderPlus)
 
     def do_scrape(self, **kwargs):
         record = {"objects": defaultdict(int)}
         self.output_names = defaultdict(set)
         record["start"] = utils.utcnow()
-        for obj in self.scrape(**kwargs) or []:
-            if hasattr(obj, "__iter__"):
-                for iterobj in obj:
-                    self.save_object(iterobj)
-            else:
-                self.save_object(obj)
+        self.timer.reset()
+        self.validation_counts = {"objects": 0, "validated": 0, "unchanged": 0}
+        self._scrape_thread = threading.get_ident()
+        try:
+            with self.timer.time("scrape"):
+                objects = self.scrape(**kwargs) or []
+            for obj in self._timed(objects, "scrape"):
+                if hasattr(obj, "__iter__"):
+                    for iterobj in self._timed(obj, "scrape"):
+                        self.save_object(iterobj)
+                else:
+                    self.save_object(obj)
+        except BaseException:
+            # the original error wins over anything from pending writes
+            self.close_output(raise_errors=False)
+            raise
+        else:
+            self.close_output()
+        finally:
+            self._scrape_thread = None
+            with self._prefetch_lock:
+                pool, self._fetch_pool = self._fetch_pool, None
+                prefetched, self._prefetched = self._prefetched, {}
+            for future in prefetched.values():
+                future.cancel()
+            if pool is not None:
+                pool.shutdown()
+            if isinstance(self.cache_storage, SQLiteCache):
+                self.cache_storage.close()
         record["end"] = utils.utcnow()
         record["skipped"] = getattr(self, "skipped", 0)
+        record["timings"] = self.timer.as_dict()
+        record["validation"] = dict(self.validation_counts, policy=self.validation_policy)
+        if self.rate_limiter is not None:
+            record["hosts"] = self.rate_limiter.stats()
         if not self.output_names:
             raise ScrapeError(
                 "no objects returned from {} scrape".format(self.__class__.__name__)
@@ -134,6 +610,17 @@ class Scraper(scrapelib.Scraper):
 
         return record
 
+    def _timed(self, iterable, phase):
+        """iterate, counting the time spent producing each item towards phase"""
+        iterator = iter(iterable)
+        while True:
+            with self.timer.time(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
     def latest_session(self):
         return self.jurisdiction.legislative_sessions[-1]["identifier"]
 
@@ -144,18 +631,46 @@ class Scraper(scrapelib.Scraper):
 
 
 class BaseBillScraper(Scraper):
+    produces = ("bill", "vote_event")
     skipped = 0
+    # set > 1 to call get_bill from a pool of this many threads
+    bill_workers = 1
 
     class ContinueScraping(Exception):
         """indicate that scraping should continue without saving an object"""
 
         pass
 
+    def _bill_getters(self, bill_ids):
+        """yield (bill_id, function returning get_bill's result) in bill_ids order"""
+        if self.bill_workers <= 1:
+            for bill_id, extras in bill_ids:
+                yield bill_id, functools.partial(self.get_bill, bill_id, **extras)
+            return
+
+        # only keep a couple of bills per worker in flight
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.bill_workers) as pool:
+            try:
+                for bill_id, extras in bill_ids:
+                    pending.append(
+                        (bill_id, pool.submit(self.get_bill, bill_id, **extras))
+                    )
+                    if len(pending) >= 2 * self.bill_workers:
+                        bill_id, future = pending.popleft()
+                        yield bill_id, future.result
+                while pending:
+                    bill_id, future = pending.popleft()
+                    yield bill_id, future.result
+            finally:
+                for bill_id, future in pending:
+                    future.cancel()
+
     def scrape(self, legislative_session, **kwargs):
         self.legislative_session = legislative_session
-        for bill_id, extras in self.get_bill_ids(**kwargs):
+        for bill_id, get_bill in self._bill_getters(self.get_bill_ids(**kwargs)):
             try:
-                yield self.get_bill(bill_id, **extras)
+                yield get_bill()
             except self.ContinueScraping as exc:
                 self.warning("skipping %s: %r", bill_id, exc)
                 self.skipped += 1
@@ -172,6 +687,15 @@ class BaseModel(object):
     # Used in :func:`validate`.
     _type = None
     _schema = None
+    # precomputed from _schema for each subclass
+    _properties = frozenset()
+    _property_names = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(BaseModel, cls).__init_subclass__(**kwargs)
+        if cls._schema is not None:
+            cls._property_names = tuple(cls._schema["properties"])
+            cls._properties = frozenset(cls._property_names)
 
     def __init__(self):
         super(BaseModel, self).__init__()
@@ -181,7 +705,7 @@ class BaseModel(object):
 
     # validation
 
-    def validate(self, schema=None):
+    def validate(self, schema=None, *, data=None):
         """
         Validate that we have a valid object.
 
@@ -192,26 +716,16 @@ class BaseModel(object):
         due to upstream schemas being in JSON Schema v3, and not validictory's
         modified syntax.
         ^ TODO: FIXME
-        """
-        if schema is None:
-            schema = self._schema
 
-        type_checker = Draft3Validator.TYPE_CHECKER.redefine(
-            "datetime", lambda c, d: isinstance(d, (datetime.date, datetime.datetime))
-        )
-        type_checker = type_checker.redefine(
-            "date",
-            lambda c, d: (
-                isinstance(d, datetime.date) and not isinstance(d, datetime.datetime)
-            ),
-        )
+        data may be passed if the caller already has the result of as_dict()
+        """
+        if data is None:
+            data = self.as_dict()
 
-        ValidatorCls = jsonschema.validators.extend(
-            Draft3Validator, type_checker=type_checker
-        )
-        validator = ValidatorCls(schema, format_checker=FormatChecker())
+        if schema is None:
+            schema = self.schema_for(data)
 
-        errors = [str(error) for error in validator.iter_errors(self.as_dict())]
+        errors = validation_errors(schema, data)
         if errors:
             raise ScrapeValueError(
                 "validation of {} {} failed: {}".format(
@@ -219,12 +733,17 @@ class BaseModel(object):
                 )
             )
 
+    @classmethod
+    def schema_for(cls, data):
+        """the schema an object of this type with the given data validates against"""
+        return cls._schema
+
     def pre_save(self, jurisdiction_id):
         pass
 
     def as_dict(self):
         d = {}
-        for attr in self._schema["properties"].keys():
+        for attr in self._property_names:
             if hasattr(self, attr):
                 d[attr] = getattr(self, attr)
         d["_id"] = self._id
@@ -233,7 +752,7 @@ class BaseModel(object):
     # operators
 
     def __setattr__(self, key, val):
-        if key[0] != "_" and key not in self._schema["properties"].keys():
+        if key[0] != "_" and key not in self._properties:
             raise ScrapeValueError(
                 'property "{}" not in {} schema'.format(key, self._type)
             )
@@ -294,7 +813,60 @@ class OtherNameMixin(object):
         self.other_names.append(other_name)
 
 
+class _LinkIndex(object):
+    """seen urls & (note, date) -> item of an associated link collection"""
+
+    __slots__ = ("associated", "n_items", "seen_links", "items", "n_links", "multiple")
+
+    def __init__(self, associated):
+        self.associated = associated
+        self.n_items = len(associated)
+        self.seen_links = set()
+        # the last item with a key, as the scan this replaces found
+        self.items = {}
+        # key -> number of links of its item
+        self.n_links = {}
+        # keys several items have
+        self.multiple = set()
+        for item in associated:
+            for link in item["links"]:
+                self.seen_links.add(link["url"])
+            key = (item.get("note"), item.get("date"))
+            if key in self.items:
+                self.multiple.add(key)
+            self.items[key] = item
+            self.n_links[key] = len(item["links"])
+
+    def is_current(self, associated, key):
+        # only checks what's cheap: the collection, its length and the item
+        # about to be added to, so that each add stays O(1)
+        if self.associated is not associated or self.n_items != len(associated):
+            return False
+        item = self.items.get(key)
+        return item is None or len(item["links"]) == self.n_links[key]
+
+
 class AssociatedLinkMixin(object):
+    def _associated_link_index(self, collection, associated, key):
+        """
+        Return the _LinkIndex of a collection, about to be added to key.
+
+        The index is built once and then kept up to date by
+        _add_associated_link. It is rebuilt if the collection was replaced,
+        had items added some other way, or links were appended straight to
+        the item with key. Links appended straight to any other item are not
+        seen, scrapers should add links through the add_*_link methods.
+        """
+        try:
+            indexes = self._link_indexes
+        except AttributeError:
+            indexes = self._link_indexes = {}
+
+        index = indexes.get(collection)
+        if index is None or not index.is_current(associated, key):
+            index = indexes[collection] = _LinkIndex(associated)
+        return index
+
     def _add_associated_link(
         self, collection, note, url, *, media_type, text, on_duplicate, date=""
     ):
@@ -306,26 +878,15 @@ class AssociatedLinkMixin(object):
         except AttributeError:
             associated = self[collection]
 
-        ver = {"note": note, "links": [], "date": date}
-
-        # keep a list of the links we've seen, we need to iterate over whole
-        # list on each add unfortunately this means adds are O(n)
-        seen_links = set()
-
-        matches = 0
-        for item in associated:
-            for link in item["links"]:
-                seen_links.add(link["url"])
-
-            if all(ver.get(x) == item.get(x) for x in ["note", "date"]):
-                matches = matches + 1
-                ver = item
+        key = (note, date)
+        # urls & (note, date) entries are indexed instead of scanned
+        index = self._associated_link_index(collection, associated, key)
 
         # it should be impossible to have multiple matches found unless someone
         # is bypassing _add_associated_link
-        assert matches <= 1, "multiple matches found in _add_associated_link"
+        assert key not in index.multiple, "multiple matches found in _add_associated_link"
 
-        if url in seen_links:
+        if url in index.seen_links:
             if on_duplicate == "error":
                 raise ScrapeValueError(
                     "Duplicate entry in '%s' - URL: '%s'" % (collection, url)
@@ -343,12 +904,18 @@ class AssociatedLinkMixin(object):
         # OK. This is either new or old. Let's just go for it.
         ret = {"url": url, "media_type": media_type, "text": text}
 
-        ver["links"].append(ret)
-
-        if matches == 0:
+        ver = index.items.get(key)
+        if ver is None:
             # in the event we've got a new entry; let's just insert it into
             # the versions on this object. Otherwise it'll get thrown in
             # automagically.
+            ver = {"note": note, "links": [], "date": date}
             associated.append(ver)
+            index.items[key] = ver
+            index.n_items += 1
+
+        ver["links"].append(ret)
+        index.seen_links.add(url)
+        index.n_links[key] = len(ver["links"])
 
         return ver
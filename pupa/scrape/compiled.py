@@ -0,0 +1,180 @@
+"""
+    Compiles pupa's Draft3 schemas into specialized python checker functions.
+
+    Only the subset of Draft3 used by pupa.scrape.schemas is supported, a
+    schema using anything else raises UnsupportedSchema and callers should
+    fall back to jsonschema. Checkers only answer "is this valid?", error
+    messages are always produced by jsonschema so that they stay identical.
+"""
+import re
+import numbers
+import datetime
+
+# keywords handled below, "required" is handled by the parent's "properties"
+SUPPORTED_KEYWORDS = {
+    "type",
+    "properties",
+    "items",
+    "minLength",
+    "minItems",
+    "minimum",
+    "maximum",
+    "exclusiveMinimum",
+    "exclusiveMaximum",
+    "enum",
+    "pattern",
+    "format",
+    "required",
+}
+
+# mirrors Draft3's type checker plus pupa's datetime/date types
+TYPE_TESTS = {
+    "string": "isinstance({0}, str)",
+    "object": "isinstance({0}, dict)",
+    "array": "isinstance({0}, list)",
+    "boolean": "isinstance({0}, bool)",
+    "integer": "(isinstance({0}, int) and not isinstance({0}, bool))",
+    "number": "(isinstance({0}, numbers.Number) and not isinstance({0}, bool))",
+    "null": "{0} is None",
+    "any": "True",
+    "datetime": "isinstance({0}, (datetime.date, datetime.datetime))",
+    "date": (
+        "(isinstance({0}, datetime.date) and "
+        "not isinstance({0}, datetime.datetime))"
+    ),
+}
+
+
+class UnsupportedSchema(Exception):
+    """schema uses a feature that the compiler doesn't handle"""
+
+
+class _Compiler(object):
+    def __init__(self, format_checker):
+        self.namespace = {
+            "numbers": numbers,
+            "datetime": datetime,
+            "conforms": format_checker.conforms,
+        }
+        self.functions = []
+        self.counter = 0
+
+    def name(self, prefix):
+        self.counter += 1
+        return "{}{}".format(prefix, self.counter)
+
+    def constant(self, value):
+        name = self.name("_c")
+        self.namespace[name] = value
+        return name
+
+    def function(self, schema):
+        """compile schema into a function, returns the function's name"""
+        name = self.name("_check")
+        lines = ["def {}(x):".format(name)]
+        self.emit(schema, "x", 1, lines)
+        lines.append("    return True")
+        self.functions.append("\n".join(lines))
+        return name
+
+    def emit(self, schema, var, depth, lines):
+        pad = "    " * depth
+
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(schema)
+        unsupported = set(schema) - SUPPORTED_KEYWORDS
+        if unsupported:
+            raise UnsupportedSchema(", ".join(sorted(unsupported)))
+
+        if "type" in schema:
+            types = schema["type"]
+            if not isinstance(types, list):
+                types = [types]
+            tests = []
+            for type_ in types:
+                if isinstance(type_, dict):
+                    tests.append("{}({})".format(self.function(type_), var))
+                elif type_ in TYPE_TESTS:
+                    tests.append(TYPE_TESTS[type_].format(var))
+                else:
+                    raise UnsupportedSchema("type " + repr(type_))
+            lines.append(pad + "if not ({}):".format(" or ".join(tests)))
+            lines.append(pad + "    return False")
+
+        if "enum" in schema:
+            # jsonschema compares bools and 0/1 specially, stick to the simple case
+            if not all(isinstance(e, str) for e in schema["enum"]):
+                raise UnsupportedSchema("non-string enum")
+            enum = self.constant(tuple(schema["enum"]))
+            lines.append(pad + "if {} not in {}:".format(var, enum))
+            lines.append(pad + "    return False")
+
+        if "format" in schema:
+            lines.append(pad + "if not conforms({}, {!r}):".format(var, schema["format"]))
+            lines.append(pad + "    return False")
+
+        if "minLength" in schema or "pattern" in schema:
+            lines.append(pad + "if isinstance({}, str):".format(var))
+            if "minLength" in schema:
+                lines.append(
+                    pad + "    if len({}) < {!r}:".format(var, schema["minLength"])
+                )
+                lines.append(pad + "        return False")
+            if "pattern" in schema:
+                pattern = self.constant(re.compile(schema["pattern"]))
+                lines.append(pad + "    if not {}.search({}):".format(pattern, var))
+                lines.append(pad + "        return False")
+
+        if "minimum" in schema or "maximum" in schema:
+            lines.append(pad + "if {}:".format(TYPE_TESTS["number"].format(var)))
+            if "minimum" in schema:
+                op = "<=" if schema.get("exclusiveMinimum", False) else "<"
+                lines.append(
+                    pad + "    if {} {} {!r}:".format(var, op, schema["minimum"])
+                )
+                lines.append(pad + "        return False")
+            if "maximum" in schema:
+                op = ">=" if schema.get("exclusiveMaximum", False) else ">"
+                lines.append(
+                    pad + "    if {} {} {!r}:".format(var, op, schema["maximum"])
+                )
+                lines.append(pad + "        return False")
+
+        if "minItems" in schema or "items" in schema:
+            lines.append(pad + "if isinstance({}, list):".format(var))
+            if "minItems" in schema:
+                lines.append(
+                    pad + "    if len({}) < {!r}:".format(var, schema["minItems"])
+                )
+                lines.append(pad + "        return False")
+            if "items" in schema:
+                if not isinstance(schema["items"], dict):
+                    raise UnsupportedSchema("tuple items")
+                item = self.name("x")
+                lines.append(pad + "    for {} in {}:".format(item, var))
+                self.emit(schema["items"], item, depth + 2, lines)
+
+        if "properties" in schema:
+            lines.append(pad + "if isinstance({}, dict):".format(var))
+            for prop, subschema in schema["properties"].items():
+                value = self.name("x")
+                lines.append(pad + "    if {!r} in {}:".format(prop, var))
+                lines.append(pad + "        {} = {}[{!r}]".format(value, var, prop))
+                self.emit(subschema, value, depth + 2, lines)
+                if isinstance(subschema, dict) and subschema.get("required", False):
+                    lines.append(pad + "    else:")
+                    lines.append(pad + "        return False")
+
+
+def compile_schema(schema, format_checker):
+    """
+    Compile a schema into a function that returns True if an instance is valid.
+
+    format_checker should be the FormatChecker the equivalent jsonschema
+    validator uses so that "format" is handled identically.
+    """
+    compiler = _Compiler(format_checker)
+    name = compiler.function(schema)
+    source = "\n\n".join(compiler.functions)
+    exec(compile(source, "<pupa schema {}>".format(name), "exec"), compiler.namespace)
+    return compiler.namespace[name]
@@ -0,0 +1,101 @@
+"""
+    Deferred validation: validate everything in a datadir after scraping
+"""
+import os
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from pupa import settings
+from pupa.utils.segments import read_segments
+from .base import validation_errors
+from .jurisdiction import Jurisdiction
+from .popolo import Organization, Person, Post, Membership
+from .bill import Bill
+from .vote_event import VoteEvent
+from .event import Event
+
+MODEL_CLASSES = {
+    cls._type: cls
+    for cls in (
+        Jurisdiction,
+        Organization,
+        Person,
+        Post,
+        Membership,
+        Bill,
+        VoteEvent,
+        Event,
+    )
+}
+
+# objects handed to a worker at a time
+CHUNK_SIZE = 500
+
+
+def iter_datadir(datadir):
+    """yield (type, data) for every object in datadir, in either format"""
+    for _type in MODEL_CLASSES:
+        for fname in sorted(glob.glob(os.path.join(datadir, _type + "_*.json"))):
+            with open(fname) as f:
+                yield _type, json.load(f)
+        for data in read_segments(datadir, _type):
+            yield _type, data
+
+
+def validate_objects(objects, engine=None):
+    """validate a list of (type, data), returns a list of error messages"""
+    messages = []
+    for _type, data in objects:
+        cls = MODEL_CLASSES[_type]
+        errors = validation_errors(cls.schema_for(data), data, engine)
+        if errors:
+            messages.append(
+                "validation of {} {} failed: {}".format(
+                    cls.__name__, data.get("_id"), "\n\t" + "\n\t".join(errors)
+                )
+            )
+    return messages
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_datadir(datadir, workers=None):
+    """
+    Validate every object in datadir using up to workers processes.
+
+    Returns (number of objects validated, list of error messages).
+    """
+    workers = workers or settings.SCRAPE_VALIDATION_WORKERS
+    count = 0
+    messages = []
+
+    chunks = _chunks(iter_datadir(datadir), CHUNK_SIZE)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # bound the chunks in flight so the datadir isn't read into memory
+            pending = []
+            for chunk in chunks:
+                count += len(chunk)
+                pending.append(
+                    pool.submit(validate_objects, chunk, settings.SCRAPE_VALIDATOR)
+                )
+                if len(pending) >= workers * 2:
+                    messages.extend(pending.pop(0).result())
+            for future in pending:
+                messages.extend(future.result())
+    else:
+        for chunk in chunks:
+            count += len(chunk)
+            messages.extend(validate_objects(chunk))
+
+    return count, messages
@@ -61,6 +61,8 @@ class Jurisdiction(BaseModel):
 
 
 class JurisdictionScraper(Scraper):
+    produces = ("jurisdiction", "organization", "post", "membership")
+
     def scrape(self):
         # yield a single Jurisdiction object
         yield self.jurisdiction
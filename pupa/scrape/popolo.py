@@ -276,18 +276,18 @@ class Organization(
     def __str__(self):
         return self.name
 
-    def validate(self):
-        schema = None
+    @classmethod
+    def schema_for(cls, data):
         # these are implicitly declared & do not require sources
-        if self.classification in (
+        if data.get("classification") in (
             "party",
             "legislature",
             "upper",
             "lower",
             "executive",
         ):
-            schema = org_schema_no_sources
-        return super(Organization, self).validate(schema=schema)
+            return org_schema_no_sources
+        return cls._schema
 
     def add_post(self, label, role, **kwargs):
         post = Post(label=label, role=role, organization_id=self._id, **kwargs)
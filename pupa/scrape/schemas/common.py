@@ -32,7 +32,7 @@ fuzzy_datetime_string_blank = {
     "type": "string",
     "pattern": (
         "^([0-9]{4}((-[0-9]{2}){0,2}|(-[0-9]{2}){2}T"
-        "[0-9]{2}(:[0-9]{2}){0,2}"
+        "[0-9]{2}(:[0-9]{2}(:[0-9]{2}([.][0-9]+)?)?)?"
         "(Z|[+-][0-9]{2}(:[0-9]{2})?))?)?$"
     ),
 }
@@ -26,9 +26,53 @@ SCRAPELIB_RETRY_ATTEMPTS = 3
 SCRAPELIB_RETRY_WAIT_SECONDS = 10
 SCRAPELIB_VERIFY = True
 
+# tune the rate per host, starting at SCRAPELIB_RPM and staying within these bounds
+SCRAPE_ADAPTIVE_RPM = False
+SCRAPE_MIN_RPM = 6
+SCRAPE_MAX_RPM = 600
+
+# threads used by Scraper.prefetch/fetch_many & max requests in flight per host
+SCRAPE_FETCH_WORKERS = 8
+SCRAPE_HOST_CONCURRENCY = 2
+
+# jsonschema|compiled
+SCRAPE_VALIDATOR = "jsonschema"
+# full (every object on save), sample=N% (a stable N% of objects on save) or
+# deferred (the whole datadir after scraping, before import)
+SCRAPE_VALIDATION = "full"
+SCRAPE_VALIDATION_WORKERS = os.cpu_count() or 1
+# skip validating objects identical to ones that already passed (digests kept in CACHE_DIR)
+SCRAPE_SKIP_VALIDATED = False
+
+# json|orjson, orjson is used only if it is installed
+JSON_BACKEND = "json"
+
 CACHE_DIR = os.path.join(os.getcwd(), "_cache")
+# files (one file per response) or sqlite (a single database in CACHE_DIR)
+CACHE_BACKEND = "files"
+# sqlite backend only: byte budget & max age in seconds of cached responses, 0 is unlimited
+CACHE_MAX_BYTES = 0
+CACHE_MAX_AGE = 0
+# revalidate cached responses with conditional GETs (ETag/Last-Modified)
+CACHE_REVALIDATE = False
 SCRAPED_DATA_DIR = os.path.join(os.getcwd(), "_data")
 
+# cache convert_pdf output in CACHE_DIR & max concurrent conversions in convert_pdfs
+PDF_CACHE = False
+PDF_WORKERS = os.cpu_count() or 1
+
+# files (one JSON file per object) or segments (rolling per-type JSONL files)
+SCRAPED_DATA_FORMAT = "files"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+# write scraped objects from a background thread (optionally validating there too)
+SCRAPE_WRITE_BEHIND = False
+SCRAPE_WRITE_BEHIND_VALIDATE = False
+SCRAPE_WRITE_QUEUE_SIZE = 1000
+
+# write scraped objects to SCRAPED_DATA_DIR, may only be turned off when pipelining
+SCRAPE_WRITE_DATADIR = True
+
 # import settings
 
 ENABLE_PEOPLE_AND_ORGS = True
@@ -38,6 +82,19 @@ ENABLE_EVENTS = True
 
 IMPORT_TRANSFORMERS = {"bill": []}
 
+# items whose existing objects are looked up together, for importers that batch lookups
+IMPORT_BATCH_SIZE = 500
+# write only the related rows that changed, instead of deleting and recreating them all
+IMPORT_RELATED_DELTA = True
+# insert new related rows with COPY, on PostgreSQL, when there are at least MIN_ROWS of them
+IMPORT_COPY = False
+IMPORT_COPY_MIN_ROWS = 100
+
+# import objects as they are scraped instead of from the datadir once scraping is done
+IMPORT_PIPELINE = False
+# objects of each type held for the importers before the scrapers saving them wait
+IMPORT_PIPELINE_QUEUE_SIZE = 1000
+
 # Django settings
 DEBUG = False
 TEMPLATE_DEBUG = False
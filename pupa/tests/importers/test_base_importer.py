@@ -1,5 +1,6 @@
 import os
 import json
+import random
 import shutil
 import tempfile
 import mock
@@ -7,9 +8,15 @@ import pytest
 from opencivicdata.core.models import Person, Organization, Jurisdiction, Division
 from pupa.scrape import Person as ScrapePerson
 from pupa.scrape import Organization as ScrapeOrganization
-from pupa.importers.base import omnihash, BaseImporter
+from pupa.importers.base import (
+    omnihash,
+    items_differ,
+    _items_differ_pairwise,
+    BaseImporter,
+)
 from pupa.importers import PersonImporter, OrganizationImporter
 from pupa.exceptions import UnresolvedIdError, DataImportError
+from pupa.utils.segments import SegmentWriter
 
 
 def create_jurisdiction():
@@ -63,6 +70,25 @@ def test_import_directory():
     shutil.rmtree(datadir)
 
 
+def test_import_directory_segments():
+    datadir = tempfile.mkdtemp()
+    open(os.path.join(datadir, "test_a.json"), "w").write(json.dumps({"test": "A"}))
+    writer = SegmentWriter(datadir, max_bytes=1024)
+    writer.write("test", json.dumps({"test": "B"}))
+    writer.write("other", json.dumps({"test": "C"}))
+    writer.close()
+
+    # both layouts are streamed through import_data
+    ti = FakeImporter("jurisdiction-id")
+    with mock.patch.object(ti, attribute="import_data") as mockobj:
+        ti.import_directory(datadir)
+
+    arg_objs = list(mockobj.call_args[0][0])
+    assert sorted(arg_objs, key=lambda d: d["test"]) == [{"test": "A"}, {"test": "B"}]
+
+    shutil.rmtree(datadir)
+
+
 def test_apply_transformers():
     transformers = {
         "capitalize": lambda x: x.upper(),
@@ -234,3 +260,92 @@ def test_locked_field_subitem():
 
     o = Organization.objects.get()
     assert o.other_names.get().name == "S.H.I.E.L.D."
+
+
+class FakeManager(object):
+    def __init__(self, items):
+        self.items = items
+
+    def all(self):
+        return list(self.items)
+
+
+class FakeRow(object):
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+ITEMS_DIFFER_SUBFIELDS = {"related": (None, "parent_id", {"links": (None, "id", {})})}
+
+
+def random_json_items(rng, depth, regular, order_depth=None):
+    items = []
+    for _ in range(rng.randint(0, 4)):
+        item = {
+            "name": rng.choice(["a", "b", "c"]),
+            "note": rng.choice(["x", 1, 1.0, True, None, {"k": [1]}, [1, 2]]),
+        }
+        # the items at order_depth carry their order, like event agenda items
+        if depth == order_depth:
+            item["order"] = str(len(items) if rng.random() < 0.8 else rng.randint(0, 4))
+        if not regular and rng.random() < 0.2:
+            del item["note"]
+        if depth < 2:
+            item[["related", "links"][depth]] = random_json_items(
+                rng, depth + 1, regular, order_depth
+            )
+        items.append(item)
+        if rng.random() < 0.3:
+            items.append(dict(item))
+    return items
+
+
+def random_db_rows(rng, items, depth, ordering):
+    rows = []
+    for i, item in enumerate(items):
+        fields = {"name": item["name"], "note": item.get("note")}
+        if rng.random() < 0.1:
+            fields["name"] = rng.choice(["a", "b", "c"])
+        if depth < 2:
+            subfield = ["related", "links"][depth]
+            fields[subfield] = FakeManager(
+                random_db_rows(rng, item[subfield], depth + 1, ordering)
+            )
+        if ordering == "mixed":
+            ordered = rng.random() < 0.5
+        else:
+            ordered = ordering == "ordered"
+        if "order" in item:
+            # the row's order may also be its position where the item's isn't
+            fields["order"] = rng.choice(
+                [item["order"], item["order"], str(i), str(rng.randint(0, 4))]
+            )
+        elif ordered:
+            fields["order"] = i if rng.random() < 0.8 else rng.randint(0, 4)
+        rows.append(FakeRow(**fields))
+    if rng.random() < 0.5:
+        rng.shuffle(rows)
+    if rows and rng.random() < 0.05:
+        rows.pop()
+    return rows
+
+
+def test_items_differ_matches_pairwise():
+    # randomized: duplicates, reordering, ordered rows, items with an order
+    # field, nested subfields and irregular items must all get the same
+    # verdict as the pairwise comparison
+    rng = random.Random(1)
+    verdicts = set()
+    for _ in range(5000):
+        jsonitems = random_json_items(
+            rng, 0, rng.random() < 0.8, rng.choice([None, None, 0, 1, 2])
+        )
+        dbitems = random_db_rows(
+            rng, jsonitems, 0, rng.choice(["ordered", "unordered", "mixed"])
+        )
+        verdict = items_differ(jsonitems, dbitems, ITEMS_DIFFER_SUBFIELDS)
+        assert verdict == _items_differ_pairwise(
+            jsonitems, dbitems, ITEMS_DIFFER_SUBFIELDS
+        )
+        verdicts.add(verdict)
+    assert verdicts == {True, False}
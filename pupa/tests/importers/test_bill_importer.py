@@ -1,9 +1,16 @@
 import re
+import mock
 import pytest
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from pupa import settings
+from pupa.cli.commands.update import override_settings
 from pupa.scrape import Bill as ScrapeBill
 from pupa.scrape import Person as ScrapePerson
 from pupa.scrape import Organization as ScrapeOrganization
 from pupa.importers import BillImporter, OrganizationImporter, PersonImporter
+from pupa.exceptions import DuplicateItemError
 from opencivicdata.core.models import (
     Jurisdiction,
     Person,
@@ -458,3 +465,250 @@ def test_fix_bill_id():
 
     b = Bill.objects.get()
     assert b.identifier == "HB 1"
+
+
+@pytest.mark.django_db
+def test_bill_batch_lookup():
+    create_jurisdiction()
+    create_org()
+
+    def bills(title):
+        return [
+            ScrapeBill("HB {}".format(n), "1900", title, chamber="lower").as_dict()
+            for n in range(5)
+        ]
+
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+    BillImporter("jid", oi, pi).import_data(bills("Bill"))
+    assert Bill.objects.count() == 5
+
+    # existing bills are all found by the batched lookup
+    items = bills("Bill")
+    items[0]["title"] = "Changed"
+    with mock.patch.object(BillImporter, "get_object", side_effect=AssertionError):
+        record = BillImporter("jid", oi, pi).import_data(items)["bill"]
+    assert (record["update"], record["noop"], record["insert"]) == (1, 4, 0)
+    assert Bill.objects.count() == 5
+
+    # a second bill matching the same object in one batch is still a duplicate
+    items = bills("Bill")
+    items[1]["title"] = "Different"
+    items[1]["identifier"] = "HB 0"
+    with pytest.raises(DuplicateItemError):
+        BillImporter("jid", oi, pi).import_data(items)
+
+
+@pytest.mark.django_db
+def test_bill_batch_lookup_unspecified_org_after_insert():
+    create_jurisdiction()
+    create_org()
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+
+    # a new bill, then one without an org matching it, in the same batch
+    with_org = ScrapeBill("HB 1", "1900", "Bill", chamber="lower").as_dict()
+    without_org = ScrapeBill("HB 1", "1900", "Other Bill").as_dict()
+    without_org["from_organization"] = None
+    with pytest.raises(DuplicateItemError):
+        BillImporter("jid", oi, pi).import_data([with_org, without_org])
+
+
+@pytest.mark.django_db
+def test_bill_update_writes_only_changed_actions():
+    create_jurisdiction()
+    create_org()
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+
+    def import_bill(*descriptions):
+        bill = ScrapeBill("HB 1", "1900", "First Bill", chamber="lower")
+        for description in descriptions:
+            bill.add_action(description, chamber="lower", date="1900-01-01")
+        return BillImporter("jid", oi, pi).import_data([bill.as_dict()])["bill"]
+
+    def actions():
+        return [
+            (action.id, action.description, action.order)
+            for action in Bill.objects.get().actions.order_by("order")
+        ]
+
+    import_bill("introduced", "referred", "passed")
+    (first, _, _), (second, _, _), (third, _, _) = actions()
+
+    # one changed action, the others are kept as they are
+    assert import_bill("introduced", "referred to committee", "passed")["update"] == 1
+    after = actions()
+    assert [description for _, description, _ in after] == [
+        "introduced",
+        "referred to committee",
+        "passed",
+    ]
+    assert after[0][0] == first and after[2][0] == third
+    assert after[1][0] != second
+    assert [order for _, _, order in after] == [0, 1, 2]
+
+    # dropping the first action only renumbers the rest
+    import_bill("referred to committee", "passed")
+    assert [(action_id, order) for action_id, _, order in actions()] == [
+        (after[1][0], 0),
+        (third, 1),
+    ]
+
+
+@pytest.mark.django_db
+def test_bill_related_created_a_level_at_a_time():
+    create_jurisdiction()
+    create_org()
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+
+    bills = []
+    for n in range(3):
+        bill = ScrapeBill("HB {}".format(n), "1900", "A Bill", chamber="lower")
+        for a in range(4):
+            action = bill.add_action("action {}".format(a), "1900-01-01", chamber="lower")
+            action.add_related_entity("House", "organization")
+        bill.add_version_link("v1", "http://example.com/{}.pdf".format(n))
+        bills.append(bill.as_dict())
+
+    with CaptureQueriesContext(connection) as queries:
+        BillImporter("jid", oi, pi).import_data(bills)
+
+    def inserts(table):
+        return [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "{}"'.format(table))
+        ]
+
+    # one insert per level of related objects, whatever the number of bills
+    assert len(inserts("opencivicdata_billaction")) == 1
+    assert len(inserts("opencivicdata_billactionrelatedentity")) == 1
+    assert len(inserts("opencivicdata_billversionlink")) == 1
+    assert Bill.objects.count() == 3
+    for bill in Bill.objects.all():
+        assert bill.actions.count() == 4
+        assert [a.related_entities.count() for a in bill.actions.all()] == [1] * 4
+        assert bill.versions.get().links.count() == 1
+
+
+@pytest.mark.django_db
+def test_bill_post_save_sees_related():
+    create_jurisdiction()
+    create_org()
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+
+    bills = []
+    for n in range(3):
+        bill = ScrapeBill("HB {}".format(n), "1900", "A Bill", chamber="lower")
+        for a in range(n + 1):
+            action = bill.add_action("action {}".format(a), "1900-01-01", chamber="lower")
+            action.add_related_entity("House", "organization")
+        bills.append(bill.as_dict())
+
+    # the signal pupa sends, as opposed to the one from Bill.objects.create
+    seen = {}
+
+    def handler(sender, instance, created, **kwargs):
+        if created and instance.actions.exists():
+            seen[instance.identifier] = [
+                a.related_entities.count() for a in instance.actions.all()
+            ]
+
+    post_save.connect(handler, sender=Bill)
+    try:
+        with override_settings(settings, {"IMPORT_BATCH_SIZE": 2}):
+            BillImporter("jid", oi, pi).import_data(bills)
+    finally:
+        post_save.disconnect(handler, sender=Bill)
+    assert seen == {"HB 0": [1], "HB 1": [1, 1], "HB 2": [1, 1, 1]}
+
+
+@pytest.mark.django_db
+def test_bill_related_copied():
+    create_jurisdiction()
+    create_org()
+    oi = OrganizationImporter("jid")
+    pi = PersonImporter("jid")
+
+    awkward = 'tab\there, new\nline, back\\slash, "quoted", {braces}, ±'
+    bill = ScrapeBill("HB 1", "1900", "A Bill", chamber="lower")
+    for a in range(3):
+        action = bill.add_action(
+            "{} {}".format(awkward, a),
+            "1900-01-01",
+            chamber="lower",
+            classification=["passage", awkward],
+            extras={"note": awkward, "n": a},
+        )
+        action.add_related_entity(awkward, "organization")
+    bill.add_action("no extras", "1900-01-02", chamber="lower")
+
+    with override_settings(
+        settings, {"IMPORT_COPY": True, "IMPORT_COPY_MIN_ROWS": 1}
+    ), CaptureQueriesContext(connection) as queries:
+        BillImporter("jid", oi, pi).import_data([bill.as_dict()])
+
+    # the related rows went through COPY instead of INSERTs
+    assert not [
+        query
+        for query in queries.captured_queries
+        if query["sql"].startswith('INSERT INTO "opencivicdata_billaction')
+    ]
+    actions = list(Bill.objects.get().actions.order_by("order"))
+    assert [a.description for a in actions] == [
+        "{} {}".format(awkward, a) for a in range(3)
+    ] + ["no extras"]
+    assert [a.order for a in actions] == [0, 1, 2, 3]
+    assert actions[0].classification == ["passage", awkward]
+    assert actions[3].classification == []
+    assert actions[1].extras == {"note": awkward, "n": 1}
+    assert actions[3].extras == {}
+    assert actions[2].related_entities.get().name == awkward
+
+
+@pytest.mark.django_db
+def test_bill_sponsors_resolved_together():
+    create_jurisdiction()
+    org = create_org()
+    adam = Person.objects.create(name="Adam Smith", family_name="Smith")
+    adam.other_names.create(name="Adam")
+    john = Person.objects.create(name="John Smith", family_name="Smith")
+    for person in (adam, john):
+        Membership.objects.create(person_id=person.id, organization_id=org.id)
+
+    bills = []
+    for n in range(3):
+        bill = ScrapeBill("HB {}".format(n), "1900", "A Bill", chamber="lower")
+        for name in ("Adam Smith", "Adam", "Smith", "Nobody"):
+            bill.add_sponsorship(name, "sponsor", "person", False)
+        bills.append(bill.as_dict())
+
+    pi = PersonImporter("jid")
+    with CaptureQueriesContext(connection) as queries:
+        BillImporter("jid", OrganizationImporter("jid"), pi).import_data(bills)
+
+    # one query for every sponsor of every bill
+    assert (
+        len(
+            [
+                query
+                for query in queries.captured_queries
+                if query["sql"].startswith("SELECT")
+                and 'FROM "opencivicdata_person"' in query["sql"]
+            ]
+        )
+        == 1
+    )
+    for bill in Bill.objects.all():
+        sponsors = {s.name: s.person_id for s in bill.sponsorships.all()}
+        # ambiguous and missing names are left unresolved, as when looked up alone
+        assert sponsors == {
+            "Adam Smith": adam.id,
+            "Adam": adam.id,
+            "Smith": None,
+            "Nobody": None,
+        }
+    assert pi.pseudo_id_cache['~{"name": "Smith"}'] is None
@@ -331,3 +331,30 @@ def test_event_agenda_item():
     e = Event.objects.get()
     a = e.agenda.all()[0]
     assert a.extras == {"one": 1, "two": [2]}
+
+
+@pytest.mark.django_db
+def test_event_agenda_reordered_in_place():
+    create_jurisdiction()
+
+    def event(descriptions):
+        e = ge()
+        for description in descriptions:
+            e.add_agenda_item(description)
+        return e.as_dict()
+
+    EventImporter("jid", oi, pi, bi, vei).import_data([event(["a", "b", "c"])])
+    ids = {a.description: a.id for a in Event.objects.get().agenda.all()}
+
+    # every item's order changes, but the rows are only renumbered
+    result = EventImporter("jid", oi, pi, bi, vei).import_data(
+        [event(["c", "a", "b"])]
+    )
+    assert result["event"]["update"] == 1
+    agenda = Event.objects.get().agenda.order_by("order")
+    assert [(a.description, a.order) for a in agenda] == [
+        ("c", "0"),
+        ("a", "1"),
+        ("b", "2"),
+    ]
+    assert {a.description: a.id for a in agenda} == ids
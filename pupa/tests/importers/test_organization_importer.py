@@ -2,7 +2,7 @@ import pytest
 from opencivicdata.core.models import Organization, Jurisdiction, Division
 from pupa.scrape import Organization as ScrapeOrganization
 from pupa.importers import OrganizationImporter
-from pupa.exceptions import UnresolvedIdError, SameOrgNameError
+from pupa.exceptions import UnresolvedIdError, SameOrgNameError, DuplicateItemError
 
 
 def create_jurisdictions():
@@ -96,6 +96,19 @@ def test_deduplication_other_name_overlaps():
     assert Organization.objects.all().count() == 1
 
 
+@pytest.mark.django_db
+def test_deduplication_other_name_same_batch():
+    create_jurisdictions()
+    un = ScrapeOrganization("United Nations", classification="international")
+    un.add_name("UN")
+    # whichever is imported second matches the other through their other
+    # names, as it would an existing org
+    dup = ScrapeOrganization("U.N.", classification="international")
+    dup.add_name("UN")
+    with pytest.raises(DuplicateItemError):
+        OrganizationImporter("jid1").import_data([un.as_dict(), dup.as_dict()])
+
+
 @pytest.mark.django_db
 def test_deduplication_error_overlaps():
     create_jurisdictions()
@@ -207,6 +220,27 @@ def test_pseudo_ids():
     )
 
 
+@pytest.mark.django_db
+def test_pseudo_ids_resolved_together():
+    create_jurisdictions()
+    senate = Organization.objects.create(
+        id="2", name="Senate", classification="upper", jurisdiction_id="jid1"
+    )
+    senate.other_names.create(name="Upper House")
+    house = Organization.objects.create(
+        id="3", name="House", classification="lower", jurisdiction_id="jid1"
+    )
+
+    by_name = '~{"classification": "upper", "name": "Upper House"}'
+    # limit_spec ignores an empty name, so this is any lower chamber
+    empty_name = '~{"classification": "lower", "name": ""}'
+    oi = OrganizationImporter("jid1")
+    assert oi.pseudo_id_lookup({"classification": "lower", "name": ""}) is None
+    oi.resolve_pseudo_ids([by_name, empty_name])
+    assert oi.resolve_json_id(by_name) == senate.id
+    assert oi.resolve_json_id(empty_name) == house.id
+
+
 @pytest.mark.django_db
 def test_parent_id_resolution():
     create_jurisdictions()
@@ -0,0 +1,172 @@
+import datetime
+import pytest
+from opencivicdata.core.models import Jurisdiction, Division, Organization
+from opencivicdata.legislative.models import (
+    Bill,
+    BillAction,
+    BillActionRelatedEntity,
+)
+from pupa.importers.pgcopy import copy_insert
+from pupa.models import RunPlan
+
+
+# everything COPY's text format and PostgreSQL's array syntax treat specially
+AWKWARD = [
+    "",
+    "plain",
+    "tab\there",
+    "new\nline",
+    "carriage\rreturn",
+    "back\\slash",
+    "\\N",
+    "\\\\N",
+    "trailing\\",
+    'double "quotes"',
+    "single 'quotes'",
+    "{braces}",
+    "comma, separated",
+    "NULL",
+    " padded ",
+    "±✓ 😀",
+]
+
+
+def create_bills():
+    Division.objects.create(id="ocd-division/country:us", name="USA")
+    j = Jurisdiction.objects.create(id="jid", division_id="ocd-division/country:us")
+    session = j.legislative_sessions.create(identifier="1900", name="1900")
+    org = Organization.objects.create(
+        id="org-id", name="House", classification="lower", jurisdiction_id="jid"
+    )
+    bills = [
+        Bill.objects.create(
+            identifier="HB {}".format(n),
+            title="A Bill",
+            legislative_session=session,
+            from_organization=org,
+        )
+        for n in range(2)
+    ]
+    return org, bills
+
+
+def actions(bill, org):
+    result = [
+        BillAction(
+            bill=bill,
+            organization=org,
+            description=value,
+            date="1900-01-01",
+            classification=[value, "passage"],
+            order=order,
+            extras={"value": value, "nested": [value, None, 1.5, True, {"k": value}]},
+        )
+        for order, value in enumerate(AWKWARD)
+    ]
+    result.append(
+        BillAction(
+            bill=bill,
+            organization=org,
+            description="empty",
+            date="1900-01-02",
+            classification=[],
+            order=len(result),
+            extras={},
+        )
+    )
+    result.append(
+        BillAction(
+            bill=bill,
+            organization=org,
+            description="null element",
+            date="1900-01-03",
+            classification=[None, "NULL"],
+            order=len(result),
+            extras={"none": None},
+        )
+    )
+    return result
+
+
+def entities(actions):
+    return [
+        BillActionRelatedEntity(
+            action=action, name=action.description, entity_type="organization"
+        )
+        for action in actions
+    ]
+
+
+def rows(queryset, exclude):
+    fields = [
+        field.attname
+        for field in queryset.model._meta.concrete_fields
+        if field.name not in exclude
+    ]
+    return [tuple(row) for row in queryset.values_list(*fields)]
+
+
+@pytest.mark.django_db
+def test_copy_matches_bulk_create():
+    org, (copied, created) = create_bills()
+
+    copied_actions = actions(copied, org)
+    assert copy_insert(BillAction, copied_actions)
+    created_actions = actions(created, org)
+    BillAction.objects.bulk_create(created_actions)
+
+    assert copy_insert(BillActionRelatedEntity, entities(copied_actions))
+    BillActionRelatedEntity.objects.bulk_create(entities(created_actions))
+
+    exclude = {"id", "bill"}
+    copied_rows = rows(copied.actions.order_by("order"), exclude)
+    assert copied_rows == rows(created.actions.order_by("order"), exclude)
+    assert [row[1] for row in copied_rows] == AWKWARD + ["empty", "null element"]
+
+    exclude = {"id", "action"}
+    assert rows(
+        BillActionRelatedEntity.objects.filter(action__bill=copied).order_by(
+            "action__order"
+        ),
+        exclude,
+    ) == rows(
+        BillActionRelatedEntity.objects.filter(action__bill=created).order_by(
+            "action__order"
+        ),
+        exclude,
+    )
+
+
+@pytest.mark.django_db
+def test_copy_takes_ids_from_sequence():
+    Division.objects.create(id="ocd-division/country:us", name="USA")
+    Jurisdiction.objects.create(id="jid", division_id="ocd-division/country:us")
+    when = datetime.datetime(2020, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+
+    def plans(success):
+        return [
+            RunPlan(
+                jurisdiction_id="jid",
+                success=success,
+                start_time=when,
+                end_time=when + datetime.timedelta(hours=1),
+                exception=value,
+                traceback=value,
+            )
+            for value in AWKWARD
+        ]
+
+    copied = plans(False)
+    assert copy_insert(RunPlan, copied)
+    assert all(plan.id for plan in copied)
+    # bulk_create afterwards doesn't collide with the ids COPY used
+    RunPlan.objects.bulk_create(plans(True))
+
+    exclude = {"id", "success"}
+    by_id = RunPlan.objects.order_by("id")
+    assert rows(by_id.filter(success=False), exclude) == rows(
+        by_id.filter(success=True), exclude
+    )
+    assert [plan.id for plan in by_id.filter(success=False)] == [
+        plan.id for plan in copied
+    ]
@@ -0,0 +1,29 @@
+import pytest
+from pupa.utils.background import BackgroundWorker
+
+
+def test_background_worker_runs_in_order():
+    results = []
+    worker = BackgroundWorker(maxsize=2)
+    for n in range(10):
+        worker.submit(lambda n=n: results.append(n))
+    worker.close()
+    assert results == list(range(10))
+
+
+def test_background_worker_error():
+    results = []
+    worker = BackgroundWorker(maxsize=2)
+    worker.submit(lambda: 1 / 0)
+    worker.submit(lambda: results.append(1))
+    with pytest.raises(ZeroDivisionError):
+        worker.close()
+    # functions after the failure are skipped
+    assert results == []
+
+
+def test_background_worker_close_without_raise():
+    worker = BackgroundWorker(maxsize=2)
+    worker.submit(lambda: 1 / 0)
+    worker.close(raise_error=False)
+    assert not worker.thread.is_alive()
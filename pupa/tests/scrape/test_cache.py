@@ -0,0 +1,297 @@
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+import mock
+import pytest
+import requests
+from pupa import settings
+from pupa.cli.commands.cache import Command
+from pupa.cli.commands.update import override_settings
+from pupa.exceptions import CommandError
+from pupa.scrape import Scraper, Jurisdiction
+from pupa.utils.cache import SQLiteCache
+
+
+def response(content, status=200):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.encoding = "utf8"
+    resp.headers["Content-Type"] = "text/html"
+    resp._content = content
+    return resp
+
+
+def test_sqlite_cache_roundtrip():
+    cache = SQLiteCache(tempfile.mkdtemp())
+    assert cache.get("http://example.com") is None
+
+    cache.set("http://example.com", response(b"hello"))
+    resp = cache.get("http://example.com")
+    assert resp.content == b"hello"
+    assert resp.text == "hello"
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "text/html"
+    assert resp.url == "http://example.com"
+
+    cache.set("http://example.com", response(b"bye"))
+    assert cache.get("http://example.com").content == b"bye"
+    assert cache.stats()["responses"] == 1
+
+    cache.clear()
+    assert cache.get("http://example.com") is None
+
+
+def test_sqlite_cache_lru_eviction():
+    cache = SQLiteCache(tempfile.mkdtemp())
+    for i in range(5):
+        cache.set(str(i), response(b"x" * 100))
+        time.sleep(0.01)
+    # touch the oldest so it is kept over 1 & 2
+    cache.get("0")
+
+    size = cache.stats()["bytes"] // 5
+    removed, freed = cache.prune(max_bytes=size * 3)
+    assert removed == 2
+    assert freed == size * 2
+    assert cache.get("1") is None and cache.get("2") is None
+    assert all(cache.get(key) for key in "034")
+
+
+def test_sqlite_cache_budget_on_write():
+    cache = SQLiteCache(tempfile.mkdtemp(), max_bytes=2000)
+    for i in range(50):
+        cache.set(str(i), response(b"x" * 100))
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.get("49")
+
+
+def test_sqlite_cache_max_age():
+    cache = SQLiteCache(tempfile.mkdtemp(), max_age=60)
+    cache.set("new", response(b"new"))
+    cache.set("old", response(b"old"))
+    cache._conn.execute("UPDATE responses SET created=0 WHERE key='old'")
+    cache._conn.commit()
+
+    assert cache.get("new")
+    assert cache.get("old") is None
+    assert cache.prune()[0] == 1
+    assert cache.stats()["responses"] == 1
+
+
+def test_sqlite_cache_shared():
+    cache_dir = tempfile.mkdtemp()
+    caches = [SQLiteCache(cache_dir) for _ in range(2)]
+
+    def write(n):
+        for i in range(20):
+            caches[n % 2].set("{}-{}".format(n, i), response(b"x"))
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert caches[0].stats()["responses"] == 80
+    assert caches[1].get("3-19").content == b"x"
+
+
+def test_sqlite_cache_access_times_batched():
+    cache = SQLiteCache(tempfile.mkdtemp())
+    cache.set("a", response(b"a"))
+
+    def accessed():
+        return cache._conn.execute("SELECT accessed FROM responses").fetchone()[0]
+
+    written = accessed()
+    time.sleep(0.01)
+    cache.get("a")
+    assert accessed() == written
+    cache.flush()
+    assert accessed() > written
+
+    with mock.patch("pupa.utils.cache.ACCESS_BATCH_SIZE", 2):
+        cache.set("b", response(b"b"))
+        written = accessed()
+        time.sleep(0.01)
+        cache.get("a")
+        cache.get("b")
+    assert cache._accessed == {}
+    assert accessed() > written
+
+
+def test_sqlite_cache_totals():
+    cache = SQLiteCache(tempfile.mkdtemp())
+
+    def scanned():
+        return cache._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    for i in range(10):
+        cache.set(str(i), response(b"x" * i))
+    cache.set("3", response(b"replaced"))
+    stats = cache.stats()
+    assert (stats["responses"], stats["bytes"]) == scanned() == cache._totals(cache._conn)
+    assert stats["responses"] == 10
+
+    cache.prune(max_bytes=stats["bytes"] // 2)
+    assert cache._totals(cache._conn) == scanned()
+    cache.clear()
+    assert cache._totals(cache._conn) == (0, 0)
+
+
+def test_sqlite_cache_close():
+    cache = SQLiteCache(tempfile.mkdtemp())
+    cache.set("a", response(b"a"))
+    thread = threading.Thread(target=cache.get, args=("a",))
+    thread.start()
+    thread.join()
+    conns = list(cache._conns.values())
+    assert len(conns) == 2
+
+    cache.close()
+    assert cache._conns == {}
+    assert cache._accessed == {}
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    # usable again afterwards
+    assert cache.get("a").content == b"a"
+    cache.close()
+
+
+class FakeJurisdiction(Jurisdiction):
+    jurisdiction_id = "jurisdiction"
+
+
+def test_scraper_sqlite_backend():
+    cache_dir = tempfile.mkdtemp()
+    with override_settings(
+        settings, {"CACHE_DIR": cache_dir, "CACHE_BACKEND": "sqlite"}
+    ):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/")
+    assert isinstance(scraper.cache_storage, SQLiteCache)
+
+    with override_settings(settings, {"CACHE_DIR": cache_dir}):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/")
+    assert not isinstance(scraper.cache_storage, SQLiteCache)
+
+
+class FakeServer:
+    """stands in for requests.Session.request, honoring conditional GETs"""
+
+    def __init__(self):
+        self.content = b"v1"
+        self.etag = '"1"'
+        self.requests = []
+
+    def __call__(self, method, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(dict(headers))
+        resp = requests.Response()
+        resp.encoding = "utf8"
+        resp.url = url
+        if self.etag and headers.get("If-None-Match") == self.etag:
+            resp.status_code = 304
+            resp._content = b""
+        elif not self.etag and headers.get("If-Modified-Since") == "yesterday":
+            resp.status_code = 304
+            resp._content = b""
+        else:
+            resp.status_code = 200
+            resp._content = self.content
+            if self.etag:
+                resp.headers["ETag"] = self.etag
+            else:
+                resp.headers["Last-Modified"] = "yesterday"
+        return resp
+
+
+@pytest.mark.parametrize("backend", ["files", "sqlite"])
+def test_scraper_revalidate(backend):
+    server = FakeServer()
+    with override_settings(
+        settings,
+        {
+            "CACHE_DIR": tempfile.mkdtemp(),
+            "CACHE_BACKEND": backend,
+            "CACHE_REVALIDATE": True,
+            "SCRAPELIB_RPM": 600,
+            "SCRAPELIB_RETRY_ATTEMPTS": 0,
+        },
+    ):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/")
+    scraper._last_request = time.time() - 60
+
+    with mock.patch.object(requests.Session, "request", side_effect=server):
+        assert scraper.get("http://example.com").content == b"v1"
+        assert "If-None-Match" not in server.requests[-1]
+
+        # unchanged, served from cache without using up the rate limit
+        resp = scraper.get("http://example.com")
+        assert resp.content == b"v1"
+        assert resp.fromcache
+        assert server.requests[-1]["If-None-Match"] == '"1"'
+        assert scraper.not_modified == 1
+        # so the next request doesn't have to wait
+        assert time.time() - scraper._last_request >= scraper._request_frequency - 0.001
+
+        # changed, downloaded & cached again
+        server.content, server.etag = b"v2", None
+        resp = scraper.get("http://example.com")
+        assert resp.content == b"v2"
+        assert not resp.fromcache
+
+        resp = scraper.get("http://example.com")
+        assert resp.content == b"v2"
+        assert server.requests[-1]["If-Modified-Since"] == "yesterday"
+        assert scraper.not_modified == 2
+
+
+def test_scraper_revalidate_off():
+    server = FakeServer()
+    with override_settings(
+        settings, {"CACHE_DIR": tempfile.mkdtemp(), "SCRAPELIB_RETRY_ATTEMPTS": 0}
+    ):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/", fastmode=True)
+
+    with mock.patch.object(requests.Session, "request", side_effect=server):
+        scraper.get("http://example.com")
+        server.content = b"v2"
+        # fastmode serves from cache without asking
+        assert scraper.get("http://example.com").content == b"v1"
+    assert len(server.requests) == 1
+
+
+def run_command(*argv):
+    parser = argparse.ArgumentParser("pupa")
+    subparsers = parser.add_subparsers(dest="subcommand")
+    command = Command(subparsers)
+    args = parser.parse_args(("cache",) + argv)
+    command.handle(args, [])
+
+
+def test_cache_command(capsys):
+    cache_dir = tempfile.mkdtemp()
+    with pytest.raises(CommandError):
+        run_command("stats", "--cachedir", cache_dir)
+
+    cache = SQLiteCache(cache_dir)
+    for i in range(3):
+        cache.set(str(i), response(b"x" * 100))
+
+    run_command("stats", "--cachedir", cache_dir)
+    assert "responses: 3" in capsys.readouterr().out
+
+    with override_settings(settings, {"CACHE_MAX_BYTES": 0, "CACHE_MAX_AGE": 0}):
+        with pytest.raises(CommandError):
+            run_command("prune", "--cachedir", cache_dir)
+        run_command("prune", "--cachedir", cache_dir, "--max-bytes", "200")
+    assert "removed 2 responses" in capsys.readouterr().out
+    assert cache.stats()["responses"] == 1
+
+    with pytest.raises(CommandError):
+        run_command("explode", "--cachedir", cache_dir)
@@ -0,0 +1,180 @@
+import copy
+import datetime
+import pytest
+from pupa import settings
+from pupa.scrape import Person, Organization, Membership, Post
+from pupa.scrape.popolo import org_schema_no_sources
+from pupa.scrape.base import get_checker, get_validator
+from pupa.scrape.compiled import compile_schema, UnsupportedSchema
+from pupa.exceptions import ScrapeValueError
+from .test_bill_scrape import toy_bill
+from .test_event_scrape import event_obj
+from .test_vote_event_scrape import toy_vote_event
+from .test_jurisdiction_scrape import FakeJurisdiction
+
+# values substituted into every position of the fixtures below
+REPLACEMENTS = [
+    None,
+    "",
+    "x",
+    "2020-01-01",
+    "2020-01-01T10:00:00Z",
+    "not a date",
+    "http://example.com",
+    "http://exa mple.com",
+    0,
+    1.5,
+    True,
+    [],
+    ["x"],
+    [{}],
+    {},
+    {"url": None},
+    datetime.date(2020, 1, 1),
+    datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc),
+]
+
+
+def full_bill():
+    b = toy_bill()
+    b.add_action("introduced", "2012-01-01", chamber="upper").add_related_entity(
+        "Smith", "person"
+    )
+    b.add_sponsorship("Smith", "primary", "person", True)
+    b.add_version_link("Introduced", "http://example.com/v1", media_type="text/html")
+    b.add_document_link("Fiscal Note", "http://example.com/fn", date="2012-01-02")
+    b.add_subject("cookies")
+    b.add_abstract("about cookies", note="summary")
+    b.add_title("Cookie Act")
+    b.add_related_bill("HB 1", "2012A", "companion")
+    return b
+
+
+def full_vote_event():
+    ve = toy_vote_event()
+    ve.set_bill("HB 2017")
+    ve.set_count("yes", 1)
+    ve.yes("James")
+    return ve
+
+
+def full_event():
+    e = event_obj()
+    e.add_participant("Committee", type="organization")
+    e.add_media_link("video", "http://example.com/v", "video/mp4")
+    e.add_document("agenda", "http://example.com/a")
+    item = e.add_agenda_item("first")
+    item.add_bill("HB 2017")
+    item.add_media_link("video", "http://example.com/v2", "video/mp4")
+    return e
+
+
+def full_person():
+    p = Person("Jane Doe", birth_date="1970-01-01", image="")
+    p.add_source("http://example.com")
+    p.add_name("Janey", start_date="2000")
+    p.add_link("http://example.com/jane")
+    p.add_contact_detail(type="email", value="jane@example.com")
+    p.add_identifier("1", scheme="x")
+    return p
+
+
+def full_org():
+    o = Organization("Committee", classification="committee", founding_date="2000")
+    o.add_source("http://example.com")
+    return o
+
+
+def full_membership():
+    return Membership(
+        person_id="abc",
+        person_name="Jane Doe",
+        organization_id="xyz",
+        role="member",
+        start_date="2001",
+    )
+
+
+# (fixture, schema it validates against if not its own)
+FIXTURES = [
+    (full_bill, None),
+    (full_vote_event, None),
+    (full_event, None),
+    (full_person, None),
+    (full_org, None),
+    (lambda: Organization("Senate", classification="upper"), org_schema_no_sources),
+    (full_membership, None),
+    (lambda: Post(label="1", role="Senator", chamber="upper"), None),
+    (FakeJurisdiction, None),
+]
+
+
+def mutations(value):
+    """yield copies of value with each nested position replaced"""
+    for replacement in REPLACEMENTS:
+        yield replacement
+    if isinstance(value, dict):
+        for key in value:
+            for mutated in mutations(value[key]):
+                new = copy.copy(value)
+                new[key] = mutated
+                yield new
+            new = copy.copy(value)
+            del new[key]
+            yield new
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            for mutated in mutations(item):
+                new = list(value)
+                new[i] = mutated
+                yield new
+
+
+def outcome(func, instance):
+    """result of func(instance), or the exception type it raised"""
+    try:
+        return func(instance)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("fixture,schema", FIXTURES)
+def test_compiled_matches_jsonschema(fixture, schema):
+    obj = fixture()
+    data = obj.as_dict()
+    schema = schema or obj._schema
+    checker = get_checker(schema)
+    validator = get_validator(schema)
+
+    assert checker is not None
+    assert checker(data) and validator.is_valid(data)
+    for instance in mutations(data):
+        assert outcome(checker, instance) == outcome(validator.is_valid, instance)
+
+
+@pytest.mark.parametrize("fixture,schema", FIXTURES)
+def test_compiled_error_messages(fixture, schema, monkeypatch):
+    obj = fixture()
+    obj.extras = None
+
+    messages = []
+    for engine in ("jsonschema", "compiled"):
+        monkeypatch.setattr(settings, "SCRAPE_VALIDATOR", engine, raising=False)
+        with pytest.raises(ScrapeValueError) as e:
+            obj.validate()
+        messages.append(str(e.value))
+    assert messages[0] == messages[1]
+
+
+def test_compiled_required_and_unsupported():
+    format_checker = get_validator({}).format_checker
+    check = compile_schema(
+        {"properties": {"a": {"type": "string", "required": True}}}, format_checker
+    )
+    assert check({"a": "x"})
+    assert not check({})
+    assert check("not an object")
+
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"additionalProperties": False}, format_checker)
+    assert get_checker({"type": "object", "dependencies": {}}) is None
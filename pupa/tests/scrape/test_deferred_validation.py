@@ -0,0 +1,116 @@
+import os
+import json
+import datetime
+import argparse
+import tempfile
+import pytest
+from pupa import settings
+from pupa.cli.commands.update import Command, override_settings
+from pupa.exceptions import ScrapeValueError
+from pupa.scrape import Person, Organization, Bill, Event
+from pupa.scrape.deferred import validate_datadir, validate_objects
+from pupa.utils.generic import JSONEncoderPlus
+from pupa.utils.segments import SegmentWriter
+
+
+def objects():
+    good = Person("Good Person")
+    good.add_source("http://example.com")
+    # parties don't need sources, other organizations do
+    party = Organization("Green", classification="party")
+    bad_org = Organization("Committee", classification="committee")
+    bad_bill = Bill("HB 1", "2020", "a bill")
+    return [good, party, bad_org, bad_bill]
+
+
+def write_files(datadir):
+    for obj in objects():
+        fname = "{}_{}.json".format(obj._type, obj._id).replace("/", "-")
+        with open(os.path.join(datadir, fname), "w") as f:
+            json.dump(obj.as_dict(), f)
+
+
+def write_segments(datadir):
+    writer = SegmentWriter(datadir, 1000)
+    for obj in objects():
+        writer.write(obj._type, json.dumps(obj.as_dict()))
+    writer.close()
+
+
+@pytest.mark.parametrize("write", [write_files, write_segments])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_datadir(write, workers):
+    datadir = tempfile.mkdtemp()
+    write(datadir)
+
+    count, errors = validate_datadir(datadir, workers=workers)
+    assert count == 4
+    assert len(errors) == 2
+    assert errors[0].startswith("validation of Organization ")
+    assert errors[1].startswith("validation of Bill ")
+
+
+def events():
+    utc = datetime.timezone.utc
+    est = datetime.timezone(-datetime.timedelta(hours=5))
+    start_dates = [
+        datetime.datetime(2020, 1, 1, 10, 0, 0, 500, tzinfo=utc),
+        datetime.datetime(2020, 1, 1, 10, 0, tzinfo=utc),
+        datetime.datetime(2020, 1, 1, 10, 0, tzinfo=est),
+        datetime.date(2020, 1, 1),
+        "2020-01-01T10:00:00.5+00:00",
+        "2020-01-01T10:00Z",
+        "2020-01-01",
+        "2020-01-01T10.5",
+        "January 1",
+    ]
+    for start_date in start_dates:
+        event = Event("Meeting", start_date, location_name="Room 1")
+        event.add_source("http://example.com")
+        yield event
+
+
+@pytest.mark.parametrize("engine", ["jsonschema", "compiled"])
+@pytest.mark.parametrize("obj", list(objects()) + list(events()))
+def test_full_and_deferred_agree(obj, engine):
+    with override_settings(settings, {"SCRAPE_VALIDATOR": engine}):
+        try:
+            obj.validate()
+        except ScrapeValueError:
+            full = False
+        else:
+            full = True
+
+        # what deferred validation reads back from the datadir
+        data = json.loads(json.dumps(obj.as_dict(), cls=JSONEncoderPlus))
+        assert (not validate_objects([(obj._type, data)])) == full
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_do_validate(strict):
+    parser = argparse.ArgumentParser("pupa")
+    command = Command(parser.add_subparsers(dest="subcommand"))
+    args = argparse.Namespace(module="test", strict=strict)
+    datadir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(datadir, "test"))
+    write_files(os.path.join(datadir, "test"))
+
+    with override_settings(
+        settings,
+        {"SCRAPED_DATA_DIR": datadir, "SCRAPE_VALIDATION_WORKERS": 1},
+    ):
+        if strict:
+            with pytest.raises(ScrapeValueError):
+                command.do_validate(args)
+        else:
+            assert command.do_validate(args) == {"objects": 4, "errors": 2}
+
+
+def test_validation_argument():
+    parser = argparse.ArgumentParser("pupa")
+    subparsers = parser.add_subparsers(dest="subcommand")
+    Command(subparsers)
+    args = parser.parse_args(["update", "test", "--validation", "sample=5%"])
+    assert args.SCRAPE_VALIDATION == "sample=5%"
+    with pytest.raises(SystemExit):
+        parser.parse_args(["update", "test", "--validation", "some"])
@@ -0,0 +1,37 @@
+import sqlite3
+import pytest
+from pupa.utils.digests import DigestStore
+
+
+def test_digest_store(tmpdir):
+    store = DigestStore(str(tmpdir), "v1")
+    store.add("a")
+    assert "a" in store
+    assert "b" not in store
+    store.flush()
+    store.add("b")
+    assert len(store) == 2
+
+    # persisted across instances of the same version
+    store = DigestStore(str(tmpdir), "v1")
+    assert "a" in store and "b" in store
+
+    # a new schema version invalidates everything
+    store = DigestStore(str(tmpdir), "v2")
+    assert "a" not in store
+    assert len(store) == 0
+
+
+def test_digest_store_close(tmpdir):
+    store = DigestStore(str(tmpdir), "v1")
+    store.add("a")
+    conn = store._conn
+    store.close()
+    assert store._conns == {}
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+    # pending digests were written, and the store can still be used
+    assert "a" in DigestStore(str(tmpdir), "v1")
+    assert "a" in store
+    store.close()
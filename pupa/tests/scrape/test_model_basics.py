@@ -8,7 +8,9 @@ from pupa.scrape.base import (
     AssociatedLinkMixin,
     OtherNameMixin,
     IdentifierMixin,
+    get_validator,
 )
+from pupa.scrape.popolo import org_schema, org_schema_no_sources
 
 
 class GenericModel(
@@ -197,3 +199,128 @@ def test_add_identifier():
 
     assert g.identifiers[-1]["scheme"] == "kruft"
     assert g.identifiers[0]["identifier"] == "id10t"
+
+
+def test_validator_is_cached():
+    assert get_validator(schema) is get_validator(schema)
+    assert get_validator(org_schema) is not get_validator(org_schema_no_sources)
+    assert get_validator(org_schema_no_sources).schema is org_schema_no_sources
+
+
+def test_add_associated_link_many():
+    m = GenericModel()
+    for n in range(10000):
+        m._add_associated_link(
+            "_associated",
+            "version {}".format(n % 100),
+            "http://example.com/{}".format(n),
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+
+    assert len(m._associated) == 100
+    assert all(len(item["links"]) == 100 for item in m._associated)
+    with pytest.raises(ValueError):
+        m._add_associated_link(
+            "_associated",
+            "version 1",
+            "http://example.com/5000",
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+
+
+def test_add_associated_link_outside_changes():
+    m = GenericModel()
+    m._add_associated_link(
+        "_associated",
+        "something",
+        "http://example.com/1",
+        text="",
+        media_type="text/html",
+        on_duplicate="error",
+    )
+    # items added or replaced without _add_associated_link are still seen
+    m._associated.append(
+        {"note": "other", "date": "", "links": [{"url": "http://example.com/2"}]}
+    )
+    with pytest.raises(ValueError):
+        m._add_associated_link(
+            "_associated",
+            "something",
+            "http://example.com/2",
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+
+    m._associated = [{"note": "other", "date": "", "links": []}]
+    ver = m._add_associated_link(
+        "_associated",
+        "other",
+        "http://example.com/1",
+        text="",
+        media_type="text/html",
+        on_duplicate="error",
+    )
+    assert ver is m._associated[0]
+    assert len(m._associated[0]["links"]) == 1
+
+
+def test_add_associated_link_direct_link_append():
+    m = GenericModel()
+    ver = m._add_associated_link(
+        "_associated",
+        "something",
+        "http://example.com/1",
+        text="",
+        media_type="text/html",
+        on_duplicate="error",
+    )
+    # links appended straight to the item being added to are still seen
+    ver["links"].append({"url": "http://example.com/2"})
+    with pytest.raises(ValueError):
+        m._add_associated_link(
+            "_associated",
+            "something",
+            "http://example.com/2",
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+    # as are items appended straight to the collection
+    m._associated.append({"note": "new", "date": "", "links": [{"url": "http://example.com/3"}]})
+    with pytest.raises(ValueError):
+        m._add_associated_link(
+            "_associated",
+            "other",
+            "http://example.com/3",
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+
+
+def test_add_associated_link_error_order():
+    m = GenericModel()
+    m._associated = [
+        {"note": "a", "date": "", "links": [{"url": "http://example.com/1"}]},
+        {"note": "a", "date": "", "links": []},
+    ]
+    # as before indexing, multiple matches are reported before a duplicate url
+    with pytest.raises(AssertionError):
+        m._add_associated_link(
+            "_associated",
+            "a",
+            "http://example.com/1",
+            text="",
+            media_type="text/html",
+            on_duplicate="error",
+        )
+
+
+def test_precomputed_properties():
+    assert GenericModel._properties == frozenset(schema["properties"])
+    assert GenericModel._property_names == tuple(schema["properties"])
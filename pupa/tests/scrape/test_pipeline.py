@@ -0,0 +1,321 @@
+import os
+import argparse
+import datetime
+import tempfile
+import time
+import threading
+import mock
+import pytest
+from collections import OrderedDict
+from pupa import settings
+from pupa.cli.commands.update import Command, override_settings
+from pupa.exceptions import ScrapeError
+from pupa.scrape import Jurisdiction, Scraper, BaseBillScraper, Person, Bill
+from pupa.utils.pipeline import ImportPipeline
+
+
+def in_thread(func, *args):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_types_close_when_no_scraper_can_produce_them():
+    pipeline = ImportPipeline(["person", "bill"], 10)
+    pipeline.expect("people", ("person", "event"))
+    pipeline.expect("bills", ("bill",))
+
+    pipeline.put("people", "person", {"name": "Jordan", "when": datetime.date(2020, 1, 2)})
+    # objects of types that aren't imported are dropped
+    pipeline.put("people", "event", {})
+    pipeline.finished("people")
+    # people are importable while bills are still being scraped
+    assert list(pipeline.objects("person")) == [{"name": "Jordan", "when": "2020-01-02"}]
+
+    pipeline.put("bills", "bill", {"identifier": "HB 1"})
+    pipeline.finished("bills")
+    assert list(pipeline.objects("bill")) == [{"identifier": "HB 1"}]
+
+
+def test_objects_streamed_as_scraped():
+    pipeline = ImportPipeline(["bill"], 10)
+    pipeline.expect("bills", ("bill",))
+    bills = pipeline.objects("bill")
+
+    pipeline.put("bills", "bill", {"identifier": "HB 1"})
+    assert next(bills) == {"identifier": "HB 1"}
+    pipeline.put("bills", "bill", {"identifier": "HB 2"})
+    assert next(bills) == {"identifier": "HB 2"}
+    pipeline.finished("bills")
+    assert list(bills) == []
+
+
+def test_undeclared_producer_blocks_every_type():
+    pipeline = ImportPipeline(["person", "bill"], 10)
+    pipeline.expect("people", ("person",))
+    pipeline.expect("anything")
+    pipeline.finished("people")
+
+    thread, result = in_thread(lambda: list(pipeline.objects("person")))
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    pipeline.put("anything", "person", {"name": "Jordan"})
+    pipeline.finished("anything")
+    thread.join()
+    assert result == [[{"name": "Jordan"}]]
+
+
+def test_full_buffer_blocks_producer():
+    pipeline = ImportPipeline(["person", "bill"], 2)
+    pipeline.expect("people", ("person",))
+    pipeline.expect("bills", ("bill",))
+    for n in range(2):
+        pipeline.put("bills", "bill", {"n": n})
+
+    thread, _ = in_thread(pipeline.put, "bills", "bill", {"n": 2})
+    thread.join(0.1)
+    assert thread.is_alive()
+    # still blocked while people are imported, it can't produce any
+    people = pipeline.objects("person")
+    pipeline.finished("people")
+    assert list(people) == []
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    bills = pipeline.objects("bill")
+    assert [next(bills), next(bills)] == [{"n": 0}, {"n": 1}]
+    thread.join()
+    pipeline.finished("bills")
+    assert list(bills) == [{"n": 2}]
+
+
+def test_full_buffer_never_blocks_producer_of_awaited_type():
+    pipeline = ImportPipeline(["person", "bill"], 2)
+    pipeline.expect("anything")
+    people = pipeline.objects("person")
+    thread, result = in_thread(list, people)
+
+    # waiting here would never end, the importer needs this scraper to finish
+    for n in range(5):
+        pipeline.put("anything", "bill", {"n": n})
+    pipeline.put("anything", "person", {"name": "Jordan"})
+    pipeline.finished("anything")
+    thread.join()
+    assert result == [[{"name": "Jordan"}]]
+    assert len(list(pipeline.objects("bill"))) == 5
+
+
+def test_undeclared_type_and_abort():
+    pipeline = ImportPipeline(["person"], 10)
+    pipeline.expect("people", ())
+    assert list(pipeline.objects("person")) == []
+
+    # a scraper that didn't declare it produces people
+    with pytest.raises(ScrapeError):
+        pipeline.put("people", "person", {"name": "Jordan"})
+    with pytest.raises(ScrapeError):
+        list(pipeline.objects("person"))
+
+
+def test_late_object():
+    pipeline = ImportPipeline(["person"], 10)
+    pipeline.expect("people", ("person",))
+    pipeline.expect("other", ())
+    people = pipeline.objects("person")
+    pipeline.finished("people")
+    assert list(people) == []
+
+    # registered too late, it might have produced people
+    pipeline.expect("other")
+    with pytest.raises(ScrapeError):
+        pipeline.put("other", "person", {"name": "Jordan"})
+    with pytest.raises(ScrapeError):
+        pipeline.put("other", "person", {"name": "Jordan"})
+
+
+class PeopleScraper(Scraper):
+    produces = ("person",)
+
+    def scrape(self):
+        p = Person("Michael Jordan")
+        p.add_source("http://example.com")
+        yield p
+
+
+class BillScraper(Scraper):
+    def scrape(self, session="2020"):
+        b = Bill("HB 1", session, "a bill")
+        b.add_source("http://example.com")
+        yield b
+
+
+# (type, identifier or name) of each object as an importer gets it
+streamed = []
+
+
+class StreamedBillScraper(BaseBillScraper):
+    """saves HB 2 once the importers got people and HB 1, no produces of its own"""
+
+    def get_bill_ids(self):
+        return [("HB 1", {}), ("HB 2", {})]
+
+    def get_bill(self, bill_id):
+        if bill_id == "HB 2":
+            deadline = time.time() + 10
+            while ("bill", "HB 1") not in streamed and time.time() < deadline:
+                time.sleep(0.01)
+            assert ("person", "Michael Jordan") in streamed
+            assert ("bill", "HB 1") in streamed
+        b = Bill(bill_id, self.legislative_session, "a bill")
+        b.add_source("http://example.com")
+        return b
+
+
+class BrokenScraper(Scraper):
+    def scrape(self):
+        raise ValueError("broken scraper")
+
+
+class SlowScraper(Scraper):
+    """saves a person every 50ms for a minute"""
+
+    produces = ("person",)
+    saved = 0
+
+    def scrape(self):
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            p = Person("Slow Person")
+            p.add_source("http://example.com")
+            yield p
+            SlowScraper.saved += 1
+            time.sleep(0.05)
+
+
+class FakeJurisdiction(Jurisdiction):
+    division_id = "ocd-division/test"
+    classification = "government"
+    name = "Test"
+    url = "http://example.com"
+    scrapers = {
+        "people": PeopleScraper,
+        "bills": BillScraper,
+        "streamed": StreamedBillScraper,
+        "broken": BrokenScraper,
+        "slow": SlowScraper,
+    }
+
+    def get_organizations(self):
+        return []
+
+
+class FakeImporter(object):
+    def __init__(self, _type, imported):
+        self._type = _type
+        self.imported = imported
+
+    def import_data(self, data_items):
+        ids = []
+        for data in data_items:
+            ids.append(data["_id"])
+            streamed.append((self._type, data.get("identifier", data.get("name"))))
+        self.imported.append((self._type, ids))
+        return {self._type: {"insert": len(ids)}}
+
+    def get_seen_sessions(self):
+        return []
+
+
+def run_pipeline(scrapers, overrides=None):
+    parser = argparse.ArgumentParser("pupa")
+    command = Command(parser.add_subparsers(dest="subcommand"))
+    args = argparse.Namespace(
+        module="test", strict=True, fastmode=False, scrape_workers=2
+    )
+    imported = []
+    del streamed[:]
+    importers = OrderedDict(
+        (name, FakeImporter(_type, imported))
+        for name, _type in [
+            ("jurisdictions", "jurisdiction"),
+            ("people", "person"),
+            ("bills", "bill"),
+        ]
+    )
+    datadir = tempfile.mkdtemp()
+    overrides = dict(overrides or {}, SCRAPED_DATA_DIR=datadir, CACHE_DIR=datadir)
+    with override_settings(settings, overrides), mock.patch.object(
+        Command, "get_importers", return_value=importers
+    ), mock.patch.object(Command, "update_session_reports"), mock.patch(
+        "pupa.cli.commands.update.transaction"
+    ):
+        scrape, imported_report = command.do_pipeline(
+            FakeJurisdiction(), args, scrapers
+        )
+    return scrape, imported_report, imported, os.path.join(datadir, "test")
+
+
+def test_do_pipeline():
+    scrapers = OrderedDict([("people", {}), ("bills", {"session": "2021"})])
+    scrape, report, imported, datadir = run_pipeline(scrapers)
+
+    assert list(scrape) == ["jurisdiction", "people", "bills"]
+    assert scrape["bills"]["objects"] == {"bill": 1}
+    assert report == {
+        "jurisdiction": {"insert": 1},
+        "person": {"insert": 1},
+        "bill": {"insert": 1},
+    }
+    assert [_type for _type, _ in imported] == ["jurisdiction", "person", "bill"]
+    assert len(os.listdir(datadir)) == 3
+
+    scrape, report, imported, datadir = run_pipeline(
+        scrapers, {"SCRAPE_WRITE_DATADIR": False}
+    )
+    assert report["bill"] == {"insert": 1}
+    assert os.listdir(datadir) == []
+
+
+def test_do_pipeline_scrape_error():
+    scrapers = OrderedDict([("people", {}), ("broken", {})])
+    with pytest.raises(ValueError):
+        run_pipeline(scrapers)
+
+
+def test_do_pipeline_scrape_error_stops_other_scrapers():
+    scrapers = OrderedDict([("slow", {}), ("broken", {})])
+    start = time.time()
+    with pytest.raises(ValueError):
+        run_pipeline(scrapers)
+    # the failure surfaces without waiting for the slow scraper to finish
+    assert time.time() - start < 30
+
+    # which stops at its next save
+    saved = SlowScraper.saved
+    time.sleep(0.2)
+    assert SlowScraper.saved == saved
+
+
+def test_do_pipeline_overlaps_scraping():
+    # people and the first bill are imported while the bill scraper still runs
+    scrapers = OrderedDict([("people", {}), ("streamed", {"legislative_session": "2020"})])
+    scrape, report, imported, _ = run_pipeline(scrapers)
+    assert scrape["streamed"]["objects"] == {"bill": 2}
+    assert report["bill"] == {"insert": 2}
+
+
+def test_do_pipeline_undeclared_type():
+    class VoteScraper(Scraper):
+        produces = ("vote_event",)
+
+        def scrape(self):
+            yield from PeopleScraper.scrape(self)
+
+    FakeJurisdiction.scrapers["votes"] = VoteScraper
+    try:
+        with pytest.raises(ScrapeError):
+            run_pipeline(OrderedDict([("votes", {})]))
+    finally:
+        del FakeJurisdiction.scrapers["votes"]
@@ -0,0 +1,135 @@
+import time
+import mock
+import requests
+from pupa import settings
+from pupa.cli.commands.update import override_settings
+from pupa.scrape import Scraper, Jurisdiction
+from pupa.utils.ratelimit import AdaptiveRateLimiter, parse_retry_after
+
+
+def test_parse_retry_after():
+    now = time.time()
+    assert parse_retry_after(None, now) is None
+    assert parse_retry_after("120", now) == 120
+    assert parse_retry_after("100000", now) == 600
+    assert parse_retry_after("garbage", now) is None
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(now + 30))
+    assert 28 <= parse_retry_after(date, now) <= 30
+
+
+def test_rate_increases_while_healthy():
+    limiter = AdaptiveRateLimiter(60, 6, 100)
+    for _ in range(20):
+        limiter.record("a.com", 200, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 80
+    for _ in range(100):
+        limiter.record("a.com", 200, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 100
+    # other hosts are independent
+    limiter.record("b.com", 200, 0.1)
+    assert limiter.stats()["b.com"]["rpm"] == 61
+
+
+def test_rate_starts_within_bounds():
+    limiter = AdaptiveRateLimiter(6000, 6, 600)
+    limiter.record("a.com", 500, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 450
+
+
+def test_rate_backs_off():
+    limiter = AdaptiveRateLimiter(60, 6, 600)
+    limiter.record("a.com", 429, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 30
+    limiter.record("a.com", 503, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 15
+    limiter.record("a.com", 500, 0.1)
+    limiter.record("a.com", None, 0.1)
+    stats = limiter.stats()["a.com"]
+    assert stats["rpm"] == 8.44
+    assert stats["throttled"] == 2
+    assert stats["errors"] == 2
+    for _ in range(10):
+        limiter.record("a.com", 429, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 6
+
+
+def test_rate_backs_off_on_latency():
+    limiter = AdaptiveRateLimiter(60, 6, 600)
+    for _ in range(10):
+        limiter.record("a.com", 200, 0.1)
+    assert limiter.stats()["a.com"]["rpm"] == 70
+    for _ in range(5):
+        limiter.record("a.com", 200, 2.0)
+    assert limiter.stats()["a.com"]["rpm"] < 70
+
+
+def test_retry_after_blocks_host():
+    limiter = AdaptiveRateLimiter(6000, 6, 6000)
+    limiter.record("a.com", 429, 0.1, retry_after="0.2")
+    start = time.time()
+    limiter.wait("b.com")
+    assert time.time() - start < 0.1
+    limiter.wait("a.com")
+    assert time.time() - start >= 0.19
+
+
+def test_wait_spaces_requests():
+    limiter = AdaptiveRateLimiter(600, 6, 600)
+    start = time.time()
+    for _ in range(3):
+        limiter.wait("a.com")
+    assert time.time() - start >= 0.19
+    assert limiter.stats()["a.com"]["wait"] >= 0.19
+
+
+class FakeJurisdiction(Jurisdiction):
+    jurisdiction_id = "jurisdiction"
+
+
+def fake_send(request, **kwargs):
+    resp = requests.Response()
+    resp.status_code = 429 if "busy" in request.url else 200
+    resp.headers["Retry-After"] = "0"
+    resp._content = b"ok"
+    resp.url = request.url
+    return resp
+
+
+def test_scraper_adaptive_rpm():
+    with override_settings(
+        settings,
+        {
+            "SCRAPE_ADAPTIVE_RPM": True,
+            "SCRAPELIB_RPM": 6000,
+            "SCRAPE_MAX_RPM": 12000,
+            "SCRAPELIB_RETRY_ATTEMPTS": 1,
+            "SCRAPELIB_RETRY_WAIT_SECONDS": 0,
+            "CACHE_DIR": None,
+        },
+    ):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/")
+    assert scraper.requests_per_minute == 0
+    scraper.raise_errors = False
+
+    with mock.patch.object(requests.Session, "send", side_effect=fake_send):
+        scraper.get("http://ok.example.com/")
+        scraper.get("http://busy.example.com/")
+
+    stats = scraper.rate_limiter.stats()
+    assert stats["ok.example.com"]["requests"] == 1
+    assert stats["ok.example.com"]["rpm"] == 6001
+    # every retry is limited and counted
+    assert stats["busy.example.com"]["requests"] == 2
+    assert stats["busy.example.com"]["throttled"] == 2
+    assert stats["busy.example.com"]["rpm"] == 1500
+
+
+def test_scraper_static_rpm():
+    with override_settings(settings, {"CACHE_DIR": None}):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/")
+    assert scraper.rate_limiter is None
+    assert scraper.requests_per_minute == settings.SCRAPELIB_RPM
+
+    with override_settings(settings, {"SCRAPE_ADAPTIVE_RPM": True, "CACHE_DIR": None}):
+        scraper = Scraper(FakeJurisdiction(), "/tmp/", fastmode=True)
+    assert scraper.rate_limiter is None
@@ -1,7 +1,29 @@
+import os
+import copy
+import glob
+import json
+import time
+import datetime
+import tempfile
+import threading
+import collections
+import logging
+import logging.config
 import mock
 import pytest
+import requests
+from pupa import settings
+from pupa.cli.commands.update import override_settings
 from pupa.scrape import Person, Organization, Bill, Jurisdiction
-from pupa.scrape.base import Scraper, ScrapeError, BaseBillScraper
+from pupa.scrape.base import (
+    Scraper,
+    ScrapeError,
+    BaseBillScraper,
+    parse_validation_policy,
+    object_digest,
+)
+from pupa.utils import JSONEncoderPlus
+from pupa.utils.segments import SegmentWriter, read_segments
 
 
 class FakeJurisdiction(Jurisdiction):
@@ -68,6 +90,39 @@ def test_simple_scrape():
     assert record["skipped"] == 0
 
 
+def test_scrape_timings():
+    def fake_send(request, **kwargs):
+        time.sleep(0.05)
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b"ok"
+        resp.url = request.url
+        return resp
+
+    class SlowScraper(Scraper):
+        def scrape(self):
+            time.sleep(0.05)
+            self.get("http://example.com/")
+            self.get("http://example.com/")
+            p = Person("Michael Jordan")
+            p.add_source("http://example.com")
+            yield p
+
+    with override_settings(settings, {"CACHE_DIR": tempfile.mkdtemp()}):
+        scraper = SlowScraper(juris, tempfile.mkdtemp(), fastmode=True)
+    with mock.patch.object(requests.Session, "send", side_effect=fake_send):
+        timings = scraper.do_scrape()["timings"]
+
+    assert timings["scrape"] >= 0.1
+    assert 0.05 <= timings["http"] < timings["scrape"]
+    assert timings["network"] >= 0.05
+    assert timings["hosts"] == {"example.com": timings["network"]}
+    assert timings["cache_hits"] == 1
+    assert timings["cache_misses"] == 1
+    for phase in ("validate", "serialize", "write"):
+        assert phase in timings
+
+
 def test_double_iter():
     """tests that scrapers that yield iterables work OK"""
 
@@ -128,3 +183,361 @@ def test_bill_scraper():
     assert len(json_dump.mock_calls) == 1
     assert record["objects"]["bill"] == 1
     assert record["skipped"] == 1
+
+
+@pytest.fixture
+def logging_config():
+    """apply settings.LOGGING at a given handler level, as the command line does"""
+    names = ["", "scrapelib", "requests", "boto"]
+    saved = [
+        (logger, logger.handlers[:], logger.level, logger.propagate)
+        for logger in map(logging.getLogger, names)
+    ]
+
+    def configure(level):
+        config = copy.deepcopy(settings.LOGGING)
+        config["handlers"]["default"]["level"] = level
+        logging.config.dictConfig(config)
+
+    yield configure
+    for logger, handlers, level, propagate in saved:
+        logger.handlers[:] = handlers
+        logger.setLevel(level)
+        logger.propagate = propagate
+
+
+def test_save_object_debug_dump_only_when_enabled(logging_config):
+    s = Scraper(juris, "/tmp/")
+    p = Person("Michael Jordan")
+    p.add_source("http://example.com")
+
+    with mock.patch("json.dump"), mock.patch("json.dumps") as json_dumps:
+        # the default configuration, --loglevel INFO
+        logging_config("INFO")
+        s.save_object(p)
+        assert json_dumps.call_count == 0
+        logging_config("DEBUG")
+        s.save_object(p)
+        assert json_dumps.call_count == 1
+
+
+def test_save_object_orjson_backend():
+    pytest.importorskip("orjson")
+    datadir = tempfile.mkdtemp()
+    p = Person("Michael Jordan")
+    p.add_source("http://example.com")
+    p.extras["seen"] = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+    s = Scraper(juris, datadir)
+    s.json_backend = "orjson"
+    s.save_object(p)
+
+    with open(os.path.join(datadir, "person_" + p._id + ".json")) as f:
+        data = json.load(f)
+    assert data == json.loads(json.dumps(p.as_dict(), cls=JSONEncoderPlus))
+    assert data["extras"]["seen"] == "2020-01-01T00:00:00+00:00"
+
+
+def test_segment_format():
+    datadir = tempfile.mkdtemp()
+
+    class FakeScraper(Scraper):
+        def scrape(self):
+            for name in ("Michael Jordan", "Scottie Pippen"):
+                p = Person(name)
+                p.add_source("http://example.com")
+                yield p
+
+    scraper = FakeScraper(juris, datadir)
+    scraper.data_format = "segments"
+    record = scraper.do_scrape()
+
+    assert record["objects"]["person"] == 2
+    assert not glob.glob(os.path.join(datadir, "person_*.json"))
+    people = list(read_segments(datadir, "person"))
+    assert [p["name"] for p in people] == ["Michael Jordan", "Scottie Pippen"]
+    assert list(read_segments(datadir, "organization")) == []
+
+
+def test_segment_writer_rolls_segments():
+    datadir = tempfile.mkdtemp()
+    writer = SegmentWriter(datadir, max_bytes=5)
+    for n in range(3):
+        writer.write("bill", json.dumps({"n": n}))
+    writer.write("vote_event", b'{"n": 0}')
+    writer.close()
+
+    assert len(writer.segments["bill"]) == 3
+    assert len(glob.glob(os.path.join(datadir, "bill_seg_*.jsonl"))) == 3
+    assert [b["n"] for b in read_segments(datadir, "bill")] == [0, 1, 2]
+    assert [v["n"] for v in read_segments(datadir, "vote_event")] == [0]
+    assert list(read_segments(datadir, "event")) == []
+
+
+def test_bill_scraper_workers():
+    class BillScraper(BaseBillScraper):
+        bill_workers = 4
+
+        def get_bill_ids(self):
+            for n in range(10):
+                yield str(n), {"delay": (10 - n) / 1000}
+
+        def get_bill(self, bill_id, delay):
+            time.sleep(delay)
+            if bill_id in ("3", "7"):
+                raise self.ContinueScraping
+            b = Bill(bill_id, self.legislative_session, "title")
+            b.add_source("http://example.com")
+            return b
+
+    bs = BillScraper(juris, "/tmp/")
+    with mock.patch("json.dump") as json_dump:
+        record = bs.do_scrape(legislative_session="2020")
+
+    # bills are saved in get_bill_ids order even though later ones finish first
+    saved = [c[1][0]["identifier"] for c in json_dump.mock_calls]
+    assert saved == ["0", "1", "2", "4", "5", "6", "8", "9"]
+    assert record["objects"]["bill"] == 8
+    assert record["skipped"] == 2
+
+
+def test_bill_scraper_workers_error():
+    class BillScraper(BaseBillScraper):
+        bill_workers = 2
+
+        def get_bill_ids(self):
+            yield "1", {}
+
+        def get_bill(self, bill_id):
+            raise ValueError(bill_id)
+
+    with pytest.raises(ValueError):
+        BillScraper(juris, "/tmp/").do_scrape(legislative_session="2020")
+
+
+class FakeRequests:
+    """stands in for Scraper.request, tracking requests in flight per host"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = collections.Counter()
+        self.max_in_flight = collections.Counter()
+        self.urls = []
+
+    def __call__(self, method, url, **kwargs):
+        host = url.split("/")[2]
+        with self.lock:
+            self.urls.append(url)
+            self.in_flight[host] += 1
+            self.max_in_flight[host] = max(
+                self.max_in_flight[host], self.in_flight[host]
+            )
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight[host] -= 1
+        return "response for " + url
+
+
+def test_fetch_many():
+    urls = ["http://a.example.com/{}".format(n) for n in range(6)] + [
+        "http://b.example.com/{}".format(n) for n in range(6)
+    ]
+    fake = FakeRequests()
+    s = Scraper(juris, "/tmp/")
+    with mock.patch.object(Scraper, "request", fake):
+        results = dict(s.fetch_many(urls))
+
+    assert results == {url: "response for " + url for url in urls}
+    assert sorted(fake.urls) == sorted(urls)
+    assert fake.max_in_flight["a.example.com"] <= settings.SCRAPE_HOST_CONCURRENCY
+    assert fake.max_in_flight["b.example.com"] <= settings.SCRAPE_HOST_CONCURRENCY
+
+
+def test_prefetch():
+    fake = FakeRequests()
+    s = Scraper(juris, "/tmp/")
+    with mock.patch.object(Scraper, "request", fake):
+        s.prefetch(["http://example.com/1", "http://example.com/2"])
+        assert s.get("http://example.com/1") == "response for http://example.com/1"
+        assert dict(s.fetch_many(["http://example.com/2"])) == {
+            "http://example.com/2": "response for http://example.com/2"
+        }
+        # no longer prefetched, so this is a new request
+        s.get("http://example.com/1")
+
+    assert sorted(fake.urls) == [
+        "http://example.com/1",
+        "http://example.com/1",
+        "http://example.com/2",
+    ]
+
+
+class SlowDict(dict):
+    """a dict whose lookups give other threads a chance to run in between"""
+
+    def __contains__(self, key):
+        found = super(SlowDict, self).__contains__(key)
+        time.sleep(0.01)
+        return found
+
+
+def test_prefetch_concurrent_gets():
+    fake = FakeRequests()
+    s = Scraper(juris, "/tmp/")
+    s._prefetched = SlowDict()
+    errors = []
+
+    def get():
+        try:
+            s.get("http://example.com/1")
+        except Exception as e:
+            errors.append(e)
+
+    with mock.patch.object(Scraper, "request", fake):
+        s.prefetch(["http://example.com/1"])
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    # the prefetched response is used exactly once, the other gets request again
+    assert len(fake.urls) == 8
+
+
+class TwoPeopleScraper(Scraper):
+    def scrape(self, invalid=False):
+        for name in ("Michael Jordan", "Scottie Pippen"):
+            p = Person(name)
+            if not invalid:
+                p.add_source("http://example.com")
+            yield p
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_write_behind(validate):
+    datadir = tempfile.mkdtemp()
+    scraper = TwoPeopleScraper(juris, datadir)
+    scraper.write_behind = True
+    scraper.write_behind_validate = validate
+    record = scraper.do_scrape()
+
+    assert record["objects"]["person"] == 2
+    assert len(glob.glob(os.path.join(datadir, "person_*.json"))) == 2
+    assert scraper._writer is None
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_write_behind_invalid(validate):
+    datadir = tempfile.mkdtemp()
+    scraper = TwoPeopleScraper(juris, datadir)
+    scraper.write_behind = True
+    scraper.write_behind_validate = validate
+
+    with pytest.raises(ValueError):
+        scraper.do_scrape(invalid=True)
+
+    # the invalid object is still written for inspection
+    assert glob.glob(os.path.join(datadir, "person_*.json"))
+
+
+def test_parse_validation_policy():
+    assert parse_validation_policy("full") == ("full", 1.0)
+    assert parse_validation_policy("deferred") == ("deferred", 0.0)
+    assert parse_validation_policy("sample=10%") == ("sample", 0.1)
+    assert parse_validation_policy("sample=2.5%") == ("sample", 0.025)
+    for policy in ("sample=101%", "sample=10", "some", None):
+        with pytest.raises(ValueError):
+            parse_validation_policy(policy)
+
+
+def people(n):
+    for i in range(n):
+        p = Person("Person {}".format(i))
+        p.add_source("http://example.com")
+        yield p
+
+
+@pytest.mark.parametrize(
+    "policy,validated", [("full", 200), ("sample=0%", 0), ("deferred", 0)]
+)
+def test_validation_policy_coverage(policy, validated):
+    class PeopleScraper(Scraper):
+        def scrape(self):
+            yield from people(200)
+
+    with override_settings(settings, {"SCRAPE_VALIDATION": policy}):
+        scraper = PeopleScraper(juris, tempfile.mkdtemp())
+    with mock.patch.object(Person, "validate") as validate:
+        record = scraper.do_scrape()
+    assert validate.call_count == validated
+    assert record["validation"] == {
+        "policy": policy,
+        "objects": 200,
+        "validated": validated,
+        "unchanged": 0,
+    }
+
+
+def test_validation_sample_is_stable():
+    def sampled():
+        with override_settings(settings, {"SCRAPE_VALIDATION": "sample=25%"}):
+            scraper = Scraper(juris, "/tmp/")
+        return [
+            p.name for p in people(200) if scraper.should_validate(p.as_dict())
+        ]
+
+    first = sampled()
+    # each object has a new random _id, which doesn't affect sampling
+    assert sampled() == first
+    assert 25 <= len(first) <= 75
+
+
+def test_skip_validated():
+    class PeopleScraper(Scraper):
+        def scrape(self):
+            yield from people(20)
+
+    class BadScraper(Scraper):
+        def scrape(self):
+            yield Person("No Sources")
+
+    cache_dir = tempfile.mkdtemp()
+    overrides = {"SCRAPE_SKIP_VALIDATED": True, "CACHE_DIR": cache_dir}
+
+    def run(scraper_cls):
+        with override_settings(settings, overrides):
+            scraper = scraper_cls(juris, tempfile.mkdtemp(), strict_validation=False)
+        return scraper.do_scrape()["validation"]
+
+    assert run(PeopleScraper)["validated"] == 20
+    # nothing changed, nothing is validated again
+    validation = run(PeopleScraper)
+    assert validation["validated"] == 0
+    assert validation["unchanged"] == 20
+
+    # invalid objects are never remembered
+    assert run(BadScraper)["validated"] == 1
+    assert run(BadScraper)["validated"] == 1
+
+    # without a cache dir there is nowhere to keep digests
+    overrides["CACHE_DIR"] = None
+    assert run(PeopleScraper)["validated"] == 20
+
+
+def test_object_digest_includes_type():
+    data = {"_id": "1", "name": "Jane"}
+    assert object_digest(data) == object_digest(dict(data, _id="2"))
+    assert object_digest(data, "person") != object_digest(data, "organization")
+    assert object_digest(data, "person") != object_digest(data)
+
+
+def test_validation_deferred_saves_invalid():
+    class BadScraper(Scraper):
+        def scrape(self):
+            yield Person("No Sources")
+
+    with override_settings(settings, {"SCRAPE_VALIDATION": "deferred"}):
+        record = BadScraper(juris, tempfile.mkdtemp()).do_scrape()
+    assert record["objects"]["person"] == 1
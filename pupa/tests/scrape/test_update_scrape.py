@@ -0,0 +1,178 @@
+import os
+import time
+import argparse
+import multiprocessing
+import tempfile
+import pytest
+from collections import OrderedDict
+from pupa import settings
+from pupa.cli.commands.update import (
+    Command,
+    override_settings,
+    format_timings,
+    print_report,
+)
+from pupa.scrape import Jurisdiction, Scraper, Person, Bill
+
+
+class PeopleScraper(Scraper):
+    def scrape(self):
+        p = Person("Michael Jordan")
+        p.add_source("http://example.com")
+        yield p
+
+
+class BillScraper(Scraper):
+    def scrape(self, session="2020"):
+        b = Bill("HB 1", session, "a bill")
+        b.add_source("http://example.com")
+        yield b
+
+
+class BrokenScraper(Scraper):
+    def scrape(self):
+        raise ValueError("broken scraper")
+
+
+def title(name):
+    return name.title()
+
+
+class PoolScraper(Scraper):
+    # scrapers may start processes of their own
+    def scrape(self):
+        with multiprocessing.Pool(2) as pool:
+            names = pool.map(title, ["michael jordan", "scottie pippen"])
+        for name in names:
+            p = Person(name)
+            p.add_source("http://example.com")
+            yield p
+
+
+class SlowScraper(Scraper):
+    def scrape(self):
+        time.sleep(60)
+        yield from ()
+
+
+class FakeJurisdiction(Jurisdiction):
+    division_id = "ocd-division/test"
+    classification = "government"
+    name = "Test"
+    url = "http://example.com"
+    scrapers = {
+        "people": PeopleScraper,
+        "bills": BillScraper,
+        "broken": BrokenScraper,
+        "slow": SlowScraper,
+        "pool": PoolScraper,
+    }
+
+    def get_organizations(self):
+        return []
+
+
+def update_command(scrape_workers):
+    parser = argparse.ArgumentParser("pupa")
+    command = Command(parser.add_subparsers(dest="subcommand"))
+    args = argparse.Namespace(
+        module="test", strict=True, fastmode=False, scrape_workers=scrape_workers
+    )
+    return command, args
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_do_scrape_workers(workers):
+    command, args = update_command(workers)
+    datadir = tempfile.mkdtemp()
+    scrapers = OrderedDict([("people", {}), ("bills", {"session": "2021"})])
+
+    with override_settings(
+        settings, {"SCRAPED_DATA_DIR": datadir, "CACHE_DIR": datadir}
+    ):
+        report = command.do_scrape(FakeJurisdiction(), args, scrapers)
+
+    assert list(report) == ["jurisdiction", "people", "bills"]
+    assert report["people"]["objects"] == {"person": 1}
+    assert report["bills"]["objects"] == {"bill": 1}
+    assert len(os.listdir(os.path.join(datadir, "test"))) == 3
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_do_scrape_workers_error(workers):
+    command, args = update_command(workers)
+    datadir = tempfile.mkdtemp()
+    scrapers = OrderedDict([("people", {}), ("broken", {})])
+
+    with override_settings(
+        settings, {"SCRAPED_DATA_DIR": datadir, "CACHE_DIR": datadir}
+    ):
+        with pytest.raises(ValueError):
+            command.do_scrape(FakeJurisdiction(), args, scrapers)
+
+
+def test_do_scrape_workers_scraper_processes():
+    command, args = update_command(2)
+    datadir = tempfile.mkdtemp()
+    scrapers = OrderedDict([("pool", {}), ("bills", {})])
+
+    with override_settings(
+        settings, {"SCRAPED_DATA_DIR": datadir, "CACHE_DIR": datadir}
+    ):
+        report = command.do_scrape(FakeJurisdiction(), args, scrapers)
+
+    assert report["pool"]["objects"] == {"person": 2}
+
+
+def test_do_scrape_workers_error_stops_other_scrapers():
+    command, args = update_command(2)
+    datadir = tempfile.mkdtemp()
+    scrapers = OrderedDict([("slow", {}), ("broken", {})])
+
+    start = time.time()
+    with override_settings(
+        settings, {"SCRAPED_DATA_DIR": datadir, "CACHE_DIR": datadir}
+    ):
+        with pytest.raises(ValueError):
+            command.do_scrape(FakeJurisdiction(), args, scrapers)
+    # the failure surfaces without waiting for the slow scraper to finish
+    assert time.time() - start < 30
+
+
+def test_print_report_timings(capsys):
+    timings = {
+        "scrape": 3.0,
+        "http": 2.5,
+        "network": 2.25,
+        "hosts": {"b.example.com": 0.25, "a.example.com": 2.0},
+        "cache_hits": 3,
+        "validate": 0.125,
+    }
+    assert format_timings(timings) == [
+        "scrape code: 0.500s",
+        "http wait: 2.500s",
+        "network: 2.250s (a.example.com: 2.000s, b.example.com: 0.250s)",
+        "throttle: 0.000s",
+        "cache: 3 hits 0 misses",
+        "validate: 0.125s",
+        "serialize: 0.000s",
+        "write: 0.000s",
+    ]
+
+    command, args = update_command(1)
+    datadir = tempfile.mkdtemp()
+    with override_settings(
+        settings, {"SCRAPED_DATA_DIR": datadir, "CACHE_DIR": datadir}
+    ):
+        scrape = command.do_scrape(
+            FakeJurisdiction(), args, OrderedDict([("people", {})])
+        )
+    print_report(
+        {
+            "plan": {"module": "test", "actions": ["scrape"], "scrapers": {}},
+            "scrape": scrape,
+        }
+    )
+    out = capsys.readouterr().out
+    assert "  timings:\n    scrape code: " in out
+    assert "    validate: " in out
@@ -1,6 +1,18 @@
+import os
+import tempfile
 import pytest
 
+from pupa import settings as pupa_settings
 from pupa.cli.commands.update import override_settings
+from pupa.utils import (
+    get_pseudo_id,
+    _make_pseudo_id,
+    _get_frozen_pseudo_id,
+    convert_pdf,
+    convert_pdfs,
+    iter_convert_pdf,
+)
+from pupa.utils import generic
 
 
 class _Settings:
@@ -27,3 +39,106 @@ def test_override_settings_unset(settings):
     with override_settings(settings, {"qux": "fez"}):
         assert settings.qux == "fez"
     assert not hasattr(settings, "qux")
+
+
+def test_pseudo_id_cached():
+    pid = _make_pseudo_id(name="Jane", classification="upper")
+    assert pid == '~{"classification": "upper", "name": "Jane"}'
+    assert _make_pseudo_id(classification="upper", name="Jane") is pid
+    assert _get_frozen_pseudo_id(pid) is _get_frozen_pseudo_id(pid)
+    assert get_pseudo_id(pid) == {"classification": "upper", "name": "Jane"}
+
+    # equal but differently typed values don't share a cache entry
+    assert _make_pseudo_id(a=1) == '~{"a": 1}'
+    assert _make_pseudo_id(a=True) == '~{"a": true}'
+    # unhashable values still work
+    assert _make_pseudo_id(a=[1]) == '~{"a": [1]}'
+
+
+def test_get_pseudo_id_returns_copy():
+    pid = '~{"a": {"b": [1, 2]}}'
+    spec = get_pseudo_id(pid)
+    assert type(spec) is dict
+    assert spec == {"a": {"b": [1, 2]}}
+    assert type(spec["a"]["b"]) is list
+    spec["c"] = 3
+    spec["a"]["b"].append(3)
+    assert get_pseudo_id(pid) == {"a": {"b": [1, 2]}}
+
+    with pytest.raises(ValueError):
+        get_pseudo_id("{}")
+
+
+def test_frozen_pseudo_id_immutable():
+    spec = _get_frozen_pseudo_id('~{"a": {"b": [1, 2]}}')
+    assert spec == {"a": {"b": (1, 2)}}
+    with pytest.raises(TypeError):
+        spec["c"] = 3
+    with pytest.raises(TypeError):
+        spec["a"]["b"] = 3
+
+    with pytest.raises(ValueError):
+        _get_frozen_pseudo_id("{}")
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    # "convert" by copying the file, counting conversions
+    calls = []
+    monkeypatch.setitem(generic.PDF_COMMANDS, "text", ["cat", "{filename}"])
+    popen = generic.subprocess.Popen
+
+    def counting_popen(*args, **kwargs):
+        calls.append(args[0])
+        return popen(*args, **kwargs)
+
+    monkeypatch.setattr(generic.subprocess, "Popen", counting_popen)
+    return calls
+
+
+def write_pdf(dirname, name, content):
+    path = os.path.join(dirname, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_convert_pdf(fake_pdf):
+    tmp = tempfile.mkdtemp()
+    pdf = write_pdf(tmp, "a.pdf", b"line 1\nline 2\n")
+    with override_settings(pupa_settings, {"PDF_CACHE": False}):
+        assert convert_pdf(pdf, "text") == b"line 1\nline 2\n"
+        assert list(iter_convert_pdf(pdf, "text")) == [b"line 1\n", b"line 2\n"]
+    assert len(fake_pdf) == 2
+
+
+def test_convert_pdf_cached(fake_pdf):
+    tmp = tempfile.mkdtemp()
+    a = write_pdf(tmp, "a.pdf", b"same")
+    b = write_pdf(tmp, "b.pdf", b"same")
+    with override_settings(pupa_settings, {"PDF_CACHE": True, "CACHE_DIR": tmp}):
+        assert convert_pdf(a, "text") == b"same"
+        # same content, different file
+        assert convert_pdf(b, "text") == b"same"
+        assert len(fake_pdf) == 1
+
+        write_pdf(tmp, "b.pdf", b"changed")
+        assert convert_pdf(b, "text") == b"changed"
+        assert len(fake_pdf) == 2
+
+        # a conversion that wasn't finished isn't cached
+        c = write_pdf(tmp, "c.pdf", b"1\n2\n")
+        lines = iter_convert_pdf(c, "text")
+        next(lines)
+        lines.close()
+        assert convert_pdf(c, "text") == b"1\n2\n"
+        assert len(fake_pdf) == 4
+        assert not [f for _, _, fs in os.walk(tmp) for f in fs if f.endswith(".tmp")]
+
+
+def test_convert_pdfs(fake_pdf):
+    tmp = tempfile.mkdtemp()
+    pdfs = [write_pdf(tmp, "{}.pdf".format(n), str(n).encode()) for n in range(10)]
+    with override_settings(pupa_settings, {"PDF_CACHE": False}):
+        results = list(convert_pdfs(pdfs, "text", workers=3))
+    assert results == [(pdf, str(n).encode()) for n, pdf in enumerate(pdfs)]
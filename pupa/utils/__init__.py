@@ -1,10 +1,15 @@
 # flake8: noqa
 from .generic import (
     _make_pseudo_id,
+    _get_frozen_pseudo_id,
     get_pseudo_id,
     makedirs,
     JSONEncoderPlus,
+    orjson_dumps,
     convert_pdf,
+    convert_pdfs,
+    iter_convert_pdf,
     utcnow,
     format_datetime,
+    logs_at,
 )
@@ -0,0 +1,47 @@
+import queue
+import threading
+
+
+class BackgroundWorker(object):
+    """
+    Runs functions in order on a single thread, fed by a bounded queue.
+
+    The first exception raised by a function is kept and re-raised in the
+    submitting thread by the next submit() or close(), functions submitted
+    after a failure are skipped.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.failed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            func = self.queue.get()
+            if func is None:
+                break
+            if not self.failed:
+                try:
+                    func()
+                except Exception as e:
+                    self.error = e
+                    self.failed = True
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, func):
+        self.raise_error()
+        self.queue.put(func)
+
+    def close(self, raise_error=True):
+        """wait for all submitted functions to finish"""
+        self.queue.put(None)
+        self.thread.join()
+        if raise_error:
+            self.raise_error()
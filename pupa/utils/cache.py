@@ -0,0 +1,218 @@
+"""
+    SQLite-backed HTTP response cache for scrapelib
+
+    All responses live in a single database file with a byte budget, the least
+    recently used responses are evicted once it is exceeded. The database runs
+    in WAL mode so several scraper processes can share one cache.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from scrapelib import CacheStorageBase
+
+SQLITE_CACHE_FILENAME = "cache.sqlite3"
+
+# evict once this fraction of the byte budget has been written since the last prune
+PRUNE_FRACTION = 0.05
+# access times are written in batches of this many hits
+ACCESS_BATCH_SIZE = 100
+# responses evicted per query while pruning
+EVICT_BATCH_SIZE = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    "key TEXT PRIMARY KEY, status INTEGER, encoding TEXT, headers TEXT, "
+    "content BLOB, size INTEGER, created REAL, accessed REAL)",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+    "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)",
+    # running totals so the budget can be checked without a scan
+    "CREATE TABLE IF NOT EXISTS totals ("
+    "id INTEGER PRIMARY KEY CHECK (id = 0), responses INTEGER, bytes INTEGER)",
+    "INSERT OR IGNORE INTO totals "
+    "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses",
+    "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN "
+    "UPDATE totals SET responses = responses + 1, bytes = bytes + NEW.size; END",
+    "CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN "
+    "UPDATE totals SET responses = responses - 1, bytes = bytes - OLD.size; END",
+)
+
+
+class SQLiteCache(CacheStorageBase):
+    """
+    :param cache_dir: directory for the cache database
+    :param max_bytes: byte budget for stored responses, 0 for no limit
+    :param max_age: seconds a response is served from cache, 0 for no limit
+
+    Call close() once done with the cache to close its connections.
+    """
+
+    def __init__(self, cache_dir, max_bytes=0, max_age=0):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.path = os.path.join(cache_dir, SQLITE_CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # sqlite connections can't be used by two threads at once, so each
+        # thread gets its own, they're kept here so close() can close them all
+        self._conns = {}
+        self._lock = threading.Lock()
+        self._written = 0
+        # key: time of the last hit not yet written to the database
+        self._accessed = {}
+
+        with self._conn as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    @property
+    def _conn(self):
+        thread = threading.get_ident()
+        conn = self._conns.get(thread)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._conns[thread] = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn.execute(
+            "SELECT status, encoding, headers, content, created FROM responses "
+            "WHERE key=?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, encoding, headers, content, created = row
+        now = time.time()
+        if self.max_age and created < now - self.max_age:
+            return None
+        with self._lock:
+            self._accessed[key] = now
+            flush = len(self._accessed) >= ACCESS_BATCH_SIZE
+        if flush:
+            self.flush()
+
+        resp = requests.Response()
+        resp.status_code = status
+        resp.encoding = encoding
+        resp.headers = CaseInsensitiveDict(json.loads(headers))
+        resp._content = content
+        resp.url = key
+        return resp
+
+    def flush(self):
+        """write pending access times"""
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        if accessed:
+            with self._conn as conn:
+                conn.executemany(
+                    "UPDATE responses SET accessed=? WHERE key=?",
+                    [(when, key) for key, when in accessed.items()],
+                )
+
+    def close(self):
+        """write pending access times and close every thread's connection"""
+        self.flush()
+        with self._lock:
+            conns, self._conns = self._conns, {}
+        for conn in conns.values():
+            conn.close()
+
+    def set(self, key, response):
+        headers = json.dumps(dict(response.headers))
+        content = response.content
+        size = len(content) + len(headers)
+        now = time.time()
+        with self._conn as conn:
+            # a REPLACE wouldn't fire the delete trigger
+            conn.execute("DELETE FROM responses WHERE key=?", (key,))
+            conn.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.status_code,
+                    response.encoding,
+                    headers,
+                    content,
+                    size,
+                    now,
+                    now,
+                ),
+            )
+
+        if self.max_bytes:
+            with self._lock:
+                self._written += size
+                prune = self._written >= self.max_bytes * PRUNE_FRACTION
+                if prune:
+                    self._written = 0
+            if prune:
+                self.prune()
+
+    def prune(self, max_bytes=None, max_age=None):
+        """
+        Evict expired responses, then least recently used ones until the cache
+        fits in max_bytes. Defaults to the limits the cache was created with.
+
+        Returns (responses removed, bytes freed).
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        self.flush()
+
+        with self._conn as conn:
+            # take the write lock up front, the totals must not change under us
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._totals(conn)
+            if max_age:
+                conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - max_age,)
+                )
+            if max_bytes:
+                # evict the least recently used responses until the rest fit
+                excess = self._totals(conn)[1] - max_bytes
+                while excess > 0:
+                    rows = conn.execute(
+                        "SELECT key, size FROM responses ORDER BY accessed LIMIT ?",
+                        (EVICT_BATCH_SIZE,),
+                    ).fetchall()
+                    evict = []
+                    for key, size in rows:
+                        if excess <= 0:
+                            break
+                        evict.append((key,))
+                        excess -= size
+                    conn.executemany("DELETE FROM responses WHERE key=?", evict)
+            after = self._totals(conn)
+
+        return before[0] - after[0], before[1] - after[1]
+
+    def _totals(self, conn):
+        return conn.execute("SELECT responses, bytes FROM totals").fetchone()
+
+    def stats(self):
+        conn = self._conn
+        count, size = self._totals(conn)
+        # both use the index on created
+        oldest = conn.execute("SELECT MIN(created) FROM responses").fetchone()[0]
+        newest = conn.execute("SELECT MAX(created) FROM responses").fetchone()[0]
+        return {"responses": count, "bytes": size, "oldest": oldest, "newest": newest}
+
+    def vacuum(self):
+        """give space freed by evictions back to the filesystem"""
+        self._conn.execute("VACUUM")
+
+    def clear(self):
+        with self._lock:
+            self._accessed = {}
+        with self._conn as conn:
+            conn.execute("DELETE FROM responses")
@@ -0,0 +1,89 @@
+"""
+    Persistent set of digests of objects that passed validation
+
+    The store is tied to a schema version. Opening it with a different version
+    empties it, since objects that passed under the old schemas may not pass
+    under the new ones.
+"""
+import os
+import sqlite3
+import threading
+
+DIGEST_STORE_FILENAME = "validated.sqlite3"
+
+# digests kept in memory before being written out
+FLUSH_SIZE = 1000
+
+
+class DigestStore(object):
+    def __init__(self, directory, version):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = os.path.join(directory, DIGEST_STORE_FILENAME)
+        self.version = version
+        # sqlite connections can't be used by two threads at once, so each
+        # thread gets its own, they're kept here so close() can close them all
+        self._conns = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+
+        with self._conn as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (version TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS digests (digest TEXT PRIMARY KEY)")
+            row = conn.execute("SELECT version FROM meta").fetchone()
+            if row is None or row[0] != version:
+                conn.execute("DELETE FROM digests")
+                conn.execute("DELETE FROM meta")
+                conn.execute("INSERT INTO meta VALUES (?)", (version,))
+
+    @property
+    def _conn(self):
+        thread = threading.get_ident()
+        conn = self._conns.get(thread)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._conns[thread] = conn
+        return conn
+
+    def __contains__(self, digest):
+        with self._lock:
+            if digest in self._pending:
+                return True
+        return (
+            self._conn.execute(
+                "SELECT 1 FROM digests WHERE digest=?", (digest,)
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self):
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+
+    def add(self, digest):
+        with self._lock:
+            self._pending.add(digest)
+            flush = len(self._pending) >= FLUSH_SIZE
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if pending:
+            with self._conn as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO digests VALUES (?)",
+                    ((digest,) for digest in pending),
+                )
+
+    def close(self):
+        """write pending digests and close every thread's connection"""
+        self.flush()
+        with self._lock:
+            conns, self._conns = self._conns, {}
+        for conn in conns.values():
+            conn.close()
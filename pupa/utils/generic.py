@@ -1,24 +1,84 @@
 import os
+import sys
 import json
 import pytz
 import datetime
+import hashlib
+import logging
+import tempfile
+import functools
 import subprocess
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from pupa import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 def utcnow():
     return datetime.datetime.now(datetime.timezone.utc)
 
 
+# number of distinct pseudo ids remembered in each direction
+PSEUDO_ID_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=PSEUDO_ID_CACHE_SIZE)
+def _encode_pseudo_id(key):
+    kwargs = {k: v for k, _, v in key}
+    # ensure keys are sorted so that these are deterministic
+    return sys.intern("~" + json.dumps(kwargs, sort_keys=True))
+
+
 def _make_pseudo_id(**kwargs):
     """pseudo ids are just JSON"""
-    # ensure keys are sorted so that these are deterministic
-    return "~" + json.dumps(kwargs, sort_keys=True)
+    # the type is part of the key so that e.g. 1 and True don't share an entry
+    key = tuple((k, type(v), v) for k, v in sorted(kwargs.items()))
+    try:
+        return _encode_pseudo_id(key)
+    except TypeError:
+        # unhashable values (lists, dicts) aren't cached
+        return "~" + json.dumps(kwargs, sort_keys=True)
 
 
-def get_pseudo_id(pid):
+def _freeze(value):
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    elif isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, types.MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    elif isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+@functools.lru_cache(maxsize=PSEUDO_ID_CACHE_SIZE)
+def _parse_pseudo_id(pid):
+    return _freeze(json.loads(pid[1:]))
+
+
+def _get_frozen_pseudo_id(pid):
+    """
+    get_pseudo_id for callers that only read the spec: the parsed spec is
+    cached and shared, as a read-only mapping with lists as tuples
+    """
     if pid[0] != "~":
         raise ValueError("pseudo id doesn't start with ~")
-    return json.loads(pid[1:])
+    return _parse_pseudo_id(pid)
+
+
+def get_pseudo_id(pid):
+    """Parse a pseudo id into a new dict, the parse itself is cached."""
+    return _thaw(_get_frozen_pseudo_id(pid))
 
 
 def makedirs(dname):
@@ -35,31 +95,131 @@ class JSONEncoderPlus(json.JSONEncoder):
         if isinstance(obj, datetime.datetime):
             if obj.tzinfo is None:
                 raise TypeError("date '%s' is not fully timezone qualified." % (obj))
-            obj = obj.astimezone(pytz.UTC)
-            return "{}".format(obj.isoformat())
+            return obj.astimezone(datetime.timezone.utc).isoformat()
         elif isinstance(obj, datetime.date):
-            return "{}".format(obj.isoformat())
+            return obj.isoformat()
         return super(JSONEncoderPlus, self).default(obj, **kwargs)
 
 
-def convert_pdf(filename, type="xml"):
-    commands = {
-        "text": ["pdftotext", "-layout", filename, "-"],
-        "text-nolayout": ["pdftotext", filename, "-"],
-        "xml": ["pdftohtml", "-xml", "-stdout", filename],
-        "html": ["pdftohtml", "-stdout", filename],
-    }
+def orjson_dumps(obj):
+    """
+    Serialize obj to JSON bytes with orjson, encoding dates like JSONEncoderPlus.
+    """
+    return orjson.dumps(
+        obj,
+        default=JSONEncoderPlus().default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def logs_at(logger, level):
+    """
+    Whether a record of level logged to logger would be emitted by a handler.
+
+    Unlike logger.isEnabledFor, this takes the levels of the handlers into
+    account, since the command line sets the level of the handler.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+    found = False
+    current = logger
+    while current:
+        for handler in current.handlers:
+            found = True
+            if level >= handler.level:
+                return True
+        if not current.propagate:
+            break
+        current = current.parent
+    if not found and logging.lastResort:
+        return level >= logging.lastResort.level
+    return False
+
+
+PDF_COMMANDS = {
+    "text": ["pdftotext", "-layout", "{filename}", "-"],
+    "text-nolayout": ["pdftotext", "{filename}", "-"],
+    "xml": ["pdftohtml", "-xml", "-stdout", "{filename}"],
+    "html": ["pdftohtml", "-stdout", "{filename}"],
+}
+
+
+def _pdf_cache_path(filename, type):
+    """path of the cached conversion of filename, None if caching is off"""
+    if not settings.PDF_CACHE or not settings.CACHE_DIR:
+        return None
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+    return os.path.join(
+        settings.CACHE_DIR, "pdf", digest[:2], "{}.{}".format(digest, type)
+    )
+
+
+def iter_convert_pdf(filename, type="xml"):
+    """
+    Yield the lines (as bytes) of a converted PDF as the converter produces them.
+
+    With PDF_CACHE on, results are cached in CACHE_DIR keyed by a hash of the
+    file's contents and the conversion type.
+    """
+    command = [arg.format(filename=filename) for arg in PDF_COMMANDS[type]]
+    cache_path = _pdf_cache_path(filename, type)
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            yield from f
+        return
+
     try:
-        pipe = subprocess.Popen(
-            commands[type], stdout=subprocess.PIPE, close_fds=True
-        ).stdout
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, close_fds=True)
     except OSError as e:
         raise EnvironmentError(
-            "error running %s, missing executable? [%s]" % " ".join(commands[type]), e
+            "error running %s, missing executable? [%s]" % (" ".join(command), e)
+        )
+
+    cache_file = None
+    if cache_path:
+        makedirs(os.path.dirname(cache_path))
+        cache_file = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(cache_path), suffix=".tmp", delete=False
+        )
+    finished = False
+    try:
+        for line in proc.stdout:
+            if cache_file:
+                cache_file.write(line)
+            yield line
+        finished = True
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        if cache_file:
+            cache_file.close()
+            # only cache complete & successful conversions
+            if finished and returncode == 0:
+                os.replace(cache_file.name, cache_path)
+            else:
+                os.remove(cache_file.name)
+
+
+def convert_pdf(filename, type="xml"):
+    return b"".join(iter_convert_pdf(filename, type))
+
+
+def convert_pdfs(filenames, type="xml", workers=None):
+    """
+    Convert several PDFs concurrently, yielding (filename, data) in order.
+
+    At most workers (default: PDF_WORKERS) converters run at once.
+    """
+    filenames = list(filenames)
+    workers = workers or settings.PDF_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from zip(
+            filenames, pool.map(functools.partial(convert_pdf, type=type), filenames)
         )
-    data = pipe.read()
-    pipe.close()
-    return data
 
 
 def format_datetime(dt, timezone):
@@ -0,0 +1,144 @@
+"""
+    Streaming of scraped objects to the importers
+
+    Scrapers hand each object to the pipeline as it is saved, where it is
+    buffered by type. The importing thread goes through the types in dependency
+    order, and streams each one into its importer as it is scraped. It moves on
+    to the next type once no scraper still running (or yet to run) may produce
+    more of it, so importing overlaps with scraping as far as the scrapers'
+    produces declarations allow.
+
+    Each type's buffer holds at most queue_size objects. A scraper saving an
+    object of a type whose buffer is full waits for the importer to take some,
+    unless the importer is itself waiting for a type the scraper may produce.
+"""
+import json
+import threading
+from collections import defaultdict
+
+from pupa.exceptions import ScrapeError
+from .generic import JSONEncoderPlus
+
+
+class ImportPipeline(object):
+    def __init__(self, types, queue_size):
+        # types to import, in dependency order; anything else is dropped
+        self.types = list(types)
+        self.queue_size = queue_size
+        self.condition = threading.Condition()
+        self.buffers = defaultdict(list)
+        # scraper name -> set of types it may produce, None for any type
+        self.producers = {}
+        self.closed = set()
+        self.taken = set()
+        # the type being imported
+        self.current = None
+        self.error = None
+
+    def expect(self, name, produces=None):
+        """register a scraper, every scraper must be registered before any runs"""
+        with self.condition:
+            self.producers[name] = None if produces is None else set(produces)
+
+    def sink(self, name):
+        """the output_sink for the scraper registered as name"""
+
+        def put(_type, data):
+            self.put(name, _type, data)
+
+        return put
+
+    def put(self, name, _type, data):
+        """hand over an object saved by a scraper, waiting for room if need be"""
+        produces = self.producers[name]
+        if produces is not None and _type not in produces:
+            error = ScrapeError(
+                "{} scraper saved a {} object, which isn't in its produces".format(
+                    name, _type
+                )
+            )
+            self.abort(error)
+            raise error
+        if _type not in self.types:
+            return
+
+        # the same round trip as through the datadir, which also gives the
+        # importer a copy it is free to modify
+        data = json.loads(json.dumps(data, cls=JSONEncoderPlus))
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.error is not None or not self._must_wait(name, _type)
+            )
+            if self.error is not None:
+                raise ScrapeError("import pipeline stopped: {}".format(self.error))
+            if _type in self.taken:
+                self.error = ScrapeError(
+                    "{} object scraped after {} objects were imported, "
+                    "check the scrapers' produces".format(_type, _type)
+                )
+                self.condition.notify_all()
+                raise self.error
+            self.buffers[_type].append(data)
+            self.condition.notify_all()
+
+    def finished(self, name):
+        """a scraper is done, after all the objects it put"""
+        with self.condition:
+            del self.producers[name]
+            self._close_types()
+            self.condition.notify_all()
+
+    def abort(self, error):
+        """stop the pipeline, further put()s and objects() raise"""
+        with self.condition:
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
+
+    def objects(self, _type):
+        """
+        iterate over the objects of _type as they are scraped, until nothing
+        more of it can be
+        """
+        with self.condition:
+            self.current = _type
+            self._close_types()
+            self.condition.notify_all()
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.error is not None
+                    or self.buffers.get(_type)
+                    or _type in self.closed
+                )
+                if self.error is not None:
+                    raise self.error
+                batch = self.buffers.pop(_type, [])
+                if not batch:
+                    self.taken.add(_type)
+                    self.current = None
+                    return
+                # there's room in the buffer again
+                self.condition.notify_all()
+            yield from batch
+
+    def _may_produce(self, _type):
+        return any(
+            produces is None or _type in produces
+            for produces in self.producers.values()
+        )
+
+    def _must_wait(self, name, _type):
+        if len(self.buffers[_type]) < self.queue_size:
+            return False
+        # waiting is safe while the importer takes _type, or is waiting for a
+        # type this scraper can't produce, otherwise neither would get anywhere
+        if _type == self.current or self.current is None:
+            return True
+        produces = self.producers[name]
+        return produces is not None and self.current not in produces
+
+    def _close_types(self):
+        for _type in self.types:
+            if _type not in self.closed and not self._may_produce(_type):
+                self.closed.add(_type)
@@ -0,0 +1,145 @@
+"""
+    Adaptive per-host rate limiting
+
+    Each host starts at a base rate. The rate grows additively while the host
+    answers quickly and without errors, and is cut multiplicatively on 429/503,
+    on other errors and when latency rises well above its norm.
+"""
+import time
+import threading
+import email.utils
+
+# added to a host's rpm after each healthy response
+INCREASE_RPM = 1
+# factors applied to a host's rpm on throttling responses, errors & slow responses
+THROTTLED_BACKOFF = 0.5
+ERROR_BACKOFF = 0.75
+LATENCY_BACKOFF = 0.9
+# a response is slow when the recent latency exceeds the usual latency by this factor
+LATENCY_FACTOR = 2.0
+# smoothing of recent & usual latency
+FAST_ALPHA = 0.3
+SLOW_ALPHA = 0.02
+# longest Retry-After honored, in seconds
+MAX_RETRY_AFTER = 600
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now):
+    """seconds to wait given a Retry-After header (seconds or an HTTP date)"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - now
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class HostLimiter(object):
+    def __init__(self, rpm, min_rpm, max_rpm):
+        self.rpm = rpm
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.next_request = 0
+        self.blocked_until = 0
+        self.fast_latency = None
+        self.slow_latency = None
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.not_modified = 0
+        self.wait = 0.0
+        self.latency = 0.0
+
+    def reserve(self, now):
+        """reserve the next slot, returns the time at which it starts"""
+        start = max(now, self.next_request, self.blocked_until)
+        self.next_request = start + 60.0 / self.rpm
+        self.wait += start - now
+        return start
+
+    def adjust(self, factor):
+        self.rpm = max(self.min_rpm, self.rpm * factor)
+
+    def record(self, status, latency, retry_after, now):
+        self.requests += 1
+        self.latency += latency
+
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            self.adjust(THROTTLED_BACKOFF)
+            retry_after = parse_retry_after(retry_after, now)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            return
+        if status is None or status >= 500:
+            self.errors += 1
+            self.adjust(ERROR_BACKOFF)
+            return
+        if status == 304:
+            # cheap for the server, give the slot back
+            self.not_modified += 1
+            self.next_request -= 60.0 / self.rpm
+
+        if self.fast_latency is None:
+            self.fast_latency = self.slow_latency = latency
+        else:
+            self.fast_latency += FAST_ALPHA * (latency - self.fast_latency)
+            self.slow_latency += SLOW_ALPHA * (latency - self.slow_latency)
+
+        if self.fast_latency > self.slow_latency * LATENCY_FACTOR:
+            self.adjust(LATENCY_BACKOFF)
+        else:
+            self.rpm = min(self.max_rpm, self.rpm + INCREASE_RPM)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "not_modified": self.not_modified,
+            "rpm": round(self.rpm, 2),
+            "wait": round(self.wait, 3),
+            "latency": round(self.latency, 3),
+        }
+
+
+class AdaptiveRateLimiter(object):
+    """
+    Thread-safe rate limiter keeping a separate, self-tuning rate per host.
+
+    Call wait(host) before each request and record(...) with its outcome.
+    """
+
+    def __init__(self, rpm, min_rpm, max_rpm):
+        self.rpm = min(max(rpm, min_rpm), max_rpm)
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(self.rpm, self.min_rpm, self.max_rpm)
+        return self.hosts[host]
+
+    def wait(self, host):
+        with self.lock:
+            now = time.time()
+            start = self._host(host).reserve(now)
+        if start > now:
+            time.sleep(start - now)
+
+    def record(self, host, status, latency, retry_after=None):
+        """status is None if the request failed without a response"""
+        with self.lock:
+            self._host(host).record(status, latency, retry_after, time.time())
+
+    def stats(self):
+        with self.lock:
+            return {host: limiter.stats() for host, limiter in self.hosts.items()}
@@ -0,0 +1,75 @@
+"""
+    Segment datadir format: objects are appended to rolling per-type JSONL files
+
+    Each writer owns its segments, named {type}_seg_{writer}_{n}.jsonl, and
+    records them in {writer}.index.json. Only indexed segments are read, so
+    several writers (e.g. one per scraper) can share a datadir.
+"""
+import os
+import glob
+import json
+import uuid
+from collections import defaultdict
+
+INDEX_SUFFIX = ".index.json"
+
+
+class SegmentWriter(object):
+    def __init__(self, datadir, max_bytes):
+        self.datadir = datadir
+        self.max_bytes = max_bytes
+        self.writer_id = uuid.uuid4().hex
+        # type -> [{"file": ..., "count": ..., "bytes": ...}]
+        self.segments = defaultdict(list)
+        # type -> open file for the latest segment
+        self.files = {}
+
+    def _open_segment(self, _type):
+        fname = "{}_seg_{}_{:04d}.jsonl".format(
+            _type, self.writer_id, len(self.segments[_type])
+        )
+        self.segments[_type].append({"file": fname, "count": 0, "bytes": 0})
+        self.files[_type] = open(os.path.join(self.datadir, fname), "ab")
+
+    def write(self, _type, line):
+        """append a serialized object (str or bytes without newlines)"""
+        if isinstance(line, str):
+            line = line.encode("utf8")
+
+        if _type not in self.files:
+            self._open_segment(_type)
+        elif self.segments[_type][-1]["bytes"] >= self.max_bytes:
+            self.files.pop(_type).close()
+            self._open_segment(_type)
+            self.write_index()
+
+        self.files[_type].write(line + b"\n")
+        segment = self.segments[_type][-1]
+        segment["count"] += 1
+        segment["bytes"] += len(line) + 1
+
+    def write_index(self):
+        for f in self.files.values():
+            f.flush()
+        index = os.path.join(self.datadir, self.writer_id + INDEX_SUFFIX)
+        with open(index + ".tmp", "w") as f:
+            json.dump({"writer": self.writer_id, "segments": self.segments}, f)
+        os.replace(index + ".tmp", index)
+
+    def close(self):
+        self.write_index()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+def read_segments(datadir, _type):
+    """yield all objects of a given type from indexed segments in datadir"""
+    for index in sorted(glob.glob(os.path.join(datadir, "*" + INDEX_SUFFIX))):
+        with open(index) as f:
+            segments = json.load(f)["segments"].get(_type, [])
+        for segment in segments:
+            with open(os.path.join(datadir, segment["file"]), "rb") as f:
+                # only read what was indexed, a segment may have been appended to
+                for line, _ in zip(f, range(segment["count"])):
+                    yield json.loads(line)
@@ -0,0 +1,50 @@
+import time
+import threading
+import contextlib
+from collections import defaultdict
+
+
+class PhaseTimer(object):
+    """
+    Thread-safe accumulator of seconds spent per phase and of event counts.
+
+    Time can also be attributed to a host, giving per-host totals of a phase.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.totals = defaultdict(float)
+            self.hosts = defaultdict(float)
+            self.counts = defaultdict(int)
+
+    def add(self, phase, seconds, host=None):
+        with self.lock:
+            self.totals[phase] += seconds
+            if host is not None:
+                self.hosts[host] += seconds
+
+    def count(self, counter, n=1):
+        with self.lock:
+            self.counts[counter] += n
+
+    @contextlib.contextmanager
+    def time(self, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(phase, time.time() - start)
+
+    def as_dict(self):
+        with self.lock:
+            data = {phase: round(total, 3) for phase, total in self.totals.items()}
+            data.update(self.counts)
+            if self.hosts:
+                data["hosts"] = {
+                    host: round(total, 3) for host, total in self.hosts.items()
+                }
+        return data
@@ -0,0 +1,35 @@
+"""
+    helpers shared by the benchmark scripts
+
+    Scripts are run from a checkout, e.g. python scripts/benchmarks/validation.py,
+    and print the rate of each variant they time, best of a few runs.
+"""
+import os
+import sys
+import time
+import argparse
+
+# import pupa from the checkout the script is in
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+def get_parser(description, n):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-n", type=int, default=n, help="number of objects")
+    parser.add_argument("--repeat", type=int, default=3, help="runs, best is kept")
+    return parser
+
+
+def best_of(func, repeat):
+    """seconds taken by the fastest of repeat calls of func"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(label, n, seconds, unit="objects"):
+    print("{:<40} {:>9.3f}s {:>12.0f} {}/s".format(label, seconds, n / seconds, unit))
@@ -0,0 +1,63 @@
+"""
+    scaling of AssociatedLinkMixin._add_associated_link
+
+    Adds n links to a bill's versions, each to its own version and 100 to a
+    version. "scan" is the implementation that rescanned every item and link
+    on each add, kept here for comparison. Each add to the index is O(1), so
+    its rate should stay flat as the number of links grows, while the scan's
+    falls with it. The scan is only timed once, it takes a minute at 10000.
+"""
+from _common import get_parser, best_of, report
+
+from pupa.exceptions import ScrapeValueError
+from pupa.scrape import Bill
+
+
+def scan_add(associated, note, url, media_type="", text="", date=""):
+    ver = {"note": note, "links": [], "date": date}
+    seen_links = set()
+    matches = 0
+    for item in associated:
+        for link in item["links"]:
+            seen_links.add(link["url"])
+        if all(ver.get(x) == item.get(x) for x in ["note", "date"]):
+            matches = matches + 1
+            ver = item
+    assert matches <= 1, "multiple matches found in _add_associated_link"
+    if url in seen_links:
+        raise ScrapeValueError("Duplicate entry")
+    ver["links"].append({"url": url, "media_type": media_type, "text": text})
+    if matches == 0:
+        associated.append(ver)
+    return ver
+
+
+def main():
+    parser = get_parser(__doc__, 10000)
+    args = parser.parse_args()
+
+    sizes = sorted({max(args.n // 10, 1), max(args.n // 2, 1), args.n})
+    for per_version in (1, 100):
+        for n in sizes:
+            links = [
+                ("version {}".format(i // per_version), "https://example.com/{}".format(i))
+                for i in range(n)
+            ]
+
+            def indexed():
+                bill = Bill("HB 1", "2020", "A bill")
+                for note, url in links:
+                    bill.add_version_link(note, url)
+
+            def scan():
+                versions = []
+                for note, url in links:
+                    scan_add(versions, note, url)
+
+            label = "{} links, {} per version".format(n, per_version)
+            report(label + ", indexed", n, best_of(indexed, args.repeat), "links")
+            report(label + ", scan", n, best_of(scan, 1), "links")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+    importing a session of new bills with and without IMPORT_COPY
+
+    Needs a database set up with `pupa dbinit`, DATABASE_URL as for pupa. Each
+    run imports into a jurisdiction of its own inside a transaction that is
+    rolled back, so nothing is left behind.
+"""
+import os
+import copy
+
+from _common import get_parser, best_of, report
+
+import django
+
+from pupa import settings
+from pupa.cli.commands.update import override_settings
+from pupa.scrape import Bill
+
+JURISDICTION_ID = "ocd-jurisdiction/country:us/state:ex/government"
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_bills(n, actions):
+    bills = []
+    for b in range(n):
+        bill = Bill("HB {}".format(b), "2020", "A bill", chamber="lower")
+        bill.add_source("https://example.com/bills/{}".format(b))
+        bill.add_sponsorship("House", "primary", "organization", True)
+        bill.add_sponsorship("House", "cosponsor", "organization", False)
+        for a in range(actions):
+            action = bill.add_action(
+                "action\t{}\nof bill {}".format(a, b),
+                "2020-01-{:02d}".format(a % 28 + 1),
+                chamber="lower",
+                classification=["introduction"],
+            )
+            action.add_related_entity("House", "organization")
+        for v in range(3):
+            bill.add_version_link(
+                "version {}".format(v),
+                "https://example.com/bills/{}/{}.pdf".format(b, v),
+                media_type="application/pdf",
+            )
+        bills.append(bill.as_dict())
+    return bills
+
+
+def import_session(bills):
+    from django.db import transaction
+    from opencivicdata.core.models import Division, Jurisdiction, Organization
+    from pupa.importers import BillImporter, OrganizationImporter, PersonImporter
+
+    try:
+        with transaction.atomic():
+            division = Division.objects.create(
+                id="ocd-division/country:us/state:ex", name="Example"
+            )
+            jurisdiction = Jurisdiction.objects.create(
+                id=JURISDICTION_ID, name="Example", division=division
+            )
+            jurisdiction.legislative_sessions.create(identifier="2020", name="2020")
+            Organization.objects.create(
+                name="House", classification="lower", jurisdiction=jurisdiction
+            )
+            oi = OrganizationImporter(JURISDICTION_ID)
+            pi = PersonImporter(JURISDICTION_ID)
+            BillImporter(JURISDICTION_ID, oi, pi).import_data(bills)
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+def main():
+    parser = get_parser(__doc__, 2000)
+    parser.add_argument("--actions", type=int, default=20, help="actions per bill")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pupa.settings")
+    django.setup()
+
+    bills = make_bills(args.n, args.actions)
+    # actions, their entities, sponsorships, versions, their links and sources
+    rows = args.n * (args.actions * 2 + 2 + 3 * 2 + 1)
+    print("{} bills, {} related rows".format(args.n, rows))
+
+    for label, use_copy in (("bulk_create", False), ("COPY", True)):
+        # import_data modifies the dicts it is given
+        copies = [copy.deepcopy(bills) for _ in range(args.repeat)]
+        with override_settings(settings, {"IMPORT_COPY": use_copy}):
+            seconds = best_of(lambda: import_session(copies.pop()), args.repeat)
+        report(label, args.n, seconds, unit="bills")
+
+
+if __name__ == "__main__":
+    main()
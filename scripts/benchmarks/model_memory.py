@@ -0,0 +1,54 @@
+"""
+    memory held by scraped bills and the cost of building them
+
+    Reports the bytes per bill allocated while building the bills, how much of
+    that is the instances' own attribute dicts as opposed to the lists and
+    dicts of actions, sponsorships and sources they hold, and the time taken
+    by Bill.__init__ and as_dict.
+"""
+import sys
+import tracemalloc
+
+from _common import get_parser, best_of, report
+
+from pupa.scrape import Bill
+
+
+def make_bill(n):
+    bill = Bill("HB {}".format(n), "2020", "A bill", chamber="lower")
+    bill.add_source("https://example.com/bills/{}".format(n))
+    bill.add_sponsorship("Jordan", "primary", "person", True)
+    for a in range(5):
+        bill.add_action("action {}".format(a), "2020-01-0{}".format(a + 1))
+    return bill
+
+
+def attribute_bytes(bill):
+    """size of the instance and its attribute dict, not of what they refer to"""
+    return sys.getsizeof(bill) + sys.getsizeof(bill.__dict__)
+
+
+def main():
+    parser = get_parser(__doc__, 100000)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    bills = [make_bill(n) for n in range(args.n)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    instances = sum(attribute_bytes(bill) for bill in bills)
+    print("{:<40} {:>10.0f} bytes/bill".format("allocated", allocated / args.n))
+    print("{:<40} {:>10.0f} bytes/bill".format("instances", instances / args.n))
+    print(
+        "{:<40} {:>10.0f} bytes/bill".format(
+            "everything else", (allocated - instances) / args.n
+        )
+    )
+
+    report("Bill()", args.n, best_of(lambda: [make_bill(n) for n in range(args.n)], args.repeat))
+    report("as_dict", args.n, best_of(lambda: [bill.as_dict() for bill in bills], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
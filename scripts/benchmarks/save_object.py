@@ -0,0 +1,71 @@
+"""
+    Scraper.save_object throughput for bills
+
+    Each variant saves the same bills into a fresh datadir, with logging set
+    up from settings.LOGGING as `pupa update --loglevel` does.
+"""
+import io
+import copy
+import shutil
+import logging
+import logging.config
+import tempfile
+
+from _common import get_parser, best_of, report
+
+from pupa import settings
+from pupa.cli.commands.update import override_settings
+from pupa.scrape import Bill, Jurisdiction, Scraper
+from pupa.utils.generic import orjson
+
+
+class BenchJurisdiction(Jurisdiction):
+    jurisdiction_id = "ocd-jurisdiction/country:us/state:ex/government"
+
+
+def make_bill(n):
+    bill = Bill("HB {}".format(n), "2020", "A bill", chamber="lower")
+    bill.add_source("https://example.com/bills/{}".format(n))
+    bill.add_sponsorship("Jordan", "primary", "person", True)
+    for a in range(5):
+        bill.add_action("action {}".format(a), "2020-01-0{}".format(a + 1))
+    return bill
+
+
+def configure_logging(level):
+    config = copy.deepcopy(settings.LOGGING)
+    config["handlers"]["default"]["level"] = level
+    logging.config.dictConfig(config)
+    # keep the output (and the cost of a terminal) out of the timings
+    for handler in logging.getLogger().handlers:
+        handler.stream = io.StringIO()
+
+
+def main():
+    parser = get_parser(__doc__, 100000)
+    parser.set_defaults(repeat=1)
+    args = parser.parse_args()
+    bills = [make_bill(n) for n in range(args.n)]
+
+    variants = [("--loglevel INFO", "INFO", "json"), ("--loglevel DEBUG", "DEBUG", "json")]
+    if orjson is not None:
+        variants.append(("--loglevel INFO, orjson", "INFO", "orjson"))
+
+    for label, level, backend in variants:
+        configure_logging(level)
+
+        def save_all():
+            datadir = tempfile.mkdtemp()
+            try:
+                with override_settings(settings, {"JSON_BACKEND": backend}):
+                    scraper = Scraper(BenchJurisdiction(), datadir)
+                for bill in bills:
+                    scraper.save_object(bill)
+            finally:
+                shutil.rmtree(datadir)
+
+        report(label, args.n, best_of(save_all, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
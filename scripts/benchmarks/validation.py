@@ -0,0 +1,69 @@
+"""
+    validations per second of scraped bills
+
+    "uncached" builds a validator class and FormatChecker per object, as
+    BaseModel.validate did before validators were cached per schema.
+"""
+import datetime
+
+from _common import get_parser, best_of, report
+
+import jsonschema
+from jsonschema import Draft3Validator, FormatChecker
+from pupa.scrape import Bill
+from pupa.scrape.base import get_validator, validation_errors
+
+
+def make_bill(n):
+    bill = Bill("HB {}".format(n), "2020", "A bill", chamber="lower")
+    bill.add_source("https://example.com/bills/{}".format(n))
+    bill.add_sponsorship("Jordan", "primary", "person", True)
+    for a in range(5):
+        bill.add_action("action {}".format(a), "2020-01-0{}".format(a + 1))
+    bill.add_version_link("v1", "https://example.com/bills/{}.pdf".format(n))
+    return bill
+
+
+def uncached_errors(schema, data):
+    type_checker = Draft3Validator.TYPE_CHECKER.redefine(
+        "datetime", lambda c, d: isinstance(d, (datetime.date, datetime.datetime))
+    )
+    type_checker = type_checker.redefine(
+        "date",
+        lambda c, d: isinstance(d, datetime.date) and not isinstance(d, datetime.datetime),
+    )
+    ValidatorCls = jsonschema.validators.extend(Draft3Validator, type_checker=type_checker)
+    validator = ValidatorCls(schema, format_checker=FormatChecker())
+    return [str(error) for error in validator.iter_errors(data)]
+
+
+def main():
+    args = get_parser(__doc__, 2000).parse_args()
+    bills = [make_bill(n) for n in range(args.n)]
+    data = [bill.as_dict() for bill in bills]
+    schema = Bill._schema
+    # build the cached validator outside of the timings
+    get_validator(schema)
+
+    def run(errors, **kwargs):
+        def func():
+            for d in data:
+                assert not errors(schema, d, **kwargs)
+
+        return func
+
+    report("uncached validator", args.n, best_of(run(uncached_errors), args.repeat))
+    report(
+        "cached validator (jsonschema)",
+        args.n,
+        best_of(run(validation_errors, engine="jsonschema"), args.repeat),
+    )
+    report(
+        "cached validator (compiled)",
+        args.n,
+        best_of(run(validation_errors, engine="compiled"), args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()